@@ -23,11 +23,14 @@
 #
 #########################################################################
 
+import collections
 import copy
+import logging
 import re
 import os
 import datetime
 import functools
+import queue
 import time
 import threading
 
@@ -66,7 +69,29 @@ class Database(SmartPlugin):
         '4': ["CREATE INDEX {log}_{item}_id_changed ON {log} (item_id, changed);",
               "DROP INDEX {log}_{item}_id_changed;"],
         '5': ["CREATE UNIQUE INDEX {item}_id ON {item} (id);", "DROP INDEX {item}_id;"],
-        '6': ["CREATE INDEX {item}_name ON {item} (name);", "DROP INDEX {item}_name;"]
+        '6': ["CREATE INDEX {item}_name ON {item} (name);", "DROP INDEX {item}_name;"],
+        '7': [
+            "CREATE TABLE {rollup} (item_id INTEGER, period BIGINT, time BIGINT, val_min REAL, val_max REAL, val_sum REAL, val_count INTEGER, duration BIGINT, val_integral REAL, val_bool_duration BIGINT);",
+            "DROP TABLE {rollup};"],
+        '8': ["CREATE UNIQUE INDEX {rollup}_item_id_period_time ON {rollup} (item_id, period, time);",
+              "DROP INDEX {rollup}_item_id_period_time;"]
+    }
+
+
+    # UPSERT statements for log records, used for bulk dumps (selected by the style of the configured driver)
+    _upsert_log = {
+        'on_conflict': "INSERT INTO {log}(item_id, time, val_str, val_num, val_bool, duration, changed) VALUES (:id,:time,:val_str,:val_num,:val_bool,:duration,:changed) "
+                       "ON CONFLICT (item_id, time) DO UPDATE SET duration = excluded.duration, val_str = excluded.val_str, val_num = excluded.val_num, val_bool = excluded.val_bool, changed = excluded.changed;",
+        'on_duplicate_key': "INSERT INTO {log}(item_id, time, val_str, val_num, val_bool, duration, changed) VALUES (:id,:time,:val_str,:val_num,:val_bool,:duration,:changed) "
+                            "ON DUPLICATE KEY UPDATE duration = VALUES(duration), val_str = VALUES(val_str), val_num = VALUES(val_num), val_bool = VALUES(val_bool), changed = VALUES(changed);"
+    }
+    _upsert_styles = {'sqlite3': 'on_conflict', 'psycopg2': 'on_conflict',
+                      'pymysql': 'on_duplicate_key', 'mysqldb': 'on_duplicate_key', 'mysql.connector': 'on_duplicate_key'}
+
+    # Integer division of timestamps for the start time of a rollup bucket: {period} = period in milliseconds
+    _rollup_bucket = {
+        'on_conflict': "(time / {period}) * {period}",
+        'on_duplicate_key': "(time DIV {period}) * {period}"
     }
 
 
@@ -113,12 +138,28 @@ class Database(SmartPlugin):
 
         self._webdata = {}
 
-        self._replace = {table: table if self._prefix == "" else self._prefix + table for table in ["log", "item"]}
+        self._replace = {table: table if self._prefix == "" else self._prefix + table for table in ["log", "item", "rollup"]}
         self._replace['item_columns'] = ", ".join(COL_ITEM)
         self._replace['log_columns'] = ", ".join(COL_LOG)
+        self._prepared = {}                     # cache of prepared queries: {query template: query}
         self._buffer = {}
         self._buffer_lock = threading.Lock()
+        self._buffer_dumping = {}               # tuples which have been removed from the buffer by a running dump
         self._dump_lock = threading.Lock()
+        self._upsert_style = self._upsert_styles.get(str(self.driver).lower())
+        self._dump_stats = {}                   # statistics of the last dump (items, values, duration, lock_duration, time)
+
+        self._rollup = self.get_parameter_value('rollup')
+        if self._rollup and self._upsert_style not in self._rollup_bucket:
+            self.logger.warning(f"Rollups are not supported for database driver {self.driver}")
+            self._rollup = False
+        self._rollup_from = {}                  # {item id: time from which on rollups are complete (0 = complete)}
+        self._rollup_oldest = {}                # {item id: start of the day of the oldest log entry}
+
+        self._series_cache = collections.OrderedDict()  # {sid: cache entry}, least recently used entry first
+        self._series_cache_lock = threading.Lock()
+        self._series_cache_max = self.get_parameter_value('series_cache_size') * 1024 * 1024
+        self._series_cache_bytes = 0
 
         self.skipping_dump = False
         self._remove_older_skipped = False
@@ -129,6 +170,9 @@ class Database(SmartPlugin):
         self.remove_orphan = False              # set to True to remove orphans during remove_older
         self.delete_orphan_chunk_size = 20000   # Delete x log entries for orphan items at a time
         self._handled_items = []                # items that have a 'database' attribute set
+        self._item_ids = {}                     # cache of database ids: {item path: id}
+        self._item_ids_loaded = False           # True, if the cache of database ids has been filled from the item table
+        self._item_ids_uncommitted = []         # item paths of records inserted within the current (not yet committed) transaction
         self._items_with_maxage = []            # items that have a 'database_maxage' attribute set
         self._maxage_worklist = []              # work copy of self._items_with_maxage
         self._item_logcount = {}                # dict to store the number of log records for an item
@@ -162,11 +206,32 @@ class Database(SmartPlugin):
 
         self._db_initialized = False
         self._db_maint_initialized = False
+
+        # Setup pool of db connections for read queries (e.g. series for visu)
+        self._read_pool = None
+        self._db_read = []
+        self._lock_stats = {'write': {'count': 0, 'total': 0.0, 'max': 0.0},
+                            'read': {'count': 0, 'total': 0.0, 'max': 0.0}}
+        read_connections = self.get_parameter_value('read_connections')
+        if read_connections > 0:
+            self._read_pool = queue.Queue()
+            for i in range(read_connections):
+                db_read = lib.db.Database(("" if self._prefix == ""  else self._prefix.capitalize()) + "Database", self.driver, self._connect)
+                if db_read.api_initialized == False:
+                    self.logger.error("Initialization of database API failed for read connection")
+                    self._read_pool = None
+                    self._db_read = []
+                    break
+                self._db_read.append(db_read)
+                self._read_pool.put(db_read)
+
         if not self._initialize_db():
             #self._init_complete = False
             #return
             self.logger.debug("Init: DB could not be initialized")
             pass
+        else:
+            self._load_item_ids()
 
 
         self.init_webinterface(WebInterface)
@@ -178,7 +243,22 @@ class Database(SmartPlugin):
         Run method for the plugin
         """
         self.logger.debug("Run method called")
-        self._initialize_db()
+        if self._initialize_db() and not self._item_ids_loaded:
+            self._load_item_ids()
+        if not self._rollup and self._db_initialized:
+            # remove rollups, so they are rebuilt without gaps, when rollups are enabled again
+            if self._db.lock(60):
+                try:
+                    cur = self._db.cursor()
+                    self._execute("DELETE FROM {rollup};", {}, cur=cur)
+                    cur.close()
+                    self._db.commit()
+                except Exception as e:
+                    self.logger.error(f"run: Could not remove rollups - Exception {e}")
+                finally:
+                    self._db.release()
+            else:
+                self.logger.error("run: Can not acquire lock for database to remove rollups")
         self.build_orphanlist(True)
         self._start_schedulers()
         self.alive = True
@@ -194,6 +274,9 @@ class Database(SmartPlugin):
         self._dump(True)
         self._db.close()
         self._db_maint.close()
+        for db_read in self._db_read:
+            if db_read.connected():
+                db_read.close()
 
 
     def parse_item(self, item):
@@ -359,6 +442,8 @@ class Database(SmartPlugin):
         if len(self._items_with_maxage) > 0:
             # self.scheduler_add('Remove old', self.remove_older_than_maxage, cycle=91, prio=6)
             self.scheduler_add('Remove old', self.remove_older_than_maxage, cycle=self._removeold_cycle, prio=7)
+        if self._rollup:
+            self.scheduler_add('Build rollups', self._build_rollups, cycle=31, prio=7)
         return
 
 
@@ -366,6 +451,8 @@ class Database(SmartPlugin):
         """
         Stop jobs that maintain buffer and database
         """
+        if self._rollup:
+            self.scheduler_remove('Build rollups')
         if len(self._items_with_maxage) > 0:
             self.scheduler_remove('Remove old')
         self.scheduler_remove('Buffer dump')
@@ -431,6 +518,10 @@ class Database(SmartPlugin):
             item_path = str(item.property.path)
         except:
             item_path = item
+        id = self._item_ids.get(item_path)
+        if id is not None:
+            return id
+
         try:
             id = self.readItem(item_path, cur=cur)
         except Exception as e:
@@ -442,7 +533,53 @@ class Database(SmartPlugin):
 
         if (id is None) or (COL_ITEM_ID >= len(id)) :
             return None
-        return int(id[COL_ITEM_ID])
+        id = int(id[COL_ITEM_ID])
+        if isinstance(item_path, str):
+            self._item_ids[item_path] = id
+        return id
+
+
+    def _load_item_ids(self):
+        """
+        Fill the cache of database ids with one read of the item table
+
+        Ids of items never change after they have been created, so id() does not need to
+        query the database for items that are in the cache.
+        """
+        try:
+            rows = self.readItems()
+        except Exception as e:
+            self.logger.warning(f"_load_item_ids: Could not read items from database - Exception {e}")
+            return
+        if rows is None:
+            return
+        self._item_ids = {row[COL_ITEM_NAME]: int(row[COL_ITEM_ID]) for row in rows}
+        self._item_ids_loaded = True
+        self.logger.debug(f"_load_item_ids: Cached database ids of {len(self._item_ids)} items")
+
+
+    def _forget_item_id(self, id):
+        """
+        Remove a database id from the cache of database ids
+
+        :param id: database id of a deleted item record
+        """
+        for path in [path for path, cached_id in self._item_ids.items() if cached_id == id]:
+            del self._item_ids[path]
+
+
+    def _forget_uncommitted_item_ids(self):
+        """
+        Remove the database ids of item records inserted within a transaction that has been rolled back
+
+        Rollup states of these ids are removed as well, since the rollups have been rolled back, too.
+        """
+        for path in self._item_ids_uncommitted:
+            id = self._item_ids.pop(path, None)
+            if id is not None:
+                self._rollup_from.pop(id, None)
+                self._rollup_oldest.pop(id, None)
+        self._item_ids_uncommitted = []
 
 
     def db_itemtype(self, item):
@@ -611,6 +748,8 @@ class Database(SmartPlugin):
         self._execute(self._prepare("INSERT INTO {item}(id, name) VALUES(:id, :name);"),
                       {'id': 1 if id[0] == None else id[0] + 1, 'name': name}, cur=cur)
         id = self._fetchone("SELECT id FROM {item} where name = :name;", {'name': name}, cur=cur)
+        self._item_ids[name] = int(id[0])
+        self._item_ids_uncommitted.append(name)
         return int(id[0])
 
 
@@ -676,7 +815,7 @@ class Database(SmartPlugin):
         """
         if self._db.connected():
             params = {}
-            return self._fetchall("SELECT count(*) FROM {item};", params, cur=cur)[0][0]
+            return self._fetchall("SELECT count(*) FROM {item};", params, cur=cur, read=True)[0][0]
         return '-'
 
 
@@ -692,6 +831,7 @@ class Database(SmartPlugin):
         params = {'id': id}
         self.deleteLog(id, cur=cur)
         self._execute(self._prepare("DELETE FROM {item} WHERE id = :id;"), params, cur=cur)
+        self._forget_item_id(id)
 
 
     def insertLog(self, id, time, duration=0, val=None, it=None, changed=None, cur=None):
@@ -774,7 +914,7 @@ class Database(SmartPlugin):
         """
         condition, params = self._slice_condition(id, time=time, time_start=time_start, time_end=time_end,
                                                   changed=changed, changed_start=changed_start, changed_end=changed_end)
-        return self._fetchall("SELECT {log_columns} FROM {log} WHERE " + condition, params, cur=cur)
+        return self._fetchall("SELECT {log_columns} FROM {log} WHERE " + condition, params, cur=cur, read=True)
 
 
     def readOldestLog(self, id, cur=None):
@@ -789,7 +929,7 @@ class Database(SmartPlugin):
         :return: Time of oldest log record for the database ID
         """
         params = {'id': id}
-        db_values = self._fetchall("SELECT min(time) FROM {log} WHERE item_id = :id;", params, cur=cur)
+        db_values = self._fetchall("SELECT min(time) FROM {log} WHERE item_id = :id;", params, cur=cur, read=True)
         if db_values is None:
             return None
         else:
@@ -810,14 +950,14 @@ class Database(SmartPlugin):
         """
         if time is None:
             params = {'id': id}
-            db_values = self._fetchall("SELECT max(time) FROM {log} WHERE item_id = :id;", params, cur=cur)
+            db_values = self._fetchall("SELECT max(time) FROM {log} WHERE item_id = :id;", params, cur=cur, read=True)
             if db_values is None:
                 return None
             else:
                 return db_values[0][0]
         else:
             params = {'id': id, 'time': time}
-            db_values = self._fetchall("SELECT max(time) FROM {log} WHERE item_id = :id AND time <= :time", params, cur=cur)
+            db_values = self._fetchall("SELECT max(time) FROM {log} WHERE item_id = :id AND time <= :time", params, cur=cur, read=True)
             if db_values is None:
                 return None
             else:
@@ -835,7 +975,7 @@ class Database(SmartPlugin):
         :return: Number of log records
         """
         params = {'id': id, 'time_start': time_start, 'time_end': time_end}
-        result = self._fetchall("SELECT count(*) FROM {log};", params, cur=cur)
+        result = self._fetchall("SELECT count(*) FROM {log};", params, cur=cur, read=True)
         if result == []:
             return 0
         return result[0][0]
@@ -853,13 +993,13 @@ class Database(SmartPlugin):
         """
         params = {'id': id, 'time_start': time_start, 'time_end': time_end}
         if time_start is None and time_end is None:
-            result = self._fetchall("SELECT count(*) FROM {log} WHERE item_id = :id;", params, cur=cur)
+            result = self._fetchall("SELECT count(*) FROM {log} WHERE item_id = :id;", params, cur=cur, read=True)
         elif time_start is None:
-            result = self._fetchall("SELECT count(*) FROM {log} WHERE item_id = :id AND time <= :time_end;", params, cur=cur)
+            result = self._fetchall("SELECT count(*) FROM {log} WHERE item_id = :id AND time <= :time_end;", params, cur=cur, read=True)
         elif time_end is None:
-            result = self._fetchall("SELECT count(*) FROM {log} WHERE item_id = :id AND time >= :time_start;", params, cur=cur)
+            result = self._fetchall("SELECT count(*) FROM {log} WHERE item_id = :id AND time >= :time_start;", params, cur=cur, read=True)
         else:
-            result = self._fetchall("SELECT count(*) FROM {log} WHERE item_id = :id AND time >= :time_start AND time <= :time_end;", params, cur=cur)
+            result = self._fetchall("SELECT count(*) FROM {log} WHERE item_id = :id AND time >= :time_start AND time <= :time_end;", params, cur=cur, read=True)
         if result == []:
             return 0
         if result is None:
@@ -890,13 +1030,20 @@ class Database(SmartPlugin):
         """
         condition, params = self._slice_condition(id, time=time, time_start=time_start, time_end=time_end,
                                                   changed=changed, changed_start=changed_start, changed_end=changed_end)
+        self._invalidate_series_cache(id)
         try:
             self._execute(self._prepare("DELETE FROM {log} WHERE " + condition), params, cur=cur)
+            if self._has_rollups(id, cur=cur):
+                rollup_start = time_start if time is None else time
+                rollup_end = time_end if time is None else time
+                self._update_rollups(id, 0 if rollup_start is None else rollup_start,
+                                     self._timestamp(self.shtime.now()) if rollup_end is None else rollup_end, cur=cur)
             if with_commit:
                 self._db.commit()
         except Exception as e:
             self.logger.error("Exception in function deleteLog: {}".format(e))
             self._db.rollback()
+            self._forget_uncommitted_item_ids()
 
         try:
             self._item_logcount[id] = self.readLogCount(id)
@@ -992,6 +1139,10 @@ class Database(SmartPlugin):
                 count -= self.max_reassign_logentries
 
             self._execute(self._prepare("DELETE FROM  {item} WHERE id = :orphanid LIMIT 1;"), {'orphanid': orphan_id}, cur=cur)
+            self._forget_item_id(orphan_id)
+            # the rollups of the new id are rebuilt including the reassigned log records
+            self._delete_rollups(orphan_id, cur=cur)
+            self._delete_rollups(to, cur=cur)
             log_info(f'reassigned orphaned id {orphan_id} to new id {to}')
             cur.close()
             self._db_maint.commit()
@@ -1016,6 +1167,8 @@ class Database(SmartPlugin):
             self.logger.info(f"_delete_orphan: Item {item_path} has no log entries")
             cur = self._db_maint.cursor()
             self._execute(self._prepare("DELETE FROM {item} WHERE id = :id;"), {'id': item_id}, cur=cur)
+            self._item_ids.pop(item_path, None)
+            self._delete_rollups(item_id, cur=cur)
             self.logger.info(f"_delete_orphan: Deleted item entry for {item_path}")
             cur.close()
             self._db_maint.commit()
@@ -1134,12 +1287,26 @@ class Database(SmartPlugin):
             'raw.order': 'ORDER BY time ASC',
             'raw.group': ''
         }
+        rollup_queries = {
+            'avg': self._time_precision_query('MIN(time)') + ', ' + self._precision_query('SUM(val_integral) / SUM(duration)'),
+            'integrate': self._time_precision_query('MIN(time)') + ', SUM(val_integral)',
+            'countall': self._time_precision_query('MIN(time)') + ', SUM(val_count)',
+            'min': self._time_precision_query('MIN(time)') + ', MIN(val_min)',
+            'max': self._time_precision_query('MIN(time)') + ', MAX(val_max)',
+            'on': self._time_precision_query('MIN(time)') + ', ' + self._precision_query('SUM(val_bool_duration) / SUM(duration)'),
+            'sum': self._time_precision_query('MIN(time)') + ', SUM(val_sum)',
+        }
         if func not in queries:
             raise NotImplementedError
 
         order = '' if func + '.order' not in queries else queries[func + '.order']
         group = 'GROUP BY ROUND(time / :step)' if func + '.group' not in queries else queries[func + '.group']
-        logs = self._fetch_log(item, queries[func], start, end, step=step, count=count, group=group, order=order)
+        if self._series_cache_max > 0 and func in SERIES_CACHE_FUNCS:
+            logs = self._fetch_log_cached(sid, update, item, queries[func], start, end, step=step, count=count,
+                                          group=group, order=order, rollup_columns=rollup_queries.get(func))
+        else:
+            logs = self._fetch_log(item, queries[func], start, end, step=step, count=count, group=group, order=order,
+                                   rollup_columns=rollup_queries.get(func))
         tuples = logs['tuples']
 
         # Append tuples by addition values (not for func differentiate)
@@ -1202,11 +1369,20 @@ class Database(SmartPlugin):
             'raw.order': 'ORDER BY time DESC',
             'raw.group': ''
         }
+        rollup_queries = {
+            'avg': self._precision_query('SUM(val_integral) / SUM(duration)'),
+            'integrate': 'SUM(val_integral)',
+            'countall': 'SUM(val_count)',
+            'min': 'MIN(val_min)',
+            'max': 'MAX(val_max)',
+            'on': self._precision_query('SUM(val_bool_duration) / SUM(duration)'),
+            'sum': 'SUM(val_sum)',
+        }
         if func not in queries:
             self.logger.warning("Unknown export function: {0}".format(func))
             return
         order = '' if func + '.order' not in queries else queries[func + '.order']
-        logs = self._fetch_log(item, queries[func], start, end, order=order)
+        logs = self._fetch_log(item, queries[func], start, end, order=order, rollup_columns=rollup_queries.get(func))
         if logs['tuples'] is None:
             return
         return logs['tuples'][0][0]
@@ -1247,7 +1423,7 @@ class Database(SmartPlugin):
             return 'ROUND({}, {})'.format(query, self._time_precision - 3)
         return query
 
-    def _fetch_log(self, item, columns, start, end, step=None, count=100, group='', order=''):
+    def _fetch_log(self, item, columns, start, end, step=None, count=100, group='', order='', rollup_columns=None):
         _item = self.items.return_item(item)
 
         istart = self._parse_ts(start)
@@ -1264,10 +1440,8 @@ class Database(SmartPlugin):
             else:
                 step = iend - istart
 
-        if self._buffer[_item] != []:
-            self._dump(items=[_item])
-
         params = {'id': id, 'time_start': istart, 'time_end': iend, 'inow': inow, 'step': step}
+
         duration_now = "COALESCE(duration, :inow - time)"
 
         # Duration calculation (S=Start, E=End):
@@ -1286,25 +1460,70 @@ class Database(SmartPlugin):
             ")"
         )
 
-        # Replace duration fields with calculated durations from previous
-        # generated expressions to include all three cases.
-        columns = columns.replace('duration', duration)
-
-        # Create base query including the replaced columns
-        query = (
-                "SELECT " + columns + " FROM {log} WHERE "
-                                      "item_id = :id AND "
-                                      "time >= (SELECT COALESCE(MAX(time), 0) FROM {log} WHERE item_id = :id AND time < :time_start) AND "
-                                      "time <= :time_end AND "
-                                      "time + duration_now > (SELECT COALESCE(MAX(time), 0) FROM {log} WHERE item_id = :id AND time < :time_start) "
-                                      "" + group + " " + order
+        # Values which have not been dumped yet are merged with the log records instead of dumping them first.
+        # Buffered values replace log records from the time of the first buffered value on.
+        log_table = "{log}"
+        buffered = [t for t in self._buffer_snapshot(_item) if t[0] <= iend]
+        if len(buffered) > MAX_BUFFER_MERGE:
+            # too many values to merge them into the query, write them to the database first
+            self.logger.debug(f"_fetch_log: Dumping {len(buffered)} buffered values of item {item} before reading")
+            self._dump(items=[_item])
+            id = self.id(_item, create=False)
+            params['id'] = id
+            buffered = [t for t in self._buffer_snapshot(_item) if t[0] <= iend]
+        if id is None:
+            # The item has no database record yet, so there are only buffered values. Database ids start
+            # with 1, so id 0 matches no log records but the buffered values.
+            params['id'] = 0
+        if buffered:
+            params['buffer_start'] = buffered[0][0]
+            selects = ["SELECT time, item_id, duration, val_num, val_bool FROM {log} WHERE item_id = :id AND time < :buffer_start AND time <= :time_end AND "
+                       "time >= (SELECT COALESCE(MAX(time), 0) FROM {log} WHERE item_id = :id AND time < :time_start)"]
+            for index, t in enumerate(buffered):
+                # parameter names must not contain digits
+                name = 'buffer_' + ''.join(chr(ord('a') + int(digit)) for digit in str(index))
+                values = self._item_value_tuple(_item.type(), t[2])
+                params.update({name + '_time': t[0], name + '_duration': t[1], name + '_val_num': values['val_num'], name + '_val_bool': values['val_bool']})
+                selects.append(f"SELECT :{name}_time, :id, :{name}_duration, :{name}_val_num, :{name}_val_bool")
+            log_table = "(" + " UNION ALL ".join(selects) + ") merged_log"
+
+        condition = (
+            "item_id = :id AND "
+            "time >= (SELECT COALESCE(MAX(time), 0) FROM {log} WHERE item_id = :id AND time < :time_start) AND "
+            "time <= :time_end AND "
+            "time + duration_now > (SELECT COALESCE(MAX(time), 0) FROM {log} WHERE item_id = :id AND time < :time_start) "
         )
 
+        period = None if rollup_columns is None else self._rollup_period(id, istart, iend, step)
+        if period is not None and not self._rollup_range(id, period, params):
+            period = None
+        if period is not None:
+            # Use the rollups of the choosen period for the buckets which lie completely within the requested range.
+            # Log records before and after these buckets are read from the log table with the clipped durations
+            # and converted to the columns of the rollup table.
+            query = (
+                "SELECT " + rollup_columns + " FROM ("
+                "SELECT time, val_min, val_max, val_sum, val_count, duration, val_integral, val_bool_duration FROM {rollup} WHERE "
+                "item_id = :id AND period = :period AND time >= :rollup_start AND time < :rollup_end "
+                "UNION ALL "
+                "SELECT time, val_num, val_num, val_num, 1, " + duration + ", val_num * " + duration + ", val_bool * " + duration + " FROM " + log_table + " WHERE "
+                "" + condition + "AND (time < :rollup_start OR time >= :rollup_end)"
+                ") rollup_log "
+                "" + group + " " + order
+            )
+        else:
+            # Replace duration fields with calculated durations from previous
+            # generated expressions to include all three cases.
+            columns = columns.replace('duration', duration)
+
+            # Create base query including the replaced columns
+            query = "SELECT " + columns + " FROM " + log_table + " WHERE " + condition + group + " " + order
+
         # Replace duration_now with value from start time til current time to
         # get a duration value referring to the current timestamp - if required.
         query = query.replace('duration_now', duration_now)
 
-        logs = self._fetchall(query, params)
+        logs = self._fetchall(query, params, read=True)
 
         return {
             'tuples': logs,
@@ -1316,6 +1535,88 @@ class Database(SmartPlugin):
         }
 
 
+    def _fetch_log_cached(self, sid, update, item, columns, start, end, step=None, count=100, group='', order='', rollup_columns=None):
+        """
+        Fetch a series like _fetch_log, but use the tuples cached for the series id (sid)
+
+        Only the log data newer than the last cached tuple is read from the database and merged into
+        the cached tuples. Update requests are served from the cache, if the series has been requested before.
+
+        :return: dict in the form of the result of _fetch_log
+        """
+        with self._series_cache_lock:
+            entry = self._series_cache.get(sid)
+            if entry is not None:
+                self._series_cache.move_to_end(sid)
+
+        if entry is not None:
+            if update:
+                step = entry['step']
+            elif entry['item'] != item or entry['start'] != start or entry['end'] != end or entry['count'] != count or (step is not None and step != entry['step']):
+                entry = None
+        if entry is None or len(entry['tuples']) == 0:
+            logs = self._fetch_log(item, columns, start, end, step=step, count=count, group=group, order=order, rollup_columns=rollup_columns)
+            if not update and logs['tuples'] is not None:
+                self._series_cache_store(sid, {'item': item, 'id': self.id(logs['item'], create=False),
+                                               'start': start, 'end': end, 'count': count, 'step': logs['step'],
+                                               'iend': logs['iend'], 'tuples': sorted(logs['tuples'], key=lambda t: t[0])})
+            return logs
+
+        # Re-read the bucket of the last cached tuple and all newer buckets
+        tuples = entry['tuples']
+        last = tuples[-1][0]
+        fetch_start = last if group == '' else last - entry['step']
+        logs = self._fetch_log(item, columns, fetch_start, end, step=entry['step'], count=count, group=group, order=order, rollup_columns=rollup_columns)
+        if logs['tuples'] is None:
+            return logs
+        tuples = [t for t in tuples if t[0] < last] + sorted((t for t in logs['tuples'] if t[0] >= last), key=lambda t: t[0])
+
+        # Remove tuples which left the time window, but keep the last one before the start of the window
+        window_start = self._parse_ts(entry['start'])
+        first = 0
+        while first + 1 < len(tuples) and tuples[first + 1][0] <= window_start:
+            first += 1
+        tuples = tuples[first:]
+        self._series_cache_store(sid, dict(entry, iend=logs['iend'], tuples=tuples))
+
+        istart = self._parse_ts(start)
+        first = 0
+        while first + 1 < len(tuples) and tuples[first + 1][0] <= istart:
+            first += 1
+        logs['tuples'] = tuples[first:]
+        logs['istart'] = istart
+        return logs
+
+
+    def _series_cache_store(self, sid, entry):
+        """
+        Store an entry in the series cache and evict least recently used entries to meet the memory limit
+        """
+        entry['size'] = SERIES_CACHE_TUPLE_SIZE * len(entry['tuples'])
+        with self._series_cache_lock:
+            old_entry = self._series_cache.pop(sid, None)
+            if old_entry is not None:
+                self._series_cache_bytes -= old_entry['size']
+            if entry['size'] > self._series_cache_max:
+                return
+            self._series_cache[sid] = entry
+            self._series_cache_bytes += entry['size']
+            while self._series_cache_bytes > self._series_cache_max:
+                _, old_entry = self._series_cache.popitem(last=False)
+                self._series_cache_bytes -= old_entry['size']
+
+
+    def _invalidate_series_cache(self, id):
+        """
+        Remove all cached series of an item from the series cache
+
+        :param id: database id of the item
+        """
+        with self._series_cache_lock:
+            for sid in [sid for sid, entry in self._series_cache.items() if entry['id'] == id]:
+                self._series_cache_bytes -= self._series_cache.pop(sid)['size']
+
+
     def _parse_ts(self, dts):
         """
         Parse a duration-timestamp in the form '1w 2y 3h 1d 39i 15s' and return the duration in seconds as
@@ -1392,6 +1693,9 @@ class Database(SmartPlugin):
 
         This method is periodically called by the sheduler of SmartHomeNG
 
+        All buffered values are written within one transaction. If the bulk write fails, the dump is
+        retried item by item, so that a single faulty item does not block the other items.
+
         :param finalize:
         :param items:
         :return:
@@ -1402,6 +1706,7 @@ class Database(SmartPlugin):
             return
 
         self.logger.debug('Starting dump')
+        dump_start = time.time()
 
         if self.skipping_dump:
             self.logger.notice('Dumping buffered data from skipped dump(s).')
@@ -1417,96 +1722,73 @@ class Database(SmartPlugin):
             items = list(self._buffer.keys())
             self._buffer_lock.release()
 
-        for item in items:
-            tuples = self._buffer_remove(item)
+        worklist = self._buffer_remove(items, finalize)
 
-            if len(tuples) or finalize:
+        if len(worklist) == 0:
+            self.logger.debug('Dump completed - nothing to dump')
+            self._dump_lock.release()
+            return
 
-                # Test connectivity
-                if self._db.verify(5) == 0:
-                    self._buffer_insert(item, tuples)
-                    self.logger.error("Connection not recovered, skipping dump");
-                    self._dump_lock.release()
-                    return
+        # Test connectivity
+        if self._db.verify(5) == 0:
+            for item, tuples in worklist:
+                self._buffer_insert(item, tuples)
+            self._buffer_dumping = {}
+            self.logger.error("Connection not recovered, skipping dump");
+            self._dump_lock.release()
+            return
 
-                # Can't lock, restore data
-                if not self._db.lock(300):
-                    self._buffer_insert(item, tuples)
-                    if finalize:
-                        self.logger.error(
-                            "Can't dump {} items due to fail to acquire lock!".format(len(self._buffer)))
-                    else:
-                        self.logger.error(
-                            "Can't dump {} items due to fail to acquire lock - will try on next dump".format(
-                                len(self._buffer)))
-                    self._dump_lock.release()
-                    return
+        # Can't lock, restore data
+        wait_start = time.time()
+        locked = self._db.lock(300)
+        self._lock_wait('write', time.time() - wait_start)
+        if not locked:
+            for item, tuples in worklist:
+                self._buffer_insert(item, tuples)
+            self._buffer_dumping = {}
+            if finalize:
+                self.logger.error(
+                    "Can't dump {} items due to fail to acquire lock!".format(len(self._buffer)))
+            else:
+                self.logger.error(
+                    "Can't dump {} items due to fail to acquire lock - will try on next dump".format(
+                        len(self._buffer)))
+            self._dump_lock.release()
+            return
 
-#                if self.has_iattr(item.conf, 'database_acl'):
-#                    acl = self.get_iattr_value(item.conf, 'database_acl').lower()
-#                    self.logger.info("_dump: Dumping item '{}', database_acl = {}".format(item, acl))
+        changed = self._timestamp(self.shtime.now())
+        worklist = [(item, tuples, self._dump_prepare(item, tuples, finalize, changed)) for item, tuples in worklist]
+        lock_acquired = time.time()
 
+        values = 0
+        cur = None
+        try:
+            cur = self._db.cursor()
+            for item, tuples, _update in worklist:
+                values += self._dump_item(item, tuples, _update, changed, cur)
+            cur.close()
+            cur = None
+            self._db.commit()
+            self._item_ids_uncommitted = []
+        except Exception as e:
+            self.logger.warning("Problem dumping {} items in one transaction, retrying item by item: {}".format(len(worklist), e))
+            try:
+                self._db.rollback()
+            except Exception as er:
+                self.logger.warning("Error rolling back: {}".format(er))
+            self._forget_uncommitted_item_ids()
+            if cur is not None:
+                cur.close()
                 cur = None
+            values = 0
+            for item, tuples, _update in worklist:
                 try:
-                    changed = self._timestamp(self.shtime.now())
-
-                    # Get current values of item
-                    start = self._timestamp(item.last_change())
-                    end = changed
-                    val = item()
-                    try:
-                        self._webdata[item.property.path].update({'value': val})
-                        self._webdata[item.property.path].update({'type': item.property.type})
-                    except Exception as e:
-                        self.logger.warning("Problem webdata value update {}: {}".format(item.property.path, e))
-
-                    # When finalizing (e.g. plugin shutdown) add current value to item and log
-                    if finalize:
-
-                        # When plugin is shutdown, by default, every registered item is rewritten into the DB no matter
-                        # if it has been changed or not. This behavior is not wanted for items that are rarely updated
-                        # because these database entries would lead indicate item updates that in reality aren't really there.
-                        # Therefore, if item attribute database_write_on_shutdown is set to False, no double entries are written
-                        # to the database and only the last entry is updated.
-
-                        #self.logger.debug(f"DEBUG _dump: Finalizing item {item} with value {val}")
-                        if self.get_iattr_value(item.conf, 'database_write_on_shutdown') == False:
-                            self.logger.debug(f"DEBUG _dump: Blocking rewrite to DB for item {item} with value {val}")
-
-                            #if item.property.path == 'xyz':
-                            #    self.logger.warning(f"DEBUG _dump: update debug item with start {start}, val {val}, changed {changed}")
-
-                            _update = (start, val, changed)
-
-                        else:
-                            # Perform item update and rewrite current value to database:
-                            _update = (end, val, changed)
-
-                            current = (start, end - start, val)
-                            tuples.append(current)
-
-                    else:
-                        # only perform DB item update for regular dumps (not at plugin shutdown)
-                        _update = (start, val, changed)
-
                     cur = self._db.cursor()
-                    id = self.id(item, cur=cur)
-
-                    # Dump tuples
-                    self.logger.debug('Dumping {}/{} with {} values'.format(item.property.path, id, len(tuples)))
-
-                    for t in tuples:
-                        if len(self.readLog(id, t[0], cur)):
-                            self.updateLog(id, t[0], t[1], t[2], item.type(), changed, cur)
-                        else:
-                            self.insertLog(id, t[0], t[1], t[2], item.type(), changed, cur)
-
-                    self.updateItem(id, _update[0], None, _update[1], item.type(), _update[2], cur)
-
+                    values += self._dump_item(item, tuples, _update, changed, cur)
                     cur.close()
                     cur = None
-
                     self._db.commit()
+                    self._item_ids_uncommitted = []
                 except Exception as e:
                     self.logger.warning("Problem dumping {}: {}".format(item.property.path, e))
                     try:
@@ -1514,14 +1796,125 @@ class Database(SmartPlugin):
                     except Exception as er:
                         self._buffer_insert(item, tuples)
                         self.logger.warning("Error rolling back: {}".format(er))
+                    self._forget_uncommitted_item_ids()
                 finally:
                     if cur is not None:
                         cur.close()
-                self._db.release()
-        self.logger.debug('Dump completed')
+                        cur = None
+        finally:
+            if cur is not None:
+                cur.close()
+            self._buffer_dumping = {}
+            self._db.release()
+
+        dump_end = time.time()
+        self._dump_stats = {'items': len(worklist), 'values': values,
+                            'duration': round((dump_end - dump_start) * 1000),
+                            'lock_duration': round((dump_end - lock_acquired) * 1000),
+                            'time': self.shtime.now()}
+        self.logger.debug("Dump completed: {values} values of {items} items in {duration} ms (database locked for {lock_duration} ms)".format(**self._dump_stats))
         self._dump_lock.release()
 
 
+    def _dump_prepare(self, item, tuples, finalize, changed):
+        """
+        Determine the values to write to the item table and add the current value to the tuples on finalize
+
+        :param item: item to dump
+        :param tuples: buffered tuples of the item (the current value is appended on finalize)
+        :param finalize: True, if the plugin is shutting down
+        :param changed: timestamp of the dump
+
+        :return: tuple (time, value, changed) for the update of the item table
+        """
+        # Get current values of item
+        start = self._timestamp(item.last_change())
+        end = changed
+        val = item()
+        try:
+            self._webdata[item.property.path].update({'value': val})
+            self._webdata[item.property.path].update({'type': item.property.type})
+        except Exception as e:
+            self.logger.warning("Problem webdata value update {}: {}".format(item.property.path, e))
+
+        # When finalizing (e.g. plugin shutdown) add current value to item and log
+        if finalize:
+
+            # When plugin is shutdown, by default, every registered item is rewritten into the DB no matter
+            # if it has been changed or not. This behavior is not wanted for items that are rarely updated
+            # because these database entries would lead indicate item updates that in reality aren't really there.
+            # Therefore, if item attribute database_write_on_shutdown is set to False, no double entries are written
+            # to the database and only the last entry is updated.
+
+            #self.logger.debug(f"DEBUG _dump: Finalizing item {item} with value {val}")
+            if self.get_iattr_value(item.conf, 'database_write_on_shutdown') == False:
+                self.logger.debug(f"DEBUG _dump: Blocking rewrite to DB for item {item} with value {val}")
+
+                #if item.property.path == 'xyz':
+                #    self.logger.warning(f"DEBUG _dump: update debug item with start {start}, val {val}, changed {changed}")
+
+                return (start, val, changed)
+
+            # Perform item update and rewrite current value to database:
+            tuples.append((start, end - start, val))
+            return (end, val, changed)
+
+        # only perform DB item update for regular dumps (not at plugin shutdown)
+        return (start, val, changed)
+
+
+    def _dump_item(self, item, tuples, _update, changed, cur):
+        """
+        Write the buffered tuples of an item to the log table and update the item table (without commit)
+
+        :return: number of written log records
+        """
+        id = self.id(item, cur=cur)
+
+        # Dump tuples
+        self.logger.debug('Dumping {}/{} with {} values'.format(item.property.path, id, len(tuples)))
+        self._write_logs(id, tuples, item.type(), changed, cur)
+        self.updateItem(id, _update[0], None, _update[1], item.type(), _update[2], cur)
+        if self._rollup and len(tuples) and item.type() in ['num', 'bool']:
+            if id not in self._rollup_from:
+                self._init_rollup_state(id, cur)
+            self._update_rollups(id, min(t[0] for t in tuples), max(t[0] for t in tuples), cur)
+        return len(tuples)
+
+
+    def _write_logs(self, id, tuples, it, changed, cur):
+        """
+        Insert or update log records for a list of (time, duration, value) tuples
+
+        If the database driver supports an UPSERT statement, all records are written with one
+        executemany call. Otherwise each record is checked with readLog and written by insertLog or updateLog.
+
+        :param id: Database ID of the item
+        :param tuples: list of (time, duration, value) tuples
+        :param it: The item type of the values ('str', 'num', 'bool')
+        :param changed: Time of change
+        :param cur: A database cursor object
+        """
+        if len(tuples) == 0:
+            return
+        query = self._upsert_log.get(self._upsert_style)
+        if query is None:
+            for t in tuples:
+                if len(self.readLog(id, t[0], cur)):
+                    self.updateLog(id, t[0], t[1], t[2], it, changed, cur)
+                else:
+                    self.insertLog(id, t[0], t[1], t[2], it, changed, cur)
+            return
+
+        # readLog/updateLog semantics: for multiple values with the same timestamp, the last one wins
+        records = {}
+        for t in tuples:
+            params = {'id': id, 'time': t[0], 'changed': changed, 'duration': t[1]}
+            params.update(self._item_value_tuple(it, t[2]))
+            records[t[0]] = params
+        self._executemany(query, list(records.values()), cur=cur)
+
+
     def _buffer_insert(self, item, tuples):
         self._buffer_lock.acquire()
         if item in self._buffer:
@@ -1532,12 +1925,231 @@ class Database(SmartPlugin):
         return tuples
 
 
-    def _buffer_remove(self, item):
-        self._buffer_lock.acquire()
-        tuples = self._buffer[item]
-        self._buffer[item] = self._buffer[item][len(tuples):]
-        self._buffer_lock.release()
-        return tuples
+    def _buffer_snapshot(self, item):
+        """
+        Get the values of an item, which have not been written to the database yet
+
+        :param item: item to get the buffered values for
+        :return: list of (time, duration, value) tuples sorted by time (later tuples replace tuples with the same time)
+        """
+        with self._buffer_lock:
+            tuples = self._buffer_dumping.get(item, []) + self._buffer.get(item, [])
+        records = {t[0]: t for t in tuples}
+        return [records[t] for t in sorted(records)]
+
+
+    def _buffer_remove(self, items, finalize=False):
+        """
+        Remove the values of items from the buffer for dumping
+
+        The removed values are kept in _buffer_dumping within the same lock, so read queries see them until
+        they are committed.
+
+        :param items: items to remove the buffered values for
+        :param finalize: also return items without buffered values
+        :return: list of (item, tuples)
+        """
+        worklist = []
+        with self._buffer_lock:
+            for item in items:
+                tuples = self._buffer[item]
+                self._buffer[item] = []
+                if len(tuples) or finalize:
+                    worklist.append((item, tuples))
+            self._buffer_dumping = {item: list(tuples) for item, tuples in worklist}
+        return worklist
+
+
+    # ------------------------------------------
+    #    Rollups (pre-aggregated log data)
+    # ------------------------------------------
+
+    def _rollup_period(self, id, istart, iend, step):
+        """
+        Select the coarsest rollup period which still meets the requested step
+
+        :param id: database id of the item
+        :param istart: start of the requested range
+        :param iend: end of the requested range
+        :param step: requested step (in milliseconds)
+
+        :return: rollup period (in milliseconds) or None, if the raw log data has to be used
+        """
+        if not self._rollup or id is None:
+            return None
+        rollup_from = self._rollup_from.get(id)
+        if rollup_from is None or istart < rollup_from:
+            return None
+        for period in ROLLUP_PERIODS:
+            if step >= period and iend - istart >= period:
+                return period
+        return None
+
+
+    def _rollup_range(self, id, period, params):
+        """
+        Determine the buckets of a period, whose rollups can be used for a query
+
+        Only buckets which lie completely within the requested range are used. The bucket of the last log record
+        before the end of the range is read from the log table, since the duration of that record has to be
+        clipped at the end of the range. Buckets including buffered values are read from the log table as well.
+
+        :param id: database id of the item
+        :param period: rollup period (in milliseconds)
+        :param params: parameters of the query (time_start, time_end and buffer_start), the parameters
+                       period, rollup_start and rollup_end are added
+
+        :return: True, if there is at least one bucket to be read from the rollups
+        """
+        istart = params['time_start']
+        iend = params['time_end']
+        rollup_start = istart - istart % period + (period if istart % period else 0)
+        row = self._fetchone("SELECT MAX(time) FROM {log} WHERE item_id = :id AND time < :time_end;",
+                             {'id': id, 'time_end': iend - iend % period}, read=True)
+        if row is None or row[0] is None:
+            return False
+        rollup_end = row[0] - row[0] % period
+        if 'buffer_start' in params:
+            rollup_end = min(rollup_end, params['buffer_start'] - params['buffer_start'] % period)
+        if rollup_end <= rollup_start:
+            return False
+        params.update({'period': period, 'rollup_start': rollup_start, 'rollup_end': rollup_end})
+        return True
+
+
+    def _init_rollup_state(self, id, cur=None):
+        """
+        Determine from which time on the rollups of an item are complete
+
+        Rollups are complete for whole days only. Rollups for older log data are built by _build_rollups.
+
+        :param id: database id of the item
+        :param cur: A database cursor object if available (optional)
+        """
+        oldest = self.readOldestLog(id, cur=cur)
+        if oldest is None:
+            self._rollup_from[id] = 0
+            return
+        self._rollup_oldest[id] = oldest - oldest % ROLLUP_DAY
+
+        row = self._fetchone("SELECT MIN(time) FROM {rollup} WHERE item_id = :id AND period = :period;",
+                             {'id': id, 'period': ROLLUP_HOUR}, cur=cur)
+        if row is None or row[0] is None:
+            latest = self.readLatestLog(id, cur=cur)
+            rollup_from = latest - latest % ROLLUP_DAY + ROLLUP_DAY
+        elif row[0] <= oldest:
+            rollup_from = 0
+        else:
+            rollup_from = row[0] - row[0] % ROLLUP_DAY + ROLLUP_DAY
+        if rollup_from <= self._rollup_oldest[id]:
+            rollup_from = 0
+        self._rollup_from[id] = rollup_from
+
+
+    def _has_rollups(self, id, cur=None):
+        """
+        Check if rollups are maintained or have been built for an item
+
+        Rollups built in a previous run have to be updated on deletions, even if the item has not been dumped yet.
+
+        :param id: database id of the item
+        :param cur: A database cursor object if available (optional)
+        """
+        if not self._rollup:
+            return False
+        if id in self._rollup_from:
+            return True
+        row = self._fetchone("SELECT MIN(time) FROM {rollup} WHERE item_id = :id;", {'id': id}, cur=cur)
+        return row is not None and row[0] is not None
+
+
+    def _delete_rollups(self, id, cur=None):
+        """
+        Delete all rollups of an item, they are rebuilt by _build_rollups after the next dump of the item
+
+        :param id: database id of the item
+        :param cur: A database cursor object if available (optional)
+        """
+        self._rollup_from.pop(id, None)
+        self._rollup_oldest.pop(id, None)
+        self._execute("DELETE FROM {rollup} WHERE item_id = :id;", {'id': id}, cur=cur)
+
+
+    def _update_rollups(self, id, time_start, time_end, cur=None):
+        """
+        Recompute the rollups of all buckets which contain log data between time_start and time_end
+
+        Hourly rollups are computed from the log table, daily rollups from the hourly rollups.
+
+        :param id: database id of the item
+        :param time_start: start of the changed range (timestamp in milliseconds)
+        :param time_end: end of the changed range (timestamp in milliseconds)
+        :param cur: A database cursor object if available (optional)
+        """
+        bucket = self._rollup_bucket[self._upsert_style]
+        columns = "item_id, period, time, val_min, val_max, val_sum, val_count, duration, val_integral, val_bool_duration"
+
+        hour_start = time_start - time_start % ROLLUP_HOUR
+        hour_end = time_end - time_end % ROLLUP_HOUR + ROLLUP_HOUR
+        params = {'id': id, 'period': ROLLUP_HOUR, 'time_start': hour_start, 'time_end': hour_end}
+        self._execute("DELETE FROM {rollup} WHERE item_id = :id AND period = :period AND time >= :time_start AND time < :time_end;", params, cur=cur)
+        self._execute("INSERT INTO {rollup}(" + columns + ") "
+                      "SELECT :id, :period, " + bucket.format(period=ROLLUP_HOUR) + ", MIN(val_num), MAX(val_num), SUM(val_num), COUNT(*), SUM(duration), SUM(val_num * duration), SUM(val_bool * duration) "
+                      "FROM {log} WHERE item_id = :id AND time >= :time_start AND time < :time_end "
+                      "GROUP BY " + bucket.format(period=ROLLUP_HOUR) + ";", params, cur=cur)
+
+        day_start = time_start - time_start % ROLLUP_DAY
+        day_end = time_end - time_end % ROLLUP_DAY + ROLLUP_DAY
+        params = {'id': id, 'period': ROLLUP_DAY, 'hour': ROLLUP_HOUR, 'time_start': day_start, 'time_end': day_end}
+        self._execute("DELETE FROM {rollup} WHERE item_id = :id AND period = :period AND time >= :time_start AND time < :time_end;", params, cur=cur)
+        self._execute("INSERT INTO {rollup}(" + columns + ") "
+                      "SELECT :id, :period, " + bucket.format(period=ROLLUP_DAY) + ", MIN(val_min), MAX(val_max), SUM(val_sum), SUM(val_count), SUM(duration), SUM(val_integral), SUM(val_bool_duration) "
+                      "FROM {rollup} WHERE item_id = :id AND period = :hour AND time >= :time_start AND time < :time_end "
+                      "GROUP BY " + bucket.format(period=ROLLUP_DAY) + ";", params, cur=cur)
+
+
+    def _build_rollups(self):
+        """
+        Build rollups for log data which has been written before rollups were maintained
+
+        Works backwards in chunks of ROLLUP_BUILD_CHUNK for ROLLUP_BUILD_TIME seconds per run.
+
+        Called by scheduler
+        """
+        worklist = [id for id, rollup_from in self._rollup_from.items() if rollup_from > 0]
+        if len(worklist) == 0 or not self._db_maint.connected():
+            return
+
+        started = time.time()
+        for id in worklist:
+            while self._rollup_from.get(id, 0) > 0:
+                if time.time() - started > ROLLUP_BUILD_TIME:
+                    return
+                # the first chunk covers today, whose rollups are updated by _dump as well; skip this run while
+                # _dump is active instead of waiting
+                if not self._dump_lock.acquire(blocking=False):
+                    return
+                try:
+                    # deleteLog may have removed the item in the meantime
+                    time_end = self._rollup_from.get(id, 0)
+                    if time_end <= 0:
+                        break
+                    oldest = self._rollup_oldest.get(id, 0)
+                    time_start = max(time_end - ROLLUP_BUILD_CHUNK, oldest)
+                    cur = self._db_maint.cursor()
+                    self._update_rollups(id, time_start, time_end - 1, cur=cur)
+                    cur.close()
+                    self._db_maint.commit()
+                    if id in self._rollup_from:
+                        self._rollup_from[id] = 0 if time_start <= oldest else time_start
+                except Exception as e:
+                    self.logger.error(f"_build_rollups: Error building rollups for item id {id}: {e}")
+                    return
+                finally:
+                    self._dump_lock.release()
+            if id in self._rollup_from:
+                self.logger.info(f"_build_rollups: Rollups for item id {id} are complete")
+        return
 
 
     # ------------------------------------------
@@ -1638,8 +2250,13 @@ class Database(SmartPlugin):
         # to prevent from database lockups after setting database_maxage to old/ancient items
         if count_log_records_to_delete > self.max_delete_logentries:
             time_start_deletion = time.time()
+            self._invalidate_series_cache(item_id)
             cur = self._db.cursor()
             self._execute(self._prepare("DELETE FROM {log} WHERE item_id = :id ORDER BY time ASC LIMIT :maxrecords;"), {'id': item_id, 'maxrecords': self.max_delete_logentries}, cur=cur)
+            if self._has_rollups(item_id, cur=cur):
+                # recompute the rollups up to the bucket of the oldest remaining log record
+                oldest = self.readOldestLog(item_id, cur=cur)
+                self._update_rollups(item_id, 0, self._timestamp(self.shtime.now()) if oldest is None else oldest, cur=cur)
             cur.close()
             time_used_for_deletion = time.time() - time_start_deletion
             self.logger.info(f"remove_older_: {itempath} deleted {max_delete_logentries_str} of {count_log_records_to_delete_str} log entries - took {time_used_for_deletion:.2f} seconds, averaging {100*time_used_for_deletion/self.max_delete_logentries:.4f} seconds per 100 entries")
@@ -1725,6 +2342,9 @@ class Database(SmartPlugin):
             if not self._db_initialized:
                 self._db.setup(
                     {i: [self._prepare(query[0]), self._prepare(query[1])] for i, query in self._setup.items()})
+                if self._read_pool is not None and self.driver.lower() == 'sqlite3':
+                    # WAL mode allows the read connections to query, while the main connection is writing
+                    self._db.execute("PRAGMA journal_mode=WAL;")
                 self._db_initialized = True
         except Exception as e:
             if self.driver.lower() == 'sqlite3':
@@ -1767,23 +2387,88 @@ class Database(SmartPlugin):
 
 
     def _prepare(self, query):
-        return query.format(**self._replace)
+        prepared = self._prepared.get(query)
+        if prepared is None:
+            prepared = query.format(**self._replace)
+            if len(self._prepared) >= MAX_PREPARED_QUERIES:
+                self._prepared.clear()
+            self._prepared[query] = prepared
+        return prepared
 
 
     def _execute(self, query, params, cur=None):
         self._query(self._db.execute, query, params, cur)
 
 
-    def _fetchone(self, query, params={}, cur=None):
+    def _executemany(self, query, params_list, cur):
+        query = self._prepare(query)
+        format_query = getattr(self._db, '_format', None)
+        if format_query is None:
+            # lib.db without access to the driver specific parameter format: execute statements one by one
+            for params in params_list:
+                self._db.execute(query, params, cur=cur)
+        else:
+            cur.executemany(format_query(query), params_list)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Database: Executed {} for {} records".format(query, len(params_list)))
+
+
+    def _fetchone(self, query, params={}, cur=None, read=False):
+        if read and cur is None and self._read_pool is not None:
+            return self._read_query('fetchone', query, params)
         tuples = self._query(self._db.fetchone, query, params, cur)
         return tuples
 
 
-    def _fetchall(self, query, params={}, cur=None):
-        tuples = self._query(self._db.fetchall, query, params, cur)
+    def _fetchall(self, query, params={}, cur=None, read=False):
+        if read and cur is None and self._read_pool is not None:
+            tuples = self._read_query('fetchall', query, params)
+        else:
+            tuples = self._query(self._db.fetchall, query, params, cur)
         return None if tuples is None else list(tuples)
 
 
+    def _read_query(self, method, query, params):
+        """
+        Execute a read query on a connection of the pool of read connections
+
+        :param method: name of the lib.db method to call ('fetchone' or 'fetchall')
+        """
+        wait_start = time.time()
+        try:
+            db = self._read_pool.get(timeout=300)
+        except queue.Empty:
+            db = None
+        self._lock_wait('read', time.time() - wait_start)
+        if db is None:
+            self.logger.error("Database: Can't query due to no read connection available")
+            return None
+
+        try:
+            if not db.connected():
+                db.connect()
+            query = self._prepare(query)
+            tuples = getattr(db, method)(query, params)
+            # end the transaction, so the next query sees the data committed by the main connection
+            db.commit()
+        except Exception as e:
+            self.logger.error("Database: Error for read query {}: {}".format(query, e))
+            raise e
+        finally:
+            self._read_pool.put(db)
+        return tuples
+
+
+    def _lock_wait(self, kind, seconds):
+        """
+        Record the time waited for the main connection ('write') or a read connection ('read')
+        """
+        stats = self._lock_stats[kind]
+        stats['count'] += 1
+        stats['total'] += seconds
+        stats['max'] = max(stats['max'], seconds)
+
+
     def _query(self, func, query, params, cur=None):
         if not self._initialize_db():
             return None
@@ -1791,24 +2476,37 @@ class Database(SmartPlugin):
             if self._db.verify(5) == 0:
                 self.logger.error("Database: Connection not recovered")
                 return None
-            if not self._db.lock(300):
+            wait_start = time.time()
+            locked = self._db.lock(300)
+            self._lock_wait('write', time.time() - wait_start)
+            if not locked:
                 self.logger.error("Database: Can't query due to fail to acquire lock")
                 return None
         query = self._prepare(query)
-        query_readable = re.sub(r':([a-z_]+)', r'{\1}', query).format(**params)
         tuples = None
         try:
-            tuples = func(self._prepare(query), params, cur=cur)
+            tuples = func(query, params, cur=cur)
         except Exception as e:
-            self.logger.error("Database: Error for query {}: {}".format(query_readable, e))
+            self.logger.error("Database: Error for query {}: {}".format(self._query_readable(query, params), e))
             raise e
         finally:
             if cur is None:
                 self._db.release()
-        self.logger.debug("Database: Fetch {}: {}".format(query_readable, tuples))
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Database: Fetch {}: {}".format(self._query_readable(query, params), tuples))
         return tuples
 
 
+    def _query_readable(self, query, params):
+        """
+        Get a query with the parameters filled in (for logging)
+        """
+        try:
+            return re.sub(r':([a-z_]+)', r'{\1}', query).format(**params)
+        except Exception:
+            return "{} with {}".format(query, params)
+
+
     # ------------------------------------------
     #    conversion routines
     # ------------------------------------------
@@ -43,3 +43,20 @@ COL_LOG_VAL_NUM = 4
 COL_LOG_VAL_BOOL = 5
 COL_LOG_CHANGED = 6
 
+
+# Constants for rollup table (periods in milliseconds, coarsest period first)
+ROLLUP_HOUR = 3600 * 1000
+ROLLUP_DAY = 24 * ROLLUP_HOUR
+ROLLUP_PERIODS = (ROLLUP_DAY, ROLLUP_HOUR)
+ROLLUP_BUILD_CHUNK = 7 * ROLLUP_DAY     # log data range to build rollups for in one step of _build_rollups
+ROLLUP_BUILD_TIME = 2                   # maximum time (in seconds) for one run of _build_rollups
+
+# Constants for series cache
+SERIES_CACHE_FUNCS = ('avg', 'integrate', 'count', 'countall', 'min', 'max', 'on', 'sum', 'raw')
+SERIES_CACHE_TUPLE_SIZE = 120           # estimated memory usage (in bytes) of one cached (time, value) tuple
+
+# Maximum number of buffered values of an item, which are merged into the results of a read query
+MAX_BUFFER_MERGE = 200
+
+# Maximum number of prepared queries to cache
+MAX_PREPARED_QUERIES = 500
@@ -32,11 +32,13 @@ import time
 import re
 import queue
 import pickle
+import threading
 import operator
+import numpy as np
 from dateutil.relativedelta import relativedelta
 from typing import Union, List, Dict
 from dataclasses import dataclass, InitVar
-from collections import deque
+from collections import deque, OrderedDict
 
 from lib.model.smartplugin import SmartPlugin
 from lib.item import Items
@@ -81,10 +83,16 @@ class DatabaseAddOn(SmartPlugin):
         self.current_values = {}                    # Dict to hold min and max value of current day / week / month / year for items
         self.previous_values = {}                   # Dict to hold value of end of last day / week / month / year for items
         self.item_cache = {}                        # Dict to hold item_id, oldest_log_ts and oldest_entry for items
-        self.value_list_raw_data = {}               # Dict to hold value list raw data
+        self.value_list_raw_data = None             # RawDataCache to hold value list raw data
+        self.query_cache = {}                       # Dict to hold query results for past timeframes of current calculation run
+        self.point_value_cache = {}                 # Dict to hold last value before timestamp of current calculation run
+        self.temp_sum_cache = {}                    # Dict to hold values per completed day for temperature sums and day counts
+        self._temp_sum_cache_locks = {}             # Dict to hold a lock per key of temp_sum_cache, since items sharing a key may be calculated by several workers
 
         # define variables for database, database connection, working queue and status
+        self._thread_data = threading.local()        # database object and connect time of worker threads
         self.item_queue = queue.Queue()              # Queue containing all to be executed items
+        self.workers = []                            # List of dicts holding queue, thread and statistics of workers
         self.update_item_delay_deque = deque()       # Deque for delay working of updated item values
         self._db_plugin = None                       # object if database plugin
         self._db = None                              # object of database
@@ -94,7 +102,6 @@ class DatabaseAddOn(SmartPlugin):
         self.item_attribute_search_str = 'database'  # attribute, on which an item configured for database can be identified
         self.last_connect_time = 0                   # mechanism for limiting db connection requests
         self.alive = None                            # Is plugin alive?
-        self.active_queue_item: str = '-'            # String holding item path of currently executed item
         self.onchange_delay_time = 30                # delay time in seconds between change of database item start of reevaluation of db_addon item
         self.database_item_list = []                 # list of needed database items
 
@@ -111,6 +118,8 @@ class DatabaseAddOn(SmartPlugin):
         self.optimize_value_filter = self.get_parameter_value('optimize_value_filter')
         self.use_oldest_entry = self.get_parameter_value('use_oldest_entry')
         self.lock_db_for_query = self.get_parameter_value('lock_db_for_query')
+        self.worker_count = self.get_parameter_value('worker_count')
+        self.value_list_raw_data = RawDataCache(self.get_parameter_value('raw_data_cache_size') * 1024 * 1024)
 
         # path and filename for data storage
         data_storage_file = 'db_addon_data'
@@ -175,7 +184,8 @@ class DatabaseAddOn(SmartPlugin):
         # set plugin to alive
         self.alive = True
 
-        # work item queue
+        # start workers and dispatch item queue
+        self._start_workers()
         self.work_item_queue()
 
     def stop(self):
@@ -188,6 +198,9 @@ class DatabaseAddOn(SmartPlugin):
         # set plugin to alive
         self.alive = False
 
+        # stop workers
+        self._stop_workers()
+
         # let the plugin change the state of pause_item
         if self._pause_item:
             self._pause_item(True, self.get_fullname())
@@ -853,8 +866,14 @@ class DatabaseAddOn(SmartPlugin):
         current_values = raw_data.get('current_values')
         previous_values = raw_data.get('previous_values')
         item_cache = raw_data.get('item_cache')
+        temp_sum_cache = raw_data.get('temp_sum_cache')
         stop_time = raw_data.get('stop_time')
 
+        # values of completed days do not expire; entries for periods starting before last year are dropped
+        if isinstance(temp_sum_cache, dict):
+            first_year = self.shtime.today(offset=0).year - 1
+            self.temp_sum_cache = {key: entry for key, entry in temp_sum_cache.items() if int(key[2][:4]) >= first_year}
+
         if not stop_time or (int(time.time()) - stop_time) > self.pickle_data_validity_time:
             self.logger.info("Data for db_addon read from pickle are expired. Start with empty cache.")
             return
@@ -886,6 +905,7 @@ class DatabaseAddOn(SmartPlugin):
         self._save_pickle({'current_values': clean_items_2(self.current_values),
                            'previous_values': clean_items_2(self.previous_values),
                            'item_cache': clean_items_1(self.item_cache),
+                           'temp_sum_cache': self.temp_sum_cache,
                            'stop_time': int(time.time())})
 
     #########################################
@@ -929,7 +949,7 @@ class DatabaseAddOn(SmartPlugin):
                 # cache dict leeren
                 self.current_values[DAY] = {}
                 self.previous_values[DAY] = {}
-                self.value_list_raw_data = {}
+                self.value_list_raw_data.clear()
                 # reset Item-Wert alle onchange
                 _reset_items.update(set(self._onchange_daily_items()))
 
@@ -1000,33 +1020,101 @@ class DatabaseAddOn(SmartPlugin):
         if option != 'item':
             todo_items = list(set(todo_items) - set(suspended_items))
 
-        # put to queue
+        # reset query cache of previous calculation run
+        self.query_cache = {}
+        self.point_value_cache = {}
+
+        # put to queue; list of all items first to let the query planner prefetch shared values
         self.logger.info(f"{len(todo_items)} items will be calculated for {option=}.")
         if self.debug_log.execute:
             self.logger.debug(f"Items to be calculated: {todo_items=}")
+        if len(todo_items) > 1:
+            self.item_queue.put(list(todo_items))
         [self.item_queue.put(i) for i in todo_items]
         return True
 
     def work_item_queue(self) -> None:
-        """Handles item queue were all to be executed items were be placed in."""
+        """Handles item queue were all to be executed items were be placed in and dispatches the items to the workers."""
 
         while self.alive:
             try:
                 queue_entry = self.item_queue.get(True, 10)
                 self.logger.debug(f"{queue_entry=}")
             except queue.Empty:
-                self.active_queue_item = '-'
                 pass
             else:
-                if isinstance(queue_entry, tuple):
-                    item, value = queue_entry
-                    self.logger.info(f"# {self.item_queue.qsize() + 1} item(s) to do. || 'onchange' item={item.property.path} with {value=} will be processed.")
-                    self.active_queue_item = str(item.property.path)
-                    self.handle_onchange(item, value)
-                else:
-                    self.logger.info(f"# {self.item_queue.qsize() + 1} item(s) to do. || 'on-demand' item={queue_entry.property.path} will be processed.")
-                    self.active_queue_item = str(queue_entry.property.path)
-                    self.handle_ondemand(queue_entry)
+                if isinstance(queue_entry, list):
+                    self._plan_queries(queue_entry)
+                    continue
+
+                # entries of the same item are always dispatched to the same worker to be processed in order
+                item = queue_entry[0] if isinstance(queue_entry, tuple) else queue_entry
+                workers = self.workers
+                if workers:
+                    workers[hash(item.property.path) % len(workers)]['queue'].put(queue_entry)
+
+    def work_worker_queue(self, worker: dict) -> None:
+        """Handles queue of a worker, using an own database connection"""
+
+        self._thread_data.db = lib.db.Database("DatabaseAddOn", self.db_driver, self.connection_data)
+        self._thread_data.last_connect_time = 0
+
+        try:
+            while self.alive:
+                try:
+                    queue_entry = worker['queue'].get(True, 10)
+                except queue.Empty:
+                    worker['active_item'] = '-'
+                    continue
+
+                if queue_entry is None:
+                    break
+
+                _start = time.time()
+                try:
+                    if isinstance(queue_entry, tuple):
+                        item, value = queue_entry
+                        self.logger.info(f"# {self.queue_backlog() + 1} item(s) to do. || 'onchange' item={item.property.path} with {value=} will be processed by {worker['name']}.")
+                        worker['active_item'] = str(item.property.path)
+                        self.handle_onchange(item, value)
+                    else:
+                        self.logger.info(f"# {self.queue_backlog() + 1} item(s) to do. || 'on-demand' item={queue_entry.property.path} will be processed by {worker['name']}.")
+                        worker['active_item'] = str(queue_entry.property.path)
+                        self.handle_ondemand(queue_entry)
+                except Exception as e:
+                    self.logger.error(f"Error '{e}' occurred while processing {queue_entry} by {worker['name']}.")
+
+                worker['done'] += 1
+                worker['busy'] += time.time() - _start
+                if worker['queue'].empty():
+                    worker['active_item'] = '-'
+        finally:
+            worker['active_item'] = '-'
+            self._thread_data.db.close()
+
+    def _start_workers(self) -> None:
+        """Start worker threads"""
+
+        self.workers = []
+        for i in range(self.worker_count):
+            worker = {'name': f"worker{i + 1}", 'queue': queue.Queue(), 'active_item': '-', 'done': 0, 'busy': 0.0}
+            worker['thread'] = threading.Thread(target=self.work_worker_queue, args=(worker,), name=f"{self.get_fullname()}.{worker['name']}", daemon=True)
+            worker['thread'].start()
+            self.workers.append(worker)
+        self.logger.info(f"{len(self.workers)} worker(s) started.")
+
+    def _stop_workers(self) -> None:
+        """Stop worker threads; items not processed yet are put back to the item queue"""
+
+        workers = self.workers
+        self.workers = []
+        for worker in workers:
+            while not worker['queue'].empty():
+                try:
+                    self.item_queue.put(worker['queue'].get_nowait())
+                except queue.Empty:
+                    break
+            worker['queue'].put(None)
 
     def work_update_item_delay_deque(self):
         """check if entries in update_item_delay_deque are due, if so put it to working queue"""
@@ -1330,7 +1418,47 @@ class DatabaseAddOn(SmartPlugin):
         return self.logger.getEffectiveLevel()
 
     def queue_backlog(self) -> int:
-        return self.item_queue.qsize()
+        return self.item_queue.qsize() + sum(worker['queue'].qsize() for worker in self.workers)
+
+    @property
+    def active_queue_item(self) -> str:
+        active_items = [worker['active_item'] for worker in self.workers if worker['active_item'] != '-']
+        return ', '.join(active_items) if active_items else '-'
+
+    def worker_stats(self) -> list:
+        """Returns name, active item, number of processed items and throughput in items per second of busy time for all workers"""
+
+        return [{'name': worker['name'],
+                 'active_item': worker['active_item'],
+                 'done': worker['done'],
+                 'backlog': worker['queue'].qsize(),
+                 'rate': round(worker['done'] / worker['busy'], 2) if worker['busy'] else 0}
+                for worker in self.workers]
+
+    def raw_data_cache_stats(self) -> dict:
+        """Returns entries, size, hits, misses and evictions of raw data cache"""
+
+        return self.value_list_raw_data.stats()
+
+    @property
+    def _db(self):
+        """database object of the worker thread, otherwise the database object of the plugin"""
+        return getattr(self._thread_data, 'db', self._plugin_db)
+
+    @_db.setter
+    def _db(self, db):
+        self._plugin_db = db
+
+    @property
+    def last_connect_time(self) -> float:
+        return getattr(self._thread_data, 'last_connect_time', self._plugin_last_connect_time)
+
+    @last_connect_time.setter
+    def last_connect_time(self, value: float):
+        if hasattr(self._thread_data, 'last_connect_time'):
+            self._thread_data.last_connect_time = value
+        else:
+            self._plugin_last_connect_time = value
 
     def db_version(self) -> str:
         return self._get_db_version()
@@ -1591,12 +1719,7 @@ class DatabaseAddOn(SmartPlugin):
 
         # define start, end for verbrauch_jahreszeitraum_timedelta like 'verbrauch_jahreszeitraum_minus1'
         if 'timedelta' in query_params:
-            timedelta = query_params.pop('timedelta')
-            today = self.shtime.today(offset=0)
-            start_date = self.shtime.beginning_of_year(offset=-timedelta)
-            end_date = today - relativedelta(years=timedelta)
-            start = (today - start_date).days
-            end = (today - end_date).days
+            start, end = self._get_start_end_for_timedelta(query_params.pop('timedelta'))
             query_params.update({'start': start, 'end': end})
 
         # calculate consumption
@@ -1643,6 +1766,14 @@ class DatabaseAddOn(SmartPlugin):
 
         return consumption
 
+    def _get_start_end_for_timedelta(self, timedelta: int) -> tuple:
+        """Provides start and end in days for the timeframe from beginning of the year until today, timedelta years ago"""
+
+        today = self.shtime.today(offset=0)
+        start_date = self.shtime.beginning_of_year(offset=-timedelta)
+        end_date = today - relativedelta(years=timedelta)
+        return (today - start_date).days, (today - end_date).days
+
     def _handle_verbrauch_serie(self, query_params: dict) -> list:
         """Ermittlung einer Serie von Verbräuchen in einem Zeitraum für x Zeiträume"""
 
@@ -1807,160 +1938,70 @@ class DatabaseAddOn(SmartPlugin):
         if not params:
             params = dict()
 
-        def kaeltesumme() -> Union[list, float, None]:
-            """Berechnung der Kältesumme durch Akkumulieren aller negativen Tagesdurchschnittstemperaturen im Abfragezeitraum
+        def _accumulate(day_values: np.ndarray, total_factor: int = 1) -> Union[list, int]:
+            """Provides the result as total value or as list of values per day or month
 
                 result 'total': Rückgabe als Gesamtwert
                 result 'month': Rückgabe als Liste mit kumulierten Werten pro Monat [['timestamp1', 'kumulierter Wert am Ende von Monat1'], ['timestamp2', ''kumulierter Wert am Ende von Monat2', [...], ...]
                 result 'day': Rückgabe als Liste mit kumulierten Werten pro Tag [['timestamp1', 'kumulierter Wert am Ende von Tag1'], ['timestamp2', ''kumulierter Wert am Ende von Tag2', [...], ...]
             """
 
-            # define defaults
-            ks_total = 0
-            ks_serie_day = []
-            ks_serie_month = {}
-
             # get result type
             result = params.get('result', 'total')
 
-            # akkumulieren alle Werte, kleiner 0
-            for entry in raw_data:
-                timestamp, value = entry
-
-                # limit values to negtive values
-                ks_day = min(0, value)
+            if result == 'day':
+                return [[timestamp, round(value, 1)] for timestamp, value in zip(timestamps, day_values.tolist())]
 
-                # create total value of kaeltesumme
-                ks_total -= ks_day
+            elif result == 'month':
+                month_timestamps = [self._datetime_to_timestamp(datetime.datetime.fromtimestamp(timestamp).replace(day=1, minute=0, hour=0)) for timestamp in timestamps]
+                keys, inverse = np.unique(month_timestamps, return_inverse=True)
+                month_values = np.bincount(inverse, weights=day_values, minlength=len(keys))
+                return [[int(k), round(v, 1)] for k, v in zip(keys.tolist(), month_values.tolist())]
 
-                # create series kaeltesumme per day
-                ks_serie_day.append([timestamp, round(ks_day, 1)])
+            # cumsum adds sequentially like a loop would do
+            total = np.cumsum(day_values)[-1] if len(day_values) else 0
+            return int(round(total_factor * float(total), 0))
 
-                # create series kaeltesumme per month
-                _dt = datetime.datetime.fromtimestamp(timestamp)
-                _dt = _dt.replace(day=1, minute=0, hour=0)
-                _timestamp = self._datetime_to_timestamp(_dt)
-                ks_serie_month[_timestamp] = ks_serie_month.get(_timestamp, 0) + ks_day
+        def kaeltesumme() -> Union[list, float, None]:
+            """Berechnung der Kältesumme durch Akkumulieren aller negativen Tagesdurchschnittstemperaturen im Abfragezeitraum"""
 
-            # return result
-            if result == 'day':
-                return ks_serie_day
-            elif result == 'month':
-                return [[k, round(v, 1)] for k, v in ks_serie_month.items()]
-            return int(round(ks_total, 0))
+            # limit values to negative values
+            return _accumulate(np.minimum(0, values[:, 0]), total_factor=-1)
 
         def waermesumme() -> Union[list, float, None]:
             """Berechnung der Wärmesumme durch Akkumulieren aller Tagesdurchschnittstemperaturen im Abfragezeitraum, die größer/gleich dem Schwellenwert sind
 
                 threshold: Schwellwert
-                result 'total': Rückgabe als Gesamtwert
-                result 'month': Rückgabe als Liste mit kumulierten Werten pro Monat [['timestamp1', 'kumulierter Wert am Ende von Monat1'], ['timestamp2', ''kumulierter Wert am Ende von Monat2', [...], ...]
-                result 'day': Rückgabe als Liste mit kumulierten Werten pro Tag [['timestamp1', 'kumulierter Wert am Ende von Tag1'], ['timestamp2', ''kumulierter Wert am Ende von Tag2', [...], ...]
             """
-        
+
             # get threshold and set to min 0
             threshold = max(params.get('threshold', 10), 0)
 
-            # get result type
-            result = params.get('result', 'total')
-
-            # define defaults
-            ws_total = 0
-            ws_serie_day = []
-            ws_serie_month = {}
-
-            # akkumulieren alle Werte, größer/gleich Schwellenwert
-            for entry in raw_data:
-                timestamp, value = entry
-
-                # limit values per threshold
-                ws_day = value if value >= threshold else 0
-
-                # create total value of waermesumme
-                ws_total += ws_day
-
-                # create series kaeltesumme per day
-                ws_serie_day.append([timestamp, round(ws_day, 1)])
-
-                # create series kaeltesumme per month
-                _dt = datetime.datetime.fromtimestamp(timestamp)
-                _dt = _dt.replace(day=1, minute=0, hour=0)
-                _timestamp = self._datetime_to_timestamp(_dt)
-                ws_serie_month[_timestamp] = ws_serie_month.get(_timestamp, 0) + ws_day
-
-            # return result
-            if result == 'day':
-                return ws_serie_day
-            elif result == 'month':
-                return [[k, round(v, 1)] for k, v in ws_serie_month.items()]
-            return int(round(ws_total, 0))
+            # limit values per threshold
+            return _accumulate(np.where(values[:, 0] >= threshold, values[:, 0], 0))
 
         def gruenlandtempsumme() -> Union[list, float, None]:
-            """Berechnung der Grünlandtemperatursumme durch Akkumulieren alle positiven Tagesmitteltemperaturen, im Januar gewichtet mit 50%, im Februar mit 75%
-
-                result 'total': Rückgabe als Gesamtwert
-                result 'month': Rückgabe als Liste mit kumulierten Werten pro Monat [['timestamp1', 'kumulierter Wert am Ende von Monat1'], ['timestamp2', ''kumulierter Wert am Ende von Monat2', [...], ...]
-                result 'day': Rückgabe als Liste mit kumulierten Werten pro Tag [['timestamp1', 'kumulierter Wert am Ende von Tag1'], ['timestamp2', ''kumulierter Wert am Ende von Tag2', [...], ...]
-            """
-            # define defaults
-            gts_total = 0
-            gts_serie_day = []
-            gts_serie_month = {}
-
-            # get result type
-            result = params.get('result', 'total')
-
-            # accumulate value
-            for entry in raw_data:
-                timestamp, value = entry
-
-                # limit values to positive values
-                gts_day = max(0, value)
+            """Berechnung der Grünlandtemperatursumme durch Akkumulieren alle positiven Tagesmitteltemperaturen, im Januar gewichtet mit 50%, im Februar mit 75%"""
 
-                # degrade values for january and february
-                dt = self._timestamp_to_datetime(timestamp / 1000)
-                if dt.month == 1:
-                    gts_day = gts_day * 0.5
-                elif dt.month == 2:
-                    gts_day = gts_day * 0.75
+            # degrade values for january and february
+            months = np.array([self._timestamp_to_datetime(timestamp).month for timestamp in timestamps], dtype=int)
+            weights = np.select([months == 1, months == 2], [0.5, 0.75], 1)
 
-                # create total value of gruenlandtempsumme
-                gts_total += gts_day
-
-                # create series gruenlandtempsumme per day
-                gts_serie_day.append([timestamp, round(gts_day, 1)])
-
-                # create series gruenlandtempsumme per month
-                _dt = datetime.datetime.fromtimestamp(timestamp)
-                _dt = _dt.replace(day=1, minute=0, hour=0)
-                _timestamp = self._datetime_to_timestamp(_dt)
-                gts_serie_month[_timestamp] = gts_serie_month.get(_timestamp, 0) + gts_day
-
-            # return result
-            if result == 'day':
-                return gts_serie_day
-            elif result == 'month':
-                return [[k, round(v, 1)] for k, v in gts_serie_month.items()]
-            return int(round(gts_total, 0))
+            # limit values to positive values
+            return _accumulate(np.maximum(0, values[:, 0]) * weights)
 
         def wachstumsgradtage() -> Union[list, float, None]:
             """Berechnet die Wachstumsgradtage noch 2 möglichen Varianten und gibt entweder den Gesamtwert oder eine Liste mit kumulierten Werten pro Tag zurück
-                
+
                 threshold: Schwellwert
                 variant 0: Berechnungsmethode "Berechnung des einfachen Durchschnitts" mit Vergleich des Durchschnitts der täglichen Minimal- und Maximaltemperatur mit Schwellenwert.
                            Maximaltemperaturen werden bei 30 °C gekappt.
                 variant 1: Berechnungsmethode "modifizierte Berechnung des einfachen Durchschnitts" mit Vergleich des Durchschnitts der täglichen Minimal- und Maximaltemperatur mit Schwellenwert.
                            Vor der Berechnung des Durchschnittes wird jede Temperatur, die den Schwellenwert unterschreitet, auf den Schwellenwert geändert.
                            Maximaltemperaturen werden bei 30 °C gekappt.
-                result 'total': Rückgabe als Gesamtwert
-                result 'month': Rückgabe als Liste mit kumulierten Werten pro Monat [['timestamp1', 'kumulierter Wert am Ende von Monat1'], ['timestamp2', ''kumulierter Wert am Ende von Monat2', [...], ...]
-                result 'day': Rückgabe als Liste mit kumulierten Werten pro Tag [['timestamp1', 'kumulierter Wert am Ende von Tag1'], ['timestamp2', ''kumulierter Wert am Ende von Tag2', [...], ...]
             """
 
             # define defaults
-            wgt_total = 0
-            wgt_serie_day = []
-            wgt_serie_month = {}
             upper_limit = 30
 
             # get threshold and set to min 0
@@ -1968,47 +2009,20 @@ class DatabaseAddOn(SmartPlugin):
 
             # get variant
             variant = params.get('variant', 0)
-            
-            # get result type
-            result = params.get('result', 'total')
 
             # variant handling
+            min_val = values[:, 0]
             if variant == 0:
-                self.logger.info(f"Calculate 'Wachstumsgradtage' according to 'Berechnung des einfachen Durchschnitts' to {result=}.")
-                min_val_c = 'min_val'
+                self.logger.info(f"Calculate 'Wachstumsgradtage' according to 'Berechnung des einfachen Durchschnitts' to result={params.get('result', 'total')}.")
             elif variant == 1:
-                self.logger.info(f"Calculate 'Wachstumsgradtage' according to 'Modifizierte Berechnung des einfachen Durchschnitts' to {result=}.")
-                min_val_c = 'max(threshold, min_val)'
+                self.logger.info(f"Calculate 'Wachstumsgradtage' according to 'Modifizierte Berechnung des einfachen Durchschnitts' to result={params.get('result', 'total')}.")
+                min_val = np.maximum(threshold, min_val)
             else:
                 self.logger.warning(f"Requested variant of 'Wachstumsgradtage' not defined. Aborting...")
                 return
 
-            # accumulate value
-            for entry in raw_data:
-                timestamp, min_val, max_val = entry
-
-                # calc wachstumsgradtage per day
-                wgt_day = ((eval(min_val_c) + min(upper_limit, max_val)) / 2) - threshold
-                wgt_day = max(0, wgt_day)
-
-                # create total value of wachstumsgradtage
-                wgt_total += wgt_day
-
-                # create series wachstumsgradtage per day
-                wgt_serie_day.append([timestamp, round(wgt_day, 1)])
-
-                # create series wachstumsgradtage per month
-                _dt = datetime.datetime.fromtimestamp(timestamp)
-                _dt = _dt.replace(day=1, minute=0, hour=0)
-                _timestamp = self._datetime_to_timestamp(_dt)
-                wgt_serie_month[_timestamp] = wgt_serie_month.get(_timestamp, 0) + wgt_day
-
-            # return result
-            if result == 'day':
-                return wgt_serie_day
-            elif result == 'month':
-                return [[k, round(v, 1)] for k, v in wgt_serie_month.items()]
-            return int(round(wgt_total, 0))
+            # calc wachstumsgradtage per day
+            return _accumulate(np.maximum(0, ((min_val + np.minimum(upper_limit, values[:, 1])) / 2) - threshold))
 
         def temperaturserie() -> list:
             """provide list of lists having timestamp and temperature(s) per day"""
@@ -2048,8 +2062,8 @@ class DatabaseAddOn(SmartPlugin):
             return _count(operator.ge, 'avg', 5)
 
         def _count(op, minmax: str, limit: int) -> int:
-            minmax_index = 2 if minmax == 'max' else 1
-            return sum(1 for entry in raw_data if op(entry[minmax_index], limit))
+            minmax_index = 1 if minmax == 'max' else 0
+            return int(np.count_nonzero(op(values[:, minmax_index], limit)))
 
         self.logger.debug(f"{func=}, {database_item=}, {year=}, {month=}, {params=}")
 
@@ -2100,7 +2114,10 @@ class DatabaseAddOn(SmartPlugin):
         if self.debug_log.prepare:
             self.logger.debug("try to get raw data")
         data_con_func = defaults.get(func, {}).get('data_con_func')
-        raw_data = self._prepare_value_list(database_item=database_item, timeframe='day', start=start, end=end, ignore_value_list=ignore_value_list, data_con_func=data_con_func, cache=True)
+        if data_con_func.endswith('_day'):
+            raw_data = self._get_day_value_list(database_item=database_item, start_date=start_date, end_date=end_date, ignore_value_list=ignore_value_list, data_con_func=data_con_func)
+        else:
+            raw_data = self._prepare_value_list(database_item=database_item, timeframe='day', start=start, end=end, ignore_value_list=ignore_value_list, data_con_func=data_con_func, cache=True)
         if self.debug_log.prepare:
             self.logger.debug(f"raw_value_list={raw_data}")
 
@@ -2108,10 +2125,80 @@ class DatabaseAddOn(SmartPlugin):
         if raw_data is None or not isinstance(raw_data, list):
             return
 
+        # timestamps and array of values (one column per value) per day
+        timestamps = [entry[0] for entry in raw_data]
+        values = np.array([entry[1:] for entry in raw_data], dtype=float) if raw_data else np.zeros((0, 2))
+
         # calculate value and return it
         return locals()[func]()
 
-    def _prepare_value_list(self, database_item: Item, timeframe: str, start: int, end: int = 0, ignore_value_list=None, data_con_func: str = 'avg_day', cache: bool = False) -> Union[list, None]:
+    def _get_day_value_list(self, database_item: Item, start_date: datetime.date, end_date: datetime.date, ignore_value_list: list = None, data_con_func: str = 'avg_day') -> Union[list, None]:
+        """
+        returns list of lists having timestamp and values(s) per day from start_date until end_date like _prepare_value_list
+
+        The values of completed days are kept in temp_sum_cache, which is saved with the cache data. So only the days
+        since the last calculation and today need to be queried. The entry is rebuilt, if the oldest entry of the database
+        item within the timeframe has changed, e.g. if log entries have been deleted by maxage. Entries are replaced, not
+        changed, and updated under a lock per key, since several items may use the same entry.
+
+        :param database_item:       item object for which the query should be done
+        :param start_date:          first day
+        :param end_date:            last day
+        :param ignore_value_list:   list of comparison operators for val_num, which will be applied during query
+        :param data_con_func:       data concentration function per day, see _prepare_value_list
+        :return:                    list of list with [timestamp, value(s)]
+        """
+
+        def day_to_timestamp(day: datetime.date) -> int:
+            return self._datetime_to_timestamp(datetime.datetime.combine(day, datetime.datetime.min.time()))
+
+        today = self.shtime.today(offset=0)
+        last_day = min(end_date, today - datetime.timedelta(days=1))
+
+        key = (database_item.property.path, data_con_func, start_date.isoformat(), tuple(ignore_value_list) if ignore_value_list else ())
+
+        with self._temp_sum_cache_locks.setdefault(key, threading.Lock()):
+            # the oldest entry is read from the database, since the one in item_cache is kept across runs; changes before
+            # start_date do not affect the cached values
+            oldest_log = self._read_log_oldest(self._get_itemid(database_item))
+            if oldest_log is not None and oldest_log < day_to_timestamp(start_date) * 1000:
+                oldest_log = 0
+            entry = self.temp_sum_cache.get(key)
+            if entry is None or entry['oldest_log'] != oldest_log:
+                if entry is not None:
+                    self.logger.info(f"Oldest entry of item={database_item.property.path} changed. Cached values per day will be rebuilt.")
+                entry = {'oldest_log': oldest_log, 'last_day': None, 'rows': []}
+            first_day = datetime.date.fromisoformat(entry['last_day']) + datetime.timedelta(days=1) if entry['last_day'] else start_date
+
+            # query completed days not in cache
+            if first_day <= last_day:
+                rows = self._prepare_value_list(database_item=database_item, timeframe='day', start=(today - first_day).days, end=(today - last_day).days, ignore_value_list=ignore_value_list, data_con_func=data_con_func, empty_result=[])
+                if rows is None:
+                    if entry['last_day'] is None:
+                        # no data for completed days, so query the whole timeframe without cache
+                        return self._prepare_value_list(database_item=database_item, timeframe='day', start=(today - start_date).days, end=(today - end_date).days if end_date < today else 0, ignore_value_list=ignore_value_list, data_con_func=data_con_func)
+                    # query failed, so keep the cache entry as it is and retry with the next calculation
+                    self.logger.warning(f"Values per day for item={database_item.property.path} from {first_day} until {last_day} could not be read from database. Aborting...")
+                    return
+
+                # the query includes a value at midnight after last_day, which belongs to the next day
+                limit_ts = day_to_timestamp(last_day + datetime.timedelta(days=1))
+                cached_ts = {row[0] for row in entry['rows']}
+                new_rows = [row for row in rows if row[0] < limit_ts and row[0] not in cached_ts]
+                entry = {'oldest_log': oldest_log, 'last_day': last_day.isoformat(), 'rows': entry['rows'] + new_rows}
+                self.temp_sum_cache[key] = entry
+                if self.debug_log.prepare:
+                    self.logger.debug(f"Values per day for {key=} added from {first_day} until {last_day}.")
+
+        if end_date < today:
+            return list(entry['rows'])
+
+        # add today
+        today_ts = day_to_timestamp(today)
+        rows = self._prepare_value_list(database_item=database_item, timeframe='day', start=0, end=0, ignore_value_list=ignore_value_list, data_con_func=data_con_func)
+        return entry['rows'] + [row for row in rows or [] if row[0] >= today_ts]
+
+    def _prepare_value_list(self, database_item: Item, timeframe: str, start: int, end: int = 0, ignore_value_list=None, data_con_func: str = 'avg_day', cache: bool = False, empty_result: list = None) -> Union[list, None]:
         """
         returns list of lists having timestamp and values(s) per day / hour in format of regular database query
 
@@ -2132,61 +2219,11 @@ class DatabaseAddOn(SmartPlugin):
                                     - min_day: determines min value per day of values within plugin
                                     - max_hour: determines max value per hour of values within plugin
                                     - first_hour_avg_day: 2-step concentration: 1) concentrate values within an hour by using first value 2) concentrate values by average for first value of each hour
+        :param cache:               use the cache for raw data
+        :param empty_result:        result, if there are no values in the database for the timeframe (errors always return None)
         :return:                    list of list with [timestamp, value]
         """
 
-        def _group_value_by_datetime_block(block: str) -> dict:
-            """
-            create dict of datetimes (per day or hour) and values based on database query result in format {{'datetime1': [values]}, 'datetime1': [values], ..., 'datetimex': [values]}
-            :param block:   defined the increment of datetime, default is min, further possible is 'day' and 'hour'
-            """
-
-            _value_dict = {}
-
-            for ts, value in raw_data:
-                # format timestamp
-                if len(str(ts)) > 10:
-                    ts = ts / 1000
-                # format datetime object
-                dt = self._timestamp_to_datetime(ts).replace(second=0, microsecond=0, tzinfo=None)
-                if block == 'hour':
-                    dt = dt.replace(minute=0)
-                if block == 'day':
-                    dt = dt.replace(minute=0, hour=0)
-                # fill dict
-                _value_dict.setdefault(dt, []).append(value)
-
-            return dict(sorted(_value_dict.items()))
-
-        def _concentrate_values(option: str) -> list:
-            """
-            Create list of list with [[timestamp1, value1], [timestamp2, value2], ...] based on value_dict in format of database query result
-            values given in the list will be concentrated as per given option
-
-            :param option       defines option to be used to determine the concentrated values, possible are 'first', 'avg', minmax
-                                    'first' will take first entry of list per datetime to get as close to value at full hour as possible
-                                    'avg' will use the calculated average of values in list per datetime
-                                    'minmax' will get min and max value of list per datetime
-                                    'min' will get the min value of list per datetime
-                                    'max' will get the min value of list per datetime
-            """
-
-            _value_list = []
-            # create nested list with timestamp, avg_value or minmax per hour/day
-            for entry in value_dict:
-                _timestamp = self._datetime_to_timestamp(entry)
-                if option == 'first':
-                    _value_list.append([_timestamp, value_dict[entry][0]])
-                elif option == 'avg':
-                    _value_list.append([_timestamp, round(sum(value_dict[entry]) / len(value_dict[entry]), 2)])
-                elif option == 'minmax':
-                    _value_list.append([_timestamp, min(value_dict[entry]), max(value_dict[entry])])
-                elif option == 'max':
-                    _value_list.append([_timestamp, max(value_dict[entry])])
-                elif option == 'min':
-                    _value_list.append([_timestamp, min(value_dict[entry])])
-            return _value_list
-
         if self.debug_log.prepare:
             self.logger.debug(f'called with database_item={database_item.property.path}, {timeframe=}, {start=}, {end=}, {ignore_value_list=}, {data_con_func=}')
 
@@ -2210,45 +2247,123 @@ class DatabaseAddOn(SmartPlugin):
         # define quere params
         _query_params = {'func': 'raw', 'database_item': database_item, 'timeframe': timeframe, 'start': start, 'end': end, 'ignore_value_list': ignore_value_list}
 
+        # start and end are relative to today, so the date is part of the cache key
+        _cache_key = (database_item.property.path, timeframe, start, end, tuple(ignore_value_list) if ignore_value_list else (), self.shtime.today(offset=0).isoformat())
+
         # get raw data from database
-        if not cache or str(_query_params) not in self.value_list_raw_data:
+        raw_data = self.value_list_raw_data.get(_cache_key) if cache else None
+        if raw_data is None:
             raw_data = self._query_item(**_query_params)
 
             if raw_data == [[None, None]] or raw_data == [[0, 0]]:
                 self.logger.info(f"no valid data from database query for item={database_item.property.path} received during _prepare_value_list. Aborting...")
-                return
+                return empty_result if raw_data == [[0, 0]] else None
 
+            raw_data = raw_data_to_arrays(raw_data)
             if cache:
-                self.logger.debug(f"raw_data for {_query_params=} put to cache.")
-                self.value_list_raw_data[str(_query_params)] = raw_data
+                self.logger.debug(f"raw_data for {_cache_key=} put to cache.")
+                self.value_list_raw_data.put(_cache_key, raw_data)
         else:
-            self.logger.debug(f"raw_data for {_query_params=} read from cache.")
-            raw_data = self.value_list_raw_data[str(_query_params)]
-
-        if _data_con1 and _block1:
-            # create nested dict with values
-            value_dict = _group_value_by_datetime_block(block=_block1)
-            if self.debug_log.prepare:
-                self.logger.debug(f"{_block1=}, {value_dict=}")
-
-            # return value list
-            result = _concentrate_values(option=_data_con1)
-            if self.debug_log.prepare:
-                self.logger.debug(f"{_data_con1=}, {result=}")
+            self.logger.debug(f"raw_data for {_cache_key=} read from cache.")
 
+        # with 2-step concentration, the second step is applied to the raw data as well
         if _data_con2 and _block2:
-            # create nested dict with values
-            value_dict = _group_value_by_datetime_block(block=_block2)
+            result = self._concentrate_values(*raw_data, block=_block2, option=_data_con2)
             if self.debug_log.prepare:
-                self.logger.debug(f"{_block2=}, {value_dict=}")
+                self.logger.debug(f"{_block2=}, {_data_con2=}, {result=}")
 
-            # return value list
-            result = _concentrate_values(option=_data_con2)
+        elif _data_con1 and _block1:
+            result = self._concentrate_values(*raw_data, block=_block1, option=_data_con1)
             if self.debug_log.prepare:
-                self.logger.debug(f"{_data_con2=}, {result=}")
+                self.logger.debug(f"{_block1=}, {_data_con1=}, {result=}")
 
         return result
 
+    def _concentrate_values(self, ts: np.ndarray, values: np.ndarray, block: str, option: str) -> list:
+        """
+        Create list of list with [[timestamp1, value1], [timestamp2, value2], ...] based on raw data as returned by raw_data_to_arrays;
+        the values are grouped per local day / hour / minute and concentrated as per given option
+
+        :param ts:          timestamps of raw data in seconds
+        :param values:      values of raw data
+        :param block:       defines the increment of datetime, 'day' or 'hour', otherwise minute
+        :param option:      defines option to be used to determine the concentrated values, possible are 'first', 'avg', minmax
+                                'first' will take first entry of list per datetime to get as close to value at full hour as possible
+                                'avg' will use the calculated average of values in list per datetime
+                                'minmax' will get min and max value of list per datetime
+                                'min' will get the min value of list per datetime
+                                'max' will get the min value of list per datetime
+        """
+
+        if not len(ts):
+            return []
+
+        # integer block number in local time; stable sort keeps order of values within block
+        size = {'day': 86400, 'hour': 3600}.get(block, 60)
+        offsets = self._get_utc_offsets(ts)
+        blocks = np.floor((ts + offsets) / size).astype(np.int64)
+        order = np.argsort(blocks, kind='stable')
+        blocks = blocks[order]
+        values = values[order]
+        keys, starts, counts = np.unique(blocks, return_index=True, return_counts=True)
+
+        # The start of a block is taken with the utc offset of its first value, if that offset is valid at the start of
+        # the block. So an ambiguous local time (end of daylight saving time) refers to the same occurrence as the first
+        # value of the block. Otherwise (daylight saving time changes within the block) the start is taken from the local time.
+        first_offsets = offsets[order][starts]
+        candidates = keys * size - first_offsets
+        valid = self._get_utc_offsets(candidates) == first_offsets
+        epoch = datetime.datetime(1970, 1, 1)
+        timestamps = [int(candidate) if is_valid else self._datetime_to_timestamp(epoch + datetime.timedelta(seconds=key * size))
+                      for key, candidate, is_valid in zip(keys.tolist(), candidates.tolist(), valid.tolist())]
+
+        if option == 'first':
+            return [[timestamp, value] for timestamp, value in zip(timestamps, values[starts].tolist())]
+        elif option == 'avg':
+            # bincount adds sequentially like sum() does
+            sums = np.bincount(np.repeat(np.arange(len(keys)), counts), weights=values, minlength=len(keys))
+            return [[timestamp, round(s / c, 2)] for timestamp, s, c in zip(timestamps, sums.tolist(), counts.tolist())]
+        elif option == 'minmax':
+            return [[timestamp, mi, ma] for timestamp, mi, ma in zip(timestamps, np.minimum.reduceat(values, starts).tolist(), np.maximum.reduceat(values, starts).tolist())]
+        elif option == 'max':
+            return [[timestamp, ma] for timestamp, ma in zip(timestamps, np.maximum.reduceat(values, starts).tolist())]
+        elif option == 'min':
+            return [[timestamp, mi] for timestamp, mi in zip(timestamps, np.minimum.reduceat(values, starts).tolist())]
+        return []
+
+    def _get_utc_offsets(self, ts: np.ndarray) -> np.ndarray:
+        """
+        Provides the utc offset in seconds of the local timezone for each of the given timestamps in seconds
+
+        The offset is determined once per day in the range of the timestamps; transitions within a day are located by bisection.
+        """
+
+        tz = self.shtime.tzinfo()
+
+        def offset(timestamp) -> float:
+            return datetime.datetime.fromtimestamp(timestamp, tz=tz).utcoffset().total_seconds()
+
+        first = int(np.floor(ts.min()))
+        last = int(np.ceil(ts.max()))
+
+        bounds = []
+        offsets = [offset(first)]
+        lo = first
+        for hi in range(first + 86400, last + 86400, 86400):
+            if offset(hi) != offsets[-1]:
+                _lo, _hi = lo, hi
+                while _hi - _lo > 1:
+                    mid = (_lo + _hi) // 2
+                    if offset(mid) == offsets[-1]:
+                        _lo = mid
+                    else:
+                        _hi = mid
+                bounds.append(_hi)
+                offsets.append(offset(_hi))
+            lo = hi
+
+        return np.array(offsets)[np.searchsorted(bounds, ts, side='right')]
+
     ####################
     #   Support stuff
     ####################
@@ -2523,6 +2638,120 @@ class DatabaseAddOn(SmartPlugin):
 
         return result
 
+    def _get_point_query_timestamps(self, item_config: dict) -> list:
+        """
+        Provides the timestamps of all queries for the last value before a timestamp ('next' and 'last'), the calculation of the item will do
+
+        :param item_config: item config of db_addon item
+        :return: list of timestamps in milliseconds
+        """
+
+        cat = item_config.get('cat')
+        sub_cat = item_config.get('sub_cat')
+        query_params = item_config.get('query_params') or {}
+        timeframe = query_params.get('timeframe')
+        start = query_params.get('start')
+        end = query_params.get('end')
+
+        periods = []
+        if cat == 'verbrauch':
+            if 'timedelta' in query_params:
+                start, end = self._get_start_end_for_timedelta(query_params['timedelta'])
+            periods = [(end, end), (start, start)]
+        elif cat == 'zaehler':
+            periods = [(start, end)]
+        elif cat == 'serie' and sub_cat == 'verbrauch' and isinstance(start, int):
+            for i in range(start, 1, -1):
+                periods.extend([(i, i), (i + 1, i + 1)])
+        elif cat == 'serie' and sub_cat == 'zaehler' and isinstance(start, int):
+            periods = [(i, i) for i in range(start, 1, -1)]
+
+        timestamps = []
+        for _start, _end in periods:
+            ts_end = self._get_start_end_as_timestamp(timeframe, _start, _end)[1]
+            if ts_end is not None:
+                timestamps.append(ts_end)
+        return timestamps
+
+    def _plan_queries(self, items: list) -> None:
+        """
+        Prefetch the values shared by the items of a calculation run
+
+        The 'next' and 'last' queries of all items of the run are grouped by database item; the values for all
+        timestamps of a database item in the past are requested with one query and put to the point value cache.
+
+        :param items: list of items to be calculated
+        """
+
+        now = time.time() * 1000
+        plan = {}
+        for item in items:
+            item_config = self.get_item_config(item)
+            database_item = item_config.get('database_item')
+            if not isinstance(database_item, Item):
+                continue
+            timestamps = [ts for ts in self._get_point_query_timestamps(item_config) if ts < now]
+            if not timestamps:
+                continue
+            # series are queried without ignore_value_list
+            ignore_value_list = None if item_config['cat'] == 'serie' else (item_config.get('query_params') or {}).get('ignore_value_list')
+            key = (database_item, tuple(ignore_value_list) if ignore_value_list else ())
+            plan.setdefault(key, set()).update(timestamps)
+
+        queries = lookups = 0
+        for (database_item, ignore_key), timestamps in plan.items():
+            if len(timestamps) < 2:
+                continue
+            item_id = self._get_itemid(database_item)
+            if not item_id:
+                continue
+            timestamps = sorted(timestamps)
+            for i in range(0, len(timestamps), 50):
+                if self._prefetch_point_values(item_id, timestamps[i:i + 50], list(ignore_key)):
+                    queries += 1
+                    lookups += len(timestamps[i:i + 50])
+
+        if queries:
+            self.logger.info(f"Query planner prefetched {lookups} values for {len(items)} items with {queries} queries.")
+
+    def _prefetch_point_values(self, item_id: int, timestamps: list, ignore_value_list: list = None) -> bool:
+        """
+        Request the last value before each of the given timestamps with one query and put them to the point value cache
+
+        :param item_id: database item_id for which the query should be done
+        :param timestamps: list of timestamps in milliseconds
+        :param ignore_value_list: list of comparison operators for val_num, which will be applied during query
+        :return: True, if the query was successful
+        """
+
+        _where = "item_id = :item_id "
+        if ignore_value_list:
+            for entry in ignore_value_list:
+                _where = f'{_where}AND val_num {entry.strip()} '
+
+        # parameter names need to consist of letters, see _query
+        params = {'item_id': item_id}
+        selects = []
+        for i, ts in enumerate(timestamps):
+            name = f"ts_{chr(97 + i // 26)}{chr(97 + i % 26)}"
+            params[name] = ts
+            selects.append(f"SELECT {i} AS idx, time, value FROM (SELECT time, val_num as value FROM log WHERE {_where}AND time <= :{name} ORDER BY time DESC LIMIT 1) AS t_{name}")
+        query = ' UNION ALL '.join(selects)
+
+        if self.debug_log.prepare:
+            self.logger.debug(f"{query=}, {params=}")
+
+        result = self._fetchall(query, params)
+        if result is None:
+            return False
+
+        ignore_key = tuple(ignore_value_list) if ignore_value_list else ()
+        for ts in timestamps:
+            self.point_value_cache[(item_id, ignore_key, ts)] = None
+        for idx, timestamp, value in result:
+            self.point_value_cache[(item_id, ignore_key, timestamps[int(idx)])] = (timestamp, value)
+        return True
+
     def _init_cache_dicts(self) -> None:
         """
         init all cache dicts
@@ -2548,7 +2777,10 @@ class DatabaseAddOn(SmartPlugin):
             YEAR: {}
         }
 
-        self.value_list_raw_data = {}
+        self.value_list_raw_data.clear()
+        self.query_cache = {}
+        self.point_value_cache = {}
+        self.temp_sum_cache = {}
 
     def _clean_item_cache(self, item: Union[str, Item]) -> bool:
         """set cached values for item to None"""
@@ -2572,6 +2804,10 @@ class DatabaseAddOn(SmartPlugin):
                     if cached_item == database_item:
                         self.current_values[timeframe][cached_item] = {}
 
+            for key in list(self.temp_sum_cache):
+                if key[0] == database_item.property.path:
+                    self.temp_sum_cache.pop(key, None)
+
             return True
         return False
 
@@ -2582,6 +2818,8 @@ class DatabaseAddOn(SmartPlugin):
 
         self.logger.info(f"Working queue will be cleared. Calculation run will end.")
         self.item_queue.queue.clear()
+        for worker in self.workers:
+            worker['queue'].queue.clear()
 
     def _get_start_end_as_timestamp(self, timeframe: str, start: Union[int, str, None], end: Union[int, str, None]) -> tuple:
         """
@@ -2682,6 +2920,20 @@ class DatabaseAddOn(SmartPlugin):
         if self.debug_log.prepare:
             self.logger.debug(f"Called with {func=}, {item_id=}, {ts_start=}, {ts_end=}, {group=}, {group2=}, {ignore_value_list=}")
 
+        # results for past timeframes do not change during a calculation run; 'next' and 'last' are both served from the last value before ts_end
+        ignore_key = tuple(ignore_value_list) if ignore_value_list else ()
+        use_cache = ts_end < time.time() * 1000 and func != 'raw'
+        point_key = (item_id, ignore_key, ts_end)
+        query_key = (func, item_id, ts_start, ts_end, group, group2, ignore_key)
+        if use_cache:
+            if func in ['next', 'last'] and point_key in self.point_value_cache:
+                row = self.point_value_cache[point_key]
+                if row is None or (func == 'last' and row[0] < ts_start):
+                    return []
+                return [row]
+            if query_key in self.query_cache:
+                return list(self.query_cache[query_key])
+
         # define query parts
         _select = {
             'avg':         'time, AVG(val_num * duration) / AVG(duration) as value ',
@@ -2795,7 +3047,19 @@ class DatabaseAddOn(SmartPlugin):
             self.logger.debug(f"{query=}, {params=}")
 
         # request database and return result
-        return self._fetchall(query, params)
+        result = self._fetchall(query, params)
+
+        if use_cache and result is not None:
+            if func == 'next':
+                self.point_value_cache[point_key] = result[0] if result else None
+            elif func == 'last':
+                # without entry in timeframe, the last value before ts_end is unknown
+                if result:
+                    self.point_value_cache[point_key] = result[0]
+            else:
+                self.query_cache[query_key] = result
+
+        return result
 
     def _read_log_oldest(self, item_id: int) -> int:
         """
@@ -3043,10 +3307,75 @@ class DebugLogOptions:
             self.prepare = False
 
 
+class RawDataCache:
+    """
+    LRU cache for raw data of database queries, limited by the memory size of the cached arrays
+
+    Entries are stored as tuple of numpy arrays (timestamps, values) as returned by raw_data_to_arrays.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size       # max size of cached arrays in bytes, 0 disables cache
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Union[tuple, None]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, entry: tuple):
+        entry_size = sum(array.nbytes for array in entry)
+        if entry_size > self.max_size:
+            return
+        with self._lock:
+            if key in self._data:
+                self.size -= sum(array.nbytes for array in self._data.pop(key))
+            self._data[key] = entry
+            self.size += entry_size
+            while self.size > self.max_size:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= sum(array.nbytes for array in evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {'entries': len(self._data),
+                'size': round(self.size / 1024 / 1024, 2),
+                'max_size': round(self.max_size / 1024 / 1024, 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / requests * 100, 1) if requests else 0}
+
+
 #######################
 #   Helper functions
 #######################
 
+def raw_data_to_arrays(raw_data: list) -> tuple:
+    """converts list of [timestamp, value] as returned by database query to arrays of timestamps in seconds and values"""
+
+    ts = np.array([entry[0] for entry in raw_data], dtype=float)
+    ts = np.where(ts > 9999999999, ts / 1000, ts)
+    values = np.array([entry[1] for entry in raw_data], dtype=float)
+    return ts, values
+
+
 def params_to_dict(string: str) -> Union[Dict[str, Union[str, int]], None]:
     """Parse a string with named arguments and comma separation to dict; (e.g. string = 'year=2022, month=12')"""
 
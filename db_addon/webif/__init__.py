@@ -119,6 +119,8 @@ class WebInterface(SmartPluginWebIf):
             data['maintenance'] = True if self.plugin.log_level == 10 else False
             data['queue_length'] = self.plugin.queue_backlog()
             data['active_queue_item'] = self.plugin.active_queue_item
+            data['workers'] = self.plugin.worker_stats()
+            data['raw_data_cache'] = self.plugin.raw_data_cache_stats()
 
             data['debug_log'] = {}
             for debug in ['parse', 'execute', 'ondemand', 'onchange', 'prepare', 'sql']:
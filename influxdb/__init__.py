@@ -20,10 +20,12 @@
 #########################################################################
 
 import logging
-import socket
 import json
+import os
+import time
 from lib.model.smartplugin import SmartPlugin
-import requests
+
+from .writer import InfluxWriter
 
 class InfluxDB(SmartPlugin):
     PLUGIN_VERSION = "1.0.3"
@@ -42,16 +44,39 @@ class InfluxDB(SmartPlugin):
         self.value_field = self.get_parameter_value('value_field')
         self.http_port = self.get_parameter_value('http_port')
         self.write_http = self.get_parameter_value('write_http')
+        self.batch_size = self.get_parameter_value('batch_size')
+        self.flush_interval = self.get_parameter_value('flush_interval')
+        self.spool_max_size = self.get_parameter_value('spool_max_size')
 
         self.item_config = {}
         self.influxdb = 'smarthome'
 
+        if self.write_http:
+            spool_file = None
+            if self.spool_max_size > 0:
+                spool_dir = os.path.join(smarthome.get_vardir(), self.get_shortname())
+                try:
+                    os.makedirs(spool_dir, exist_ok=True)
+                    spool_file = os.path.join(spool_dir, 'spool.lp')
+                except Exception as e:
+                    self.logger.error("InfluxDB: unable to create spool directory {}: {}".format(spool_dir, e))
+            self.writer = InfluxWriter(self.logger, 'http://{}:{}/write'.format(self.host, self.http_port),
+                                       params=lambda database: {'db': database},
+                                       batch_size=self.batch_size, flush_interval=self.flush_interval,
+                                       spool_file=spool_file, spool_max_size=self.spool_max_size)
+        else:
+            self.writer = InfluxWriter(self.logger, udp_address=(self.host, self.udp_port),
+                                       batch_size=self.batch_size, flush_interval=self.flush_interval)
+
 
     def run(self):
+        self.writer.start()
         self.alive = True
 
     def stop(self):
         self.alive = False
+        self.writer.stop()
+        self.logger.info("InfluxDB: writer statistics: {}".format(self.writer.metrics))
 
     def parse_item(self, item):
         if self.keyword in item.conf or 'influxdb_name' in item.conf or 'influxdb_tags' in item.conf or 'influxdb_fields' in item.conf:
@@ -88,6 +113,13 @@ class InfluxDB(SmartPlugin):
                     self.logger.error("InfluxDB: item {} has invalid fields {}, parsing JSON failed with: {}".format(item.property.path, fields_json, e))
                     return
 
+            # if a name has been specified, additionally store item's ID
+            # (if no name has been specified, the name is already the item's ID as a fallback)
+            if name_is_specified:
+                config['tags']['item'] = item.property.path
+
+            config['line_prefix'], config['line_fields'] = self.create_line_template(config)
+
             self.logger.debug("InfluxDB: item {} config: {}".format(item.property.path, config))
 
             self.item_config[ item.property.path ] = config
@@ -97,70 +129,59 @@ class InfluxDB(SmartPlugin):
 
     def update_item(self, item, caller=None, source=None, dest=None):
         config = self.item_config[ item.property.path ]
-        name = config['name']
+        line = self.create_line(config, float( item() ), caller, source, dest)
+        self.send( line )
+        return None
 
-        tags = {
-            'caller': caller,
-            'source': source,
-            'dest': dest
-        }
+    def send(self, data):
+        # queue the line, it is sent by the writer thread (in batches)
+        if not self.writer.write(self.influxdb, data):
+            self.logger.debug("InfluxDB: write queue is full, dropping [{}]".format(data))
+
+    def escape(self, value, measurement=False):
+        # https://docs.influxdata.com/influxdb/v1/write_protocols/line_protocol_reference/#special-characters
+        value = str(value).replace(',', '\\,').replace(' ', '\\ ')
+        if not measurement:
+            value = value.replace('=', '\\=')
+        return value
+
+    def create_line_template(self, config):
+        """
+        Build the static parts of the line for an item (measurement with the plugin and item tags and the
+        plugin and item fields). They are built and escaped once in parse_item, so only caller, source, dest,
+        the value and the timestamp have to be added on each update.
+        """
+        tags = {}
         tags.update( self.tags ) # + plugin.conf tags
-        tags.update( config['tags'] ) # + item's tags
+        tags.update( config['tags'] ) # + item's tags (and item's ID)
+        kvs = [self.escape(config['name'], measurement=True)]
+        for tag_key in sorted(tags.keys()):
+            kvs.append("{k}={v}".format(k=self.escape(tag_key), v=self.escape(tags[tag_key])))
+        prefix = ','.join(kvs)
 
-        # if a name has been specified, additionally store item's ID
-        # (if no name has been specified, the name is already the item's ID as a fallback)
-        if config['name_is_specified']:
-            tags['item'] = item.property.path
+        # caller, source and dest are only added, if they are not overwritten by static tags
+        config['dynamic_tags'] = [tag for tag in ('caller', 'dest', 'source') if tag not in tags]
 
         fields = {}
         fields.update( self.fields ) # + plugin.conf fields
         fields.update( config['fields'] ) # + item's fields
-        fields[config['value_field']] = float( item() )
-
-        line = self.create_line(name, tags, fields)
-        if (self.write_http is False):
-            self.send( line )
-        else:
-            self.sendhttp( line )
-        return None
-
-    def send(self, data):
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            sock.sendto(data.encode(), (self.host, self.udp_port))
-            sock.close()
-        except Exception as e:
-            self.logger.error("InfluxDB: failed sending UDP datagram [{}] to {}:{} with error: {}".format(data, self.host, self.udp_port, e))
-        else:
-            self.logger.debug("InfluxDB: sent UDP datagram [{}] to {}:{}".format(data, self.host, self.udp_port))
-
-    def sendhttp( self, data ):
-        try:
-            url_string = 'http://{}:{}/write?db={}'.format( self.host, self.http_port, self.influxdb )
-            r = requests.post(url_string, data=data)
-            if( r.status_code != 204 ):
-                self.logger.error( "InfluxDB: request returns http {} [{}]".format(r.status_code, r.text))
-        except Exception as e:
-            self.logger.error("InfluxDB: failed sending HTTP datagram [{}] to {}:{} with error: {}".format(data, self.host, self.http_port, e))
-        else:
-            self.logger.debug("InfluxDB: sent HTTP datagram [{}] to {}:{}".format(data, self.host, self.http_port))
-
-    def create_line(self, name, tags, fields):
-        # https://docs.influxdata.com/influxdb/v1.0/guides/writing_data/
-
-        # build name & tags
-        kvs = [name]
-        for tag_key in sorted(tags.keys()):
-            kvs.append("{k}={v}".format(k=tag_key, v=tags[tag_key]))
-        lineproto_name_tags = ','.join(kvs)
-
-        # replace ":ga=" with ",ga=" to avoid "invalid tag format" error
-        lineproto_name_tags = lineproto_name_tags.replace(":ga=", ",ga=")
-
-        # build fields (which include the actual value)
         kvs = []
         for field_key in sorted(fields.keys()):
-            kvs.append("{k}={v}".format(k=field_key, v=fields[field_key]))
-        lineproto_fields = ','.join(kvs)
+            if field_key != config['value_field']:
+                kvs.append("{k}={v},".format(k=self.escape(field_key), v=fields[field_key]))
+        kvs.append("{k}=".format(k=self.escape(config['value_field'])))
+        return prefix, ''.join(kvs)
 
-        return lineproto_name_tags + ' ' + lineproto_fields
+    def create_line(self, config, value, caller=None, source=None, dest=None):
+        # https://docs.influxdata.com/influxdb/v1.0/guides/writing_data/
+        dynamic = {'caller': caller, 'source': source, 'dest': dest}
+        tags = []
+        for tag in config['dynamic_tags']:
+            # split ":ga=" into a separate ga tag to avoid "invalid tag format" error
+            tag_value, ga_sep, ga = str(dynamic[tag]).partition(':ga=')
+            tags.append(",{k}={v}".format(k=tag, v=self.escape(tag_value)))
+            if ga_sep:
+                tags.append(",ga={v}".format(v=self.escape(ga)))
+
+        # explicit timestamp (ns), as the lines are written in batches
+        return "{}{} {}{} {}".format(config['line_prefix'], ''.join(tags), config['line_fields'], value, time.time_ns())
@@ -25,6 +25,8 @@
 #
 #########################################################################
 import ast
+import os
+import time
 
 import requests
 import json
@@ -33,6 +35,7 @@ from lib.model.smartplugin import SmartPlugin
 from lib.item import Items
 
 from .webif import WebInterface
+from .writer import InfluxWriter
 
 
 # If a needed package is imported, which might be not installed in the Python environment,
@@ -82,12 +85,29 @@ class InfluxDB2(SmartPlugin):
 
         self.str_value_field = self.get_parameter_value('str_value_field')
 
+        self.batch_size = self.get_parameter_value('batch_size')
+        self.flush_interval = self.get_parameter_value('flush_interval')
+        self.spool_max_size = self.get_parameter_value('spool_max_size')
+
         # cycle time in seconds, only needed, if hardware/interface needs to be
         # polled for value changes by adding a scheduler entry in the run method of this plugin
         # (maybe you want to make it a plugin parameter?)
         self._cycle = 60
 
-        # Initialization code goes here
+        # writer thread for sending the values in batches
+        spool_file = None
+        if self.spool_max_size > 0:
+            spool_dir = os.path.join(self.get_sh().get_vardir(), self.get_shortname())
+            try:
+                os.makedirs(spool_dir, exist_ok=True)
+                spool_file = os.path.join(spool_dir, 'spool.lp')
+            except Exception as e:
+                self.logger.error(f"Unable to create spool directory {spool_dir}: {e}")
+        self._writer = InfluxWriter(self.logger, self._url_base() + '/api/v2/write',
+                                    params=lambda bucket: {'bucket': bucket, 'org': self.org},
+                                    headers={'Authorization': 'Token ' + self.api_token},
+                                    batch_size=self.batch_size, flush_interval=self.flush_interval,
+                                    spool_file=spool_file, spool_max_size=self.spool_max_size)
 
         # On initialization error use:
         #   self._init_complete = False
@@ -111,6 +131,7 @@ class InfluxDB2(SmartPlugin):
         self.logger.debug("Run method called")
         # setup scheduler for device poll loop   (disable the following line, if you don't need to poll the device. Rember to comment the self_cycle statement in __init__ as well)
         self.scheduler_add('poll_device', self.poll_device, cycle=self._cycle)
+        self._writer.start()
 
         self.alive = True
         # if you need to create child threads, do not make them daemon = True!
@@ -123,6 +144,8 @@ class InfluxDB2(SmartPlugin):
         self.logger.debug("Stop method called")
         self.scheduler_remove('poll_device')
         self.alive = False
+        self._writer.stop()
+        self.logger.info(f"Writer statistics: {self.writer_metrics()}")
 
     def parse_item(self, item):
         """
@@ -178,6 +201,10 @@ class InfluxDB2(SmartPlugin):
                 except Exception as e:
                     self.logger.error(f"parse_item: Item {item.property.path} has invalid data in 'influxdb2_tags' attribute: {tags_json}, ast.literal_eval failed with: {e}")
 
+            # build the static part of the line protocol once
+            config_data['numeric'] = item.type() in ['num', 'bool']
+            self.create_line_template(item.property.path, config_data)
+
             # store plugin specific configuration information for this item
             self.add_pluginitem(item.property.path, config_data, device_command=None)
 
@@ -221,28 +248,10 @@ class InfluxDB2(SmartPlugin):
 
             config_data = self.get_pluginitem_configdata(item.property.path)
 
-            tags = {}
-            tags['caller'] = caller.replace(' ', '\ ')
-            if source is not None:
-                tags['source'] = source.replace(' ', '\ ')
-            if dest is not None:
-                tags['dest'] = dest.replace(' ', '\ ')
-            tags['item'] = item.property.path
-
-            tags.update(self.tags)                 # add global tag definitions to actual tags
-            if config_data.get('tags', None) is not None:
-                tags.update(config_data['tags'])   # add item specific tag definitions to actual tags
-
-            fields = {}
-            if item.type() in ['num', 'bool']:
-                fields[self.value_field] = float(item())
+            if config_data['numeric']:
+                line = self.create_line(config_data, float(item()), caller, source, dest)
             else:
-                fields[self.value_field] = 0
-                tags[self.str_value_field] = str(item())
-            #fields[self.str_value_field] = '"'+str(item())+'"'
-
-            #line = self.create_line(name, tags, fields)
-            line = self.create_line(config_data['name'], tags, fields)
+                line = self.create_line(config_data, 0, caller, source, dest, str_value=str(item()))
             self.influx_writedata(config_data['bucket'], line)
 
 
@@ -386,38 +395,70 @@ class InfluxDB2(SmartPlugin):
 
     def replace_unwanted_chars(self, str):
 
-        str = str.replace(' ', '\ ').replace('ß', 'ss')
+        str = str.replace('ß', 'ss')
         str = str.replace('ä', 'ae').replace('Ä', 'Ae')
         str = str.replace('ö', 'oe').replace('Ö', 'Oe')
         str = str.replace('ü', 'ue').replace('Ü', 'Ue')
         return str
 
 
-    def create_line(self, name, tags, fields):
+    def escape(self, value, measurement=False):
+        """
+        Escape special characters for the line protocol
+
+        :param value: tag key, tag value or field key (or measurement name, if measurement is True)
+        :param measurement: True, if value is a measurement name
+        :return: escaped string
+        """
+        value = str(value).replace(',', '\\,').replace(' ', '\\ ')
+        if not measurement:
+            value = value.replace('=', '\\=')
+        return value
 
-        # build name and tags
-        name = self.replace_unwanted_chars(name)
-        kvs = [name]
+
+    def create_line_template(self, item_path, config_data):
+        """
+        Build the static part of the line protocol for an item
+
+        Measurement, item tag, global tags and item specific tags do not change after parse_item. They are
+        built and escaped once and stored in config_data['line_prefix']. config_data['dynamic_tags'] holds the
+        names of the tags (caller, source, dest, str_value field), that are added on each update.
+
+        :param item_path: Path of the item
+        :param config_data: plugin specific configuration of the item
+        """
+        tags = {'item': item_path}
+        tags.update(self.tags)                        # add global tag definitions
+        if config_data.get('tags', None) is not None:
+            tags.update(config_data['tags'])          # add item specific tag definitions
+        dynamic_tags = ['caller', 'dest', 'source']
+        if not config_data['numeric']:
+            dynamic_tags.append(self.str_value_field)
+            tags.pop(self.str_value_field, None)
+        config_data['dynamic_tags'] = [tag for tag in dynamic_tags if tag not in tags]
+
+        kvs = [self.escape(self.replace_unwanted_chars(config_data['name']), measurement=True)]
         for tag_key in sorted(tags.keys()):
-            k = tag_key
-            v = tags[tag_key]
-            # escape '=' in tag values
-            if v is not None:
-                v = v.replace("=", "\=")
-                v = v.replace(" ", "\ ")
-            kvs.append(f"{k}={v}")
-        line_tags = ','.join(kvs)
-
-        # build fields (which include the actual value)
-        kvs = []
-        for field_key in sorted(fields.keys()):
-            kvs.append("{k}={v}".format(k=field_key, v=fields[field_key]))
-        lineproto_fields = ','.join(kvs)
-        #if tags['item'].startswith('test') or name.startswith('Spann'):
-        #    self.logger.warning(f"create_line: {name} -> line_fields -> {lineproto_fields}")
-        #    self.logger.warning(f"create_line: {name} -> line_tags   -> {line_tags}")
-
-        return line_tags + ' ' + lineproto_fields
+            if tags[tag_key] is not None:
+                kvs.append(f"{self.escape(tag_key)}={self.escape(tags[tag_key])}")
+        config_data['line_prefix'] = ','.join(kvs)
+        config_data['line_field'] = f" {self.escape(self.value_field)}="
+
+
+    def create_line(self, config_data, value, caller=None, source=None, dest=None, str_value=None):
+        """
+        Build the line protocol for a value from the precomputed static part of the item
+
+        :return: line with measurement, tags, value field and timestamp (ns)
+        """
+        dynamic = {'caller': caller, 'source': source, 'dest': dest, self.str_value_field: str_value}
+        line = [config_data['line_prefix']]
+        for tag in config_data['dynamic_tags']:
+            if dynamic[tag] is not None:
+                line.append(f",{tag}={self.escape(dynamic[tag])}")
+        # explicit timestamp, as the lines are written in batches
+        line.append(f"{config_data['line_field']}{value} {time.time_ns()}")
+        return ''.join(line)
 
 
     def _url_base(self):
@@ -431,17 +472,23 @@ class InfluxDB2(SmartPlugin):
 
 
     def influx_writedata(self, bucket, data):
-        try:
-            url_string = self._url_base() + f"/api/v2/write?bucket={bucket}&org={self.org}"
-            r = requests.post(url_string, data=data, headers={'Authorization': 'Token '+self.api_token})
-            if(r.status_code != 204):
-                self.logger.error(f"Request returns http {r.status_code} [{r.text}]")
-        except Exception as e:
-            self.logger.error(f"Failed sending HTTP datagram [{data}] to {url_string} with error: {e}")
-        else:
-            #self.logger.debug(f"senthttp to {url_string} - Datagram [{data}] ")
-            #self.logger.debug(f"- r.text = {r.status_code} [{r.text}] ")
-            pass
+        """
+        Queue line protocol data for the bucket, it is written by the writer thread in batches
+        """
+        if not self._writer.write(bucket, data):
+            self.logger.debug(f"Write queue is full, dropping [{data}]")
+
+
+    def writer_metrics(self):
+        """
+        Return the statistics of the writer thread
+
+        :return: dict with the counters of the writer and the current queue size
+        :rtype: dict
+        """
+        metrics = dict(self._writer.metrics)
+        metrics['queue_size'] = self._writer.queue_size()
+        return metrics
 
 
     def gethttp(self, endpoint, data=None, auth=False):
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG.
+#  https://www.smarthomeNG.de
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
+
+
+class InfluxWriter:
+    """
+    Background writer for line protocol data
+
+    Lines are queued by the item update threads and written by a separate thread in batches
+    (one request per bucket). A batch is sent when it reaches ``batch_size`` lines or when the
+    oldest queued line is older than ``flush_interval`` seconds. If the server is not reachable,
+    the batches are appended to a spool file and replayed as soon as a write succeeds again.
+    """
+
+    def __init__(self, logger, url, params=None, headers=None, batch_size=5000, flush_interval=1.0,
+                 queue_size=100000, spool_file=None, spool_max_size=50, retry_interval=30, timeout=10):
+        """
+        :param logger: logger of the plugin
+        :param url: url of the write endpoint
+        :param params: function returning the url parameters for a bucket
+        :param headers: additional http headers (e.g. authorization)
+        :param batch_size: maximum number of lines per request
+        :param flush_interval: maximum time in seconds a line waits in the queue
+        :param queue_size: maximum number of queued lines, further lines are dropped
+        :param spool_file: file to spool batches to if the server is not reachable (None = no spooling)
+        :param spool_max_size: maximum size of the spool file in MB
+        :param retry_interval: time in seconds between replay attempts while the server is not reachable
+        :param timeout: timeout for http requests in seconds
+        """
+        self.logger = logger
+        self._url = url
+        self._params = params
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._spool_file = spool_file
+        self._spool_max_size = spool_max_size * 1024 * 1024
+        self._retry_interval = retry_interval
+        self._timeout = timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+
+        self._session = requests.Session()
+        self._session.headers.update({'Content-Type': 'text/plain; charset=utf-8', 'Content-Encoding': 'gzip'})
+        if headers:
+            self._session.headers.update(headers)
+
+        self.metrics = {'queued': 0, 'written': 0, 'requests': 0, 'failed': 0, 'rejected': 0, 'dropped': 0,
+                        'spooled': 0, 'replayed': 0, 'queue_max': 0, 'last_error': '', 'last_write': None}
+        self._spool_pending = spool_file is not None and \
+            (os.path.isfile(spool_file) or os.path.isfile(spool_file + '.replay'))
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='influxdb2.writer')
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """
+        Write all queued lines and stop the writer thread
+        """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        self._session.close()
+
+    def write(self, bucket, line):
+        """
+        Queue a line for the given bucket (called from the item update threads, does not block)
+        """
+        try:
+            self._queue.put_nowait((bucket, line))
+        except queue.Full:
+            self.metrics['dropped'] += 1
+            return False
+        self.metrics['queued'] += 1
+        size = self._queue.qsize()
+        if size > self.metrics['queue_max']:
+            self.metrics['queue_max'] = size
+        return True
+
+    def queue_size(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        batches = {}
+        count = 0
+        deadline = None
+        running = True
+        while running:
+            if deadline is not None:
+                timeout = max(deadline - time.monotonic(), 0)
+            elif self._spool_pending:
+                timeout = self._retry_interval
+            else:
+                timeout = None
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                entry = False
+            if entry is None:
+                running = False
+            elif entry:
+                bucket, line = entry
+                batches.setdefault(bucket, []).append(line)
+                count += 1
+                if deadline is None:
+                    deadline = time.monotonic() + self._flush_interval
+                if count < self._batch_size and time.monotonic() < deadline:
+                    continue
+            if count:
+                self._flush(batches)
+                batches = {}
+                count = 0
+                deadline = None
+            if running and self._spool_pending and (self.metrics['failed'] == 0 or entry is False):
+                self._replay()
+        # write lines queued after the stop request
+        while not self._queue.empty():
+            entry = self._queue.get_nowait()
+            if entry:
+                batches.setdefault(entry[0], []).append(entry[1])
+        if batches:
+            self._flush(batches)
+
+    def _flush(self, batches):
+        reachable = True
+        for bucket, lines in batches.items():
+            for i in range(0, len(lines), self._batch_size):
+                chunk = lines[i:i + self._batch_size]
+                if not reachable or not self._send(bucket, chunk):
+                    # do not wait for another timeout if the server is not reachable
+                    reachable = False
+                    self._spool(bucket, chunk)
+
+    def _send(self, bucket, lines):
+        """
+        Send lines to the server
+
+        :return: True if the lines do not need to be retried (written or rejected by the server)
+
+        If the server rejects a request with http 400, the lines are split and sent again until the rejected lines
+        are found, so valid lines of the same request are not lost.
+        """
+        data = gzip.compress('\n'.join(lines).encode('utf-8'))
+        self.metrics['requests'] += 1
+        try:
+            r = self._session.post(self._url, params=self._params(bucket) if self._params else None,
+                                   data=data, timeout=self._timeout)
+        except Exception as e:
+            self._failed(f"Failed sending {len(lines)} lines to {self._url}: {e}")
+            return False
+        if r.status_code in [200, 204]:
+            self.metrics['written'] += len(lines)
+            self.metrics['last_write'] = time.time()
+            self.metrics['failed'] = 0
+            return True
+        if r.status_code == 400 and len(lines) > 1:
+            # a malformed line rejects the whole request, so send both halves again to drop only the malformed lines
+            # (lines written twice are overwritten with the same values)
+            half = len(lines) // 2
+            return self._send(bucket, lines[:half]) and self._send(bucket, lines[half:])
+        if 400 <= r.status_code < 500 and r.status_code not in [401, 403, 404, 408, 429]:
+            # data was rejected by the server, sending it again would not help
+            self.metrics['rejected'] += len(lines)
+            self.metrics['last_error'] = f"http {r.status_code} [{r.text}]"
+            self.logger.error(f"Request returns http {r.status_code} [{r.text}], {len(lines)} lines rejected")
+            return True
+        self._failed(f"Request returns http {r.status_code} [{r.text}]")
+        return False
+
+    def _failed(self, text):
+        if self.metrics['failed'] == 0:
+            self.logger.error(text)
+        else:
+            self.logger.debug(text)
+        self.metrics['failed'] += 1
+        self.metrics['last_error'] = text
+
+    def _spool(self, bucket, lines, replay=False):
+        if self._spool_file is None:
+            self.metrics['dropped'] += len(lines)
+            return
+        try:
+            if os.path.isfile(self._spool_file) and os.path.getsize(self._spool_file) > self._spool_max_size:
+                self.metrics['dropped'] += len(lines)
+                self.logger.warning(f"Spool file {self._spool_file} is full, dropping {len(lines)} lines")
+                return
+            with open(self._spool_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps([bucket, lines]) + '\n')
+        except Exception as e:
+            self.metrics['dropped'] += len(lines)
+            self.logger.error(f"Failed writing {len(lines)} lines to spool file {self._spool_file}: {e}")
+            return
+        if not replay:
+            self.metrics['spooled'] += len(lines)
+        self._spool_pending = True
+
+    def _replay(self):
+        """
+        Resend the batches from the spool file, batches failing again are spooled again
+        """
+        replay_file = self._spool_file + '.replay'
+        try:
+            if not os.path.isfile(replay_file):
+                os.replace(self._spool_file, replay_file)
+        except Exception as e:
+            self.logger.error(f"Failed to replay spool file {self._spool_file}: {e}")
+            self._spool_pending = False
+            return
+        self._spool_pending = False
+        self.logger.debug(f"Replaying spooled data from {replay_file}")
+        reachable = True
+        with open(replay_file, 'r', encoding='utf-8') as f:
+            for entry in f:
+                try:
+                    bucket, lines = json.loads(entry)
+                except ValueError:
+                    continue
+                if reachable and self._send(bucket, lines):
+                    self.metrics['replayed'] += len(lines)
+                else:
+                    # server not reachable (anymore), keep the remaining batches for the next attempt
+                    reachable = False
+                    self._spool(bucket, lines, replay=True)
+        os.remove(replay_file)
+        if os.path.isfile(self._spool_file):
+            self._spool_pending = True
@@ -41,6 +41,9 @@ from lib.shtime import Shtime
 from . import dpts
 from . import knxproj
 from .knxd import KNXD
+from .startupreader import StartupReader
+from .sendqueue import SendQueue
+from .stats import TelegramStats, monotonic_to_datetime
 from .globals import *
 from .webif import WebInterface
 
@@ -84,10 +87,18 @@ class KNX(SmartPlugin):
 
         self.gal = {}                   # group addresses to listen to {DPT: dpt, ITEMS: [item 1, item 2, ..., item n], LOGICS: [ logic 1, logic 2, ..., logic n]}
         self.gar = {}                   # group addresses to reply if requested from knx, {DPT: dpt, ITEM: item, LOGIC: None}
+        self._dispatch = {}             # raw 16 bit group address to (decode function, items, logics, dpt, source suffix) for listened group addresses
+        self._ga_str = {}               # raw 16 bit group address to string, filled as group addresses occur
+        self._pa_str = {}               # raw 16 bit physical address to string, filled as physical addresses occur
+        self._src_prefix = self.get_instance_name() + ':' if self.get_instance_name() != '' else ''
         self._init_ga = []
         self._cache_ga = []             # group addresses which should be initalized by the knxd cache
         self._cache_ga_response_pending = []    # group adresses for which a read request was sent to knxd
         self._cache_ga_response_no_value = []   # group adresses for which a response from knxd did not provide a value
+        self._rx_count = 0                      # number of group telegrams received, used to pace reads at start-up
+        self._startup_reader = StartupReader(self.logger, self._cacheread, self.groupread, self._open_groupcon, lambda: self._rx_count,
+                                             window=self.get_parameter_value('startup_read_window'),
+                                             rate=self.get_parameter_value('startup_read_rate'))
 
         self.time_ga = self.get_parameter_value('time_ga')
         self.date_ga = self.get_parameter_value('date_ga')
@@ -100,32 +111,46 @@ class KNX(SmartPlugin):
 
         # following needed for statistics
         self.enable_stats = self.get_parameter_value('enable_stats')
-        self.stats_ga = {}              # statistics for used group addresses on the BUS
-        self.stats_pa = {}              # statistics for used group addresses on the BUS
+        # timestamps are kept as time.monotonic() values and converted to datetime by the get_stats_* functions
+        # the statistics use some MB of memory, so they are created when the first telegram is counted
+        self._stats_rate_window = self.get_parameter_value('stats_rate_window')
+        self.stats_ga = None            # statistics for used group addresses on the BUS
+        self.stats_pa = None            # statistics for used physical addresses on the BUS
         self.stats_last_read = None     # last read request from KNX
         self.stats_last_write = None    # last write from KNX
         self.stats_last_response = None # last response from KNX
-        self.stats_last_action = None   # the most recent action
         self._log_own_packets = self.get_parameter_value('log_own_packets')
         # following is for a special logger called busmonitor
         busmonitor = self.get_parameter_value('busmonitor')
 
+        # logger and level of busmonitor output to skip formatting of busmonitor text if it is not logged
+        self._bm_logger = self.logger
+        self._bm_level = logging.DEBUG
         if busmonitor.lower() in ['on','true']:
-            self._busmonitor = self.logger.info
+            self._bm_level = logging.INFO
         elif busmonitor.lower() in ['off', 'false']:
-            self._busmonitor = self.logger.debug
+            pass
         elif busmonitor.lower() == 'logger':
             self._bm_separatefile = True
             self._bm_format = "{0};{1};{2};{3}"
             self._bm_format_send = "{0};{1};{2};{3}"
             self._bm_format_poll = "{0};{1};{2}"
-            self._busmonitor = logging.getLogger("knx_busmonitor").info
+            self._bm_logger = logging.getLogger("knx_busmonitor")
+            self._bm_level = logging.INFO
             self.logger.info(self.translate("Using busmonitor (L) = '{}'").format(busmonitor))
         else:
             self.logger.warning(self.translate("Invalid value '{}' configured for parameter 'busmonitor', using 'false'").format(busmonitor))
-            self._busmonitor = self.logger.debug
+        self._busmonitor = self._bm_logger.info if self._bm_level == logging.INFO else self._bm_logger.debug
 
         self.readonly = self.get_parameter_value('readonly')
+
+        # optional queue to coalesce and pace outgoing writes
+        send_coalesce_window = self.get_parameter_value('send_coalesce_window')
+        send_rate = self.get_parameter_value('send_rate')
+        if send_coalesce_window or send_rate:
+            self._send_queue = SendQueue(self.logger, self._send, window=send_coalesce_window, rate=send_rate)
+        else:
+            self._send_queue = None
         if self.readonly:
             self.logger.warning(self.translate("!!! KNX Plugin in READONLY mode !!!"))
 
@@ -211,7 +236,10 @@ class KNX(SmartPlugin):
         else:
             if self.logger.isEnabledFor(logging.DEBUG):
                 self.logger.debug(self.translate("groupwrite telegram for: {} - Value: {} sent.").format(ga, payload))
-            self._send(pkt)
+            if self._send_queue is not None:
+                self._send_queue.put((pkt[2] << 8) | pkt[3], pkt, response=(flag == FLAG_KNXRESPONSE))
+            else:
+                self._send(pkt)
 
     def _cacheread(self, ga):
         pkt = bytearray([0, KNXD.CACHE_READ])
@@ -241,7 +269,10 @@ class KNX(SmartPlugin):
         else:
             if self.logger.isEnabledFor(logging.DEBUG):
                 self.logger.debug(self.translate('reading knxd group for ga: {}').format(ga))
-            self._send(pkt)
+            if self._send_queue is not None:
+                self._send_queue.put((pkt[2] << 8) | pkt[3], pkt, read=True)
+            else:
+                self._send(pkt)
 
     def _poll(self, **kwargs):
         if ITEM in kwargs:
@@ -294,40 +325,35 @@ class KNX(SmartPlugin):
 
         # set next kind of data to expect from connection
         self._isLength = True
+        client.terminator = 2
 
-        # if this is the first connect after init of plugin then read the
-        # group addresses from knxd which have the knx_cache attribute
-        if self._cache_ga != []:
-            if self.logger.isEnabledFor(logging.DEBUG):
-                self.logger.debug(self.translate('reading knxd cache'))
-            for ga in self._cache_ga:
-                self._cache_ga_response_pending.append(ga)
-            for ga in self._cache_ga:
-                if ga != '':
-                    self._cacheread(ga)
-                    # wait a little to not overdrive the knxd unless there is a fix
-                    time.sleep(KNXD_CACHEREAD_DELAY)
-            self._cache_ga = []
-            if self.logger.isEnabledFor(logging.DEBUG):
-                self.logger.debug(self.translate('finished reading knxd cache'))
+        # if this is the first connect after init of plugin then read the group addresses
+        # from knxd which have the knx_cache attribute and send the read requests for all
+        # group addresses which have the knx_init attribute. The start-up reader opens the
+        # group monitor after reading the cache.
+        cache_ga = [self._normalize_ga(ga) for ga in self._cache_ga if ga != '']
+        init_ga = [self._normalize_ga(ga) for ga in self._init_ga]
+        self._cache_ga_response_pending.extend(cache_ga)
+        self._cache_ga = []
+        self._init_ga = []
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(self.translate('knxd start-up read for {} cache ga and {} init ga').format(len(cache_ga), len(init_ga)))
+        self._startup_reader.start(cache_ga, init_ga)
 
-        # let knxd create a new group monitor and send the read requests
-        # for all group addresses which have the knx_read  attribute
+    def _open_groupcon(self):
+        """let knxd create a new group monitor"""
         if self.logger.isEnabledFor(logging.DEBUG):
             self.logger.debug(self.translate('enable group monitor'))
 
         init = bytearray([0, KNXD.OPEN_GROUPCON, 0, 0, 0])
         self._send(init)
-        client.terminator = 2
-        if self._init_ga != []:
-            if client.connected():
-                if self.logger.isEnabledFor(logging.DEBUG):
-                    self.logger.debug(self.translate('knxd init read for {} ga').format(len(self._init_ga)))
-                for ga in self._init_ga:
-                    self.groupread(ga)
-                self._init_ga = []
-                if self.logger.isEnabledFor(logging.DEBUG):
-                    self.logger.debug(self.translate('finished knxd init read'))
+
+    def get_startup_read_progress(self):
+        """
+        returns the progress of reading knx_cache and knx_init group addresses at start-up
+        :return: dict with state, total, done, cache_miss, timeout and duration in seconds
+        """
+        return self._startup_reader.progress
 
     def encode(self, data, dpt):
         return dpts.encode[str(dpt)](data)
@@ -335,6 +361,50 @@ class KNX(SmartPlugin):
     def decode(self, data, dpt):
         return dpts.decode[str(dpt)](data)
 
+    def _normalize_ga(self, ga):
+        """returns the group address in the form used for received telegrams, e.g. '1/2/3' for '01/2/03'"""
+        try:
+            high, low = dpts.enga(ga)
+        except Exception:
+            return ga
+        return self._ga_to_str((high << 8) | low)
+
+    def _ga_to_str(self, ga):
+        """returns the string for a raw 16 bit group address, strings are created once per group address"""
+        ga_str = self._ga_str.get(ga)
+        if ga_str is None:
+            ga_str = self._ga_str[ga] = "{0}/{1}/{2}".format((ga >> 11) & 0x1f, (ga >> 8) & 0x07, ga & 0xff)
+        return ga_str
+
+    def _pa_to_str(self, pa):
+        """returns the string for a raw 16 bit physical address, strings are created once per physical address"""
+        pa_str = self._pa_str.get(pa)
+        if pa_str is None:
+            pa_str = self._pa_str[pa] = "{0}.{1}.{2}".format((pa >> 12) & 0x0f, (pa >> 8) & 0x0f, pa & 0xff)
+        return pa_str
+
+    def _busmonitor_enabled(self):
+        return self._bm_logger.isEnabledFor(self._bm_level)
+
+    def _update_dispatch(self, ga):
+        """
+        (re)builds the entry of the dispatch table for a group address from self.gal
+
+        The dispatch table is keyed by the raw 16 bit group address as received from knxd. The lists of items
+        and logics are shared with self.gal, so items or logics added later to an existing group address are included.
+
+        :param ga: group address as string like in item configuration
+        """
+        try:
+            high, low = dpts.enga(ga)
+            ga_raw = (high << 8) | low
+        except Exception:
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(self.translate("problem encoding ga: {}").format(ga))
+            return
+        entry = self.gal[ga]
+        self._dispatch[ga_raw] = (dpts.decode[str(entry[DPT])], entry[ITEMS], entry[LOGICS], entry[DPT], ':ga=' + self._ga_to_str(ga_raw))
+
     def parse_knxd_message(self, client, data):
         """
         inspects a message from knxd (eibd)
@@ -391,10 +461,12 @@ class KNX(SmartPlugin):
             src = ""
             dst = ""
             try:
-                src = self.decode(knx_data[0:2], 'pa')
-                dst = self.decode(knx_data[2:4], 'ga')
+                src = self._pa_to_str((knx_data[0] << 8) | knx_data[1])
+                dst = self._ga_to_str((knx_data[2] << 8) | knx_data[3])
             finally:
                 self._cache_ga_response_no_value.append(dst)
+                if self._startup_reader.active:
+                    self._startup_reader.completed(dst, False)
                 loglevel = logging.getLevelName(self.loglevel_knxd_cache_problems)
                 if not isinstance( loglevel, int):
                   loglevel = logging.getLevelName(loglevel)
@@ -408,17 +480,23 @@ class KNX(SmartPlugin):
             return
 
 
-        src = self.decode(knx_data[0:2], 'pa')
-        dst = self.decode(knx_data[2:4], 'ga')
+        self._rx_count += 1
+        src_raw = (knx_data[0] << 8) | knx_data[1]
+        dst_raw = (knx_data[2] << 8) | knx_data[3]
+        src = self._pa_to_str(src_raw)
+        dst = self._ga_to_str(dst_raw)
 
         flg = knx_data[5] & KNX_FLAG_MASK
         is_ga = knx_data[4] & 0b1000000
         if flg == FLAG_KNXWRITE:
             flg = 'write'
+            stats_flag = STATS_WRITE
         elif flg == FLAG_KNXREAD:
             flg = 'read'
+            stats_flag = STATS_READ
         elif flg == FLAG_KNXRESPONSE:
             flg = 'response'
+            stats_flag = STATS_RESPONSE
         else:
             self.logger.warning("Unknown flag: {:02x} src: {} dest: {}".format(flg, src, dst))
             return
@@ -436,39 +514,32 @@ class KNX(SmartPlugin):
             return
 
         if self.enable_stats:
-            # update statistics on used group addresses
-            if dst not in self.stats_ga:
-                self.stats_ga[dst] = {}
-
-            if flg not in self.stats_ga[dst]:
-                self.stats_ga[dst][flg] = 1
-            else:
-                self.stats_ga[dst][flg] = self.stats_ga[dst][flg] + 1
-            self.stats_ga[dst]['last_' + flg] = self.shtime.now()
-
-            # update statistics on used physical addresses
-            if src not in self.stats_pa:
-                self.stats_pa[src] = {}
-
-            if flg not in self.stats_pa[src]:
-                self.stats_pa[src][flg] = 1
-            else:
-                self.stats_pa[src][flg] = self.stats_pa[src][flg] + 1
-            self.stats_pa[src]['last_' + flg] = self.shtime.now()
+            # update statistics on used group addresses and physical addresses
+            now = time.monotonic()
+            if self.stats_ga is None:
+                self.stats_ga = TelegramStats(self._ga_to_str, self._stats_rate_window)
+                self.stats_pa = TelegramStats(self._pa_to_str)
+            self.stats_ga.count(dst_raw, stats_flag, now)
+            self.stats_pa.count(src_raw, stats_flag, now)
 
         # further inspect what to do next
         if flg == 'write' or flg == 'response':
-            if dst not in self.gal:  # update item/logic
-                self._busmonitor(self._bm_format.format(self.get_instance_name(), src, dst, binascii.hexlify(payload).decode()))
+            entry = self._dispatch.get(dst_raw)
+            if entry is None:  # update item/logic
+                if self._busmonitor_enabled():
+                    self._busmonitor(self._bm_format.format(self.get_instance_name(), src, dst, binascii.hexlify(payload).decode()))
                 return
-            dpt = self.gal[dst][DPT]
+            decode, items, logics, dpt, src_suffix = entry
             try:
-                val = self.decode(payload, dpt)
+                val = decode(payload)
             except Exception as e:
                 self.logger.exception("Problem decoding frame from {} to {} with '{}' and DPT {}. Exception: {}".format(src, dst, binascii.hexlify(payload).decode(), dpt, e))
                 return
+            if self._startup_reader.active:
+                self._startup_reader.completed(dst, val is not None)
             if val is not None:
-                self._busmonitor(self._bm_format.format(self.get_instance_name(), src, dst, val))
+                if self._busmonitor_enabled():
+                    self._busmonitor(self._bm_format.format(self.get_instance_name(), src, dst, val))
                 # print "in:  {0}".format(self.decode(payload, 'hex'))
                 # out = ''
                 # for i in self.encode(val, dpt):
@@ -482,15 +553,12 @@ class KNX(SmartPlugin):
                 way = "" if knxd_msg_type != KNXD.CACHE_READ else " (from knxd Cache)"
                 if self.logger.isEnabledFor(logging.DEBUG):
                     self.logger.debug("{} request from {} to {} with '{}' and DPT {}{}".format(flg, src, dst, binascii.hexlify(payload).decode(), dpt, way))
-                src_wrk = self.get_instance_name()
-                if src_wrk != '':
-                    src_wrk += ':'
-                src_wrk += src + ':ga=' + dst
-                for item in self.gal[dst][ITEMS]:
+                src_wrk = self._src_prefix + src + src_suffix
+                for item in items:
                     if self.logger.isEnabledFor(logging.DEBUG):
                         self.logger.debug("Set Item '{}' to value '{}' caller='{}', source='{}', dest='{}'".format(item, val, self.get_shortname(), src, dst))
                     item(val, self.get_shortname(), src_wrk, dst)
-                for logic in self.gal[dst][LOGICS]:
+                for logic in logics:
                     if self.logger.isEnabledFor(logging.DEBUG):
                         self.logger.debug("Trigger Logic '{}' from caller='{}', source='{}', value '{}', dest='{}'".format(logic, self.get_shortname(), src_wrk, val, dst))
                     logic.trigger(self.get_shortname(), src_wrk, val, dst)
@@ -498,14 +566,14 @@ class KNX(SmartPlugin):
                 self.logger.warning("Wrong payload '{2}' for ga '{1}' with dpt '{0}'.".format(dpt, dst, binascii.hexlify(payload).decode()))
             if self.enable_stats:
                 if flg == 'write':
-                    self.stats_last_write = self.shtime.now()
+                    self.stats_last_write = now
                 else:
-                    self.stats_last_response = self.shtime.now()
+                    self.stats_last_response = now
         elif flg == 'read':
             if self.logger.isEnabledFor(logging.DEBUG):
                 self.logger.debug("Device with physical address '{}' requests read for ga '{}'".format(src, dst))
             if self.enable_stats:
-                self.stats_last_read = self.shtime.now()
+                self.stats_last_read = now
             if dst in self.gar:  # read item
                 if self.gar[dst][ITEM] is not None:
                     item = self.gar[dst][ITEM]
@@ -516,10 +584,7 @@ class KNX(SmartPlugin):
                         self._busmonitor(self._bm_format.format(self.get_instance_name(), src, dst, val))
                     self.groupwrite(dst, val, self.get_iattr_value(item.conf,KNX_DPT), 'response')
                 if self.gar[dst][LOGIC] is not None:
-                    src_wrk = self.get_instance_name()
-                    if src_wrk != '':
-                        src_wrk += ':'
-                    src_wrk += src + ':ga=' + dst
+                    src_wrk = self._src_prefix + src + ':ga=' + dst
                     if self.logger.isEnabledFor(logging.DEBUG):
                         self.logger.debug("Trigger Logic '{}' from caller='{}', source='{}', dest='{}'".format(self.gar[dst][LOGIC], self.get_shortname(), src_wrk, dst))
                     self.gar[dst][LOGIC].trigger(self.get_shortname(), src_wrk, None, dst)
@@ -545,6 +610,8 @@ class KNX(SmartPlugin):
         if self.logger.isEnabledFor(logging.DEBUG):
             self.logger.debug("Plugin '{}': run method called".format(self.get_fullname()))
         self.alive = True
+        if self._send_queue is not None:
+            self._send_queue.start()
         self._client.connect()
         # moved from __init__() for proper restart behaviour
         for item in self._startup_polling:
@@ -563,7 +630,11 @@ class KNX(SmartPlugin):
         """
         if self.logger.isEnabledFor(logging.DEBUG):
             self.logger.debug("Plugin '{}': stop method called".format(self.get_fullname()))
+        if self._send_queue is not None:
+            # send the queued telegrams before the plugin stops
+            self._send_queue.stop()
         self.alive = False
+        self._startup_reader.stop()
         # added to effect better cleanup on stop
         if self.scheduler_get(f'KNX[{self.get_instance_name()}] time'):
             self.scheduler_remove(f'KNX[{self.get_instance_name()}] time')
@@ -607,6 +678,7 @@ class KNX(SmartPlugin):
                     self.logger.debug("{} listen on {}".format(item, ga))
                 if ga not in self.gal:
                     self.gal[ga] = {DPT: dpt, ITEMS: [item], LOGICS: []}
+                    self._update_dispatch(ga)
                 else:
                     if item not in self.gal[ga][ITEMS]:
                         self.gal[ga][ITEMS].append(item)
@@ -620,6 +692,7 @@ class KNX(SmartPlugin):
                 ga = ga[0]
             if ga not in self.gal:
                 self.gal[ga] = {DPT: dpt, ITEMS: [item], LOGICS: []}
+                self._update_dispatch(ga)
             else:
                 if item not in self.gal[ga][ITEMS]:
                     self.gal[ga][ITEMS].append(item)
@@ -634,6 +707,7 @@ class KNX(SmartPlugin):
                 ga = ga[0]
             if ga not in self.gal:
                 self.gal[ga] = {DPT: dpt, ITEMS: [item], LOGICS: []}
+                self._update_dispatch(ga)
             else:
                 if item not in self.gal[ga][ITEMS]:
                     self.gal[ga][ITEMS].append(item)
@@ -706,6 +780,7 @@ class KNX(SmartPlugin):
                     self.logger.debug("{} listen on {}".format(logic, ga))
                 if ga not in self.gal:
                     self.gal[ga] = {DPT: dpt, ITEMS: [], LOGICS: [logic]}
+                    self._update_dispatch(ga)
                 else:
                     self.gal[ga][LOGICS].append(logic)
 
@@ -799,17 +874,15 @@ class KNX(SmartPlugin):
         """
         clear statistic values for group addresses
         """
-        if len(self.stats_ga):
-            for ga in self.stats_ga:
-                self.stats_ga[ga] = {}
+        if self.stats_ga is not None:
+            self.stats_ga.clear()
 
     def clear_stats_pa(self):
         """
         clear statistic values for physical addresses
         """
-        if len(self.stats_pa):
-            for ga in self.stats_pa:
-                self.stats_pa[ga] = {}
+        if self.stats_pa is not None:
+            self.stats_pa.clear()
 
     def get_stats_ga(self):
         """
@@ -820,12 +893,15 @@ class KNX(SmartPlugin):
                              'response' : n-response,       # counter of response operations from KNX
                              'last_read' : datetime,        # the respective datetime object of read,
                              'last_write' : datetime,       # write
-                             'last_response' : datetime },  # and response
+                             'last_response' : datetime,    # and response
+                             'rate' : n-per-minute },       # telegrams per minute, only if stats_rate_window is set
                      ga2 : {...} }
         ```
         :return: dict
         """
-        return self.stats_ga
+        if self.stats_ga is None:
+            return {}
+        return self.stats_ga.as_dict(time.monotonic(), self.shtime.now())
 
     def get_stats_pa(self):
         """
@@ -841,28 +917,30 @@ class KNX(SmartPlugin):
         ```
         :return: dict
         """
-        return self.stats_pa
+        if self.stats_pa is None:
+            return {}
+        return self.stats_pa.as_dict(time.monotonic(), self.shtime.now())
 
     def get_stats_last_read(self):
         """
         return the time of the last read request on KNX
         :return: datetime of last time read
         """
-        return self.stats_last_read
+        return monotonic_to_datetime(self.stats_last_read, time.monotonic(), self.shtime.now())
 
     def get_stats_last_write(self):
         """
         return the time of the last write request on KNX
         :return: datetime of last time write
         """
-        return self.stats_last_write
+        return monotonic_to_datetime(self.stats_last_write, time.monotonic(), self.shtime.now())
 
     def get_stats_last_response(self):
         """
         return the time of the last response on KNX
         :return: datetime of last response write
         """
-        return self.stats_last_response
+        return monotonic_to_datetime(self.stats_last_response, time.monotonic(), self.shtime.now())
 
     def get_stats_last_action(self):
         """
@@ -875,7 +953,24 @@ class KNX(SmartPlugin):
         if ar == []:
             return None
         else:
-            return max(ar)
+            return monotonic_to_datetime(max(ar), time.monotonic(), self.shtime.now())
+
+    def get_stats_send_queue(self):
+        """
+        returns statistics of the send queue, if it is enabled by send_coalesce_window or send_rate
+        ```
+        { 'depth' : n,          # number of currently queued telegrams
+          'depth_max' : n,      # maximum number of queued telegrams
+          'queued' : n,         # number of queued telegrams
+          'sent' : n,           # number of sent telegrams
+          'coalesced' : n,      # number of writes replaced by a later write to the same group address
+          'dropped' : n }       # number of telegrams dropped because the queue was full
+        ```
+        :return: dict or None if send queue is not enabled
+        """
+        if self._send_queue is None:
+            return None
+        return dict(self._send_queue.stats, depth=self._send_queue.depth())
 
     def get_unsatisfied_cache_read_ga(self):
         """
@@ -28,6 +28,8 @@
 
 KNXD_CACHEREAD_DELAY  = 0.35
 KNXD_CACHEREAD_DELAY  = 0.0
+STARTUP_READ_TIMEOUT  = 5.0     # seconds to wait for the response to a cache or group read at start-up
+SEND_QUEUE_SIZE       = 1000    # maximum number of telegrams in the send queue
 
 KNX_DATA_MASK =     0b00111111 # 0x3f up to 6 bits form data content
 KNX_FLAG_MASK =     0b11000000 # 0xC0
@@ -36,6 +38,11 @@ FLAG_KNXRESPONSE =  0b01000000 # 0x40
 FLAG_KNXWRITE =     0b10000000 # 0x80
 FLAG_RESERVED =     0b11000000 # 0xC0 none of the above flags, one need to examine the previous byte for lowest two bits then
 
+# index of flags in statistics arrays, see stats.STATS_FLAGS
+STATS_READ =        0
+STATS_WRITE =       1
+STATS_RESPONSE =    2
+
 # attribute keywords
 KNX_DPT      = 'knx_dpt'          # data point type
 KNX_STATUS   = 'knx_status'       # status
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG.py.
+#  Visit:  https://github.com/smarthomeNG/
+#          https://knx-user-forum.de/forum/supportforen/smarthome-py
+#
+#  SmartHomeNG.py is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG.py is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG.py. If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+import threading
+import time
+from collections import deque
+
+from .globals import SEND_QUEUE_SIZE
+
+
+class SendQueue:
+    """
+    Queue for outgoing group telegrams
+
+    Writes to a group address are delayed by ``window`` seconds. Further writes to the same group address
+    within that time replace the queued value (last value wins), so only one telegram is sent. Responses to
+    read requests are never replaced and are sent before queued writes. Read requests are not delayed; a write
+    still queued for the same group address is sent right before the read request, so the read returns the
+    written value. A separate thread sends the telegrams, limited to ``rate`` telegrams per second (0 = no limit).
+    """
+
+    def __init__(self, logger, send, window=0.0, rate=0, size=SEND_QUEUE_SIZE):
+        """
+        :param logger: logger of the plugin
+        :param send: function to send a telegram to knxd
+        :param window: time in seconds writes to a group address are coalesced
+        :param rate: maximum number of telegrams per second, 0 = no limit
+        :param size: maximum number of queued telegrams, further telegrams are dropped
+        """
+        self.logger = logger
+        self._send = send
+        self._window = max(float(window), 0.0)
+        self._interval = 1 / rate if rate else 0.0
+        self._size = size
+        self._cond = threading.Condition()
+        self._writes = deque()          # entries [due, ga, telegram] in order of due time
+        self._pending = {}              # ga to queued entry of writes
+        self._responses = deque()       # telegrams of responses
+        self._reads = deque()           # telegrams of read requests and of writes flushed before a read request
+        self._thread = None
+        self._running = False
+        self.stats = {'queued': 0, 'sent': 0, 'coalesced': 0, 'dropped': 0, 'depth_max': 0}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='knx.sendqueue')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Send all queued telegrams without delay and stop the sending thread
+        """
+        if self._thread is None:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(5)
+        self._thread = None
+
+    def depth(self):
+        return len(self._writes) + len(self._responses) + len(self._reads)
+
+    def put(self, ga, telegram, response=False, read=False):
+        """
+        Queue a telegram (called from item update threads, does not block)
+
+        :param ga: raw 16 bit group address of the telegram
+        :param telegram: telegram as bytearray to be sent to knxd
+        :param response: True for responses to read requests, which are not coalesced
+        :param read: True for read requests, which are not coalesced and not delayed
+        :return: False if the telegram was dropped
+        """
+        with self._cond:
+            if read:
+                # keep the order of a queued write and the read request for the same group address
+                entry = self._pending.pop(ga, None)
+                if entry is not None:
+                    self._writes.remove(entry)
+                    self._reads.append(entry[2])
+            elif not response:
+                entry = self._pending.get(ga)
+                if entry is not None:
+                    entry[2] = telegram
+                    self.stats['coalesced'] += 1
+                    return True
+            if self.depth() >= self._size:
+                self.stats['dropped'] += 1
+                if self.stats['dropped'] == 1:
+                    self.logger.warning("Send queue is full, dropping telegrams")
+                return False
+            if response:
+                self._responses.append(telegram)
+            elif read:
+                self._reads.append(telegram)
+            else:
+                entry = [time.monotonic() + self._window, ga, telegram]
+                self._writes.append(entry)
+                self._pending[ga] = entry
+            self.stats['queued'] += 1
+            depth = self.depth()
+            if depth > self.stats['depth_max']:
+                self.stats['depth_max'] = depth
+            self._cond.notify()
+        return True
+
+    def _run(self):
+        next_send = 0.0
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                if not self._running:
+                    break
+                telegram = None
+                if now >= next_send:
+                    if self._responses:
+                        telegram = self._responses.popleft()
+                    elif self._reads:
+                        telegram = self._reads.popleft()
+                    elif self._writes and self._writes[0][0] <= now:
+                        _, ga, telegram = self._writes.popleft()
+                        del self._pending[ga]
+                if telegram is None:
+                    if self._responses or self._reads:
+                        timeout = next_send - now
+                    elif self._writes:
+                        timeout = max(self._writes[0][0], next_send) - now
+                    else:
+                        timeout = None
+                    self._cond.wait(timeout)
+                    continue
+            self._send_telegram(telegram)
+            next_send = time.monotonic() + self._interval
+
+        # send remaining telegrams at stop
+        with self._cond:
+            remaining = list(self._responses) + list(self._reads) + [entry[2] for entry in self._writes]
+            self._responses.clear()
+            self._reads.clear()
+            self._writes.clear()
+            self._pending.clear()
+        for telegram in remaining:
+            self._send_telegram(telegram)
+
+    def _send_telegram(self, telegram):
+        try:
+            self._send(telegram)
+            self.stats['sent'] += 1
+        except Exception as e:
+            self.logger.error(f"Problem sending telegram {telegram}: {e}")
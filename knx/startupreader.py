@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG.py.
+#  Visit:  https://github.com/smarthomeNG/
+#          https://knx-user-forum.de/forum/supportforen/smarthome-py
+#
+#  SmartHomeNG.py is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG.py is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG.py. If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+import threading
+import time
+
+from .globals import STARTUP_READ_TIMEOUT
+
+
+class StartupReader:
+    """
+    Reads the group addresses with knx_cache and knx_init after a connection to knxd was established
+
+    The reads are done by a separate thread with a sliding window of outstanding requests. A request is
+    completed by the response for its group address or after a timeout. At first the knxd cache is read
+    for all knx_cache group addresses, then the group monitor is opened and group reads are sent for all
+    knx_init group addresses and for the knx_cache group addresses knxd could not provide a value for.
+    Group reads are paced to a maximum rate of telegrams per second, which is reduced by the telegrams
+    received from the bus at the same time.
+    """
+
+    def __init__(self, logger, cache_read, group_read, open_groupcon, bus_count, window=10, rate=10.0, timeout=STARTUP_READ_TIMEOUT):
+        """
+        :param logger: logger of the plugin
+        :param cache_read: function to send a knxd cache read request for a group address
+        :param group_read: function to send a group read request for a group address
+        :param open_groupcon: function to open the group monitor after the cache was read
+        :param bus_count: function returning the number of telegrams received from the bus so far
+        :param window: maximum number of outstanding requests
+        :param rate: maximum number of telegrams per second on the bus while sending group reads
+        :param timeout: time in seconds to wait for a response
+        """
+        self.logger = logger
+        self._cache_read = cache_read
+        self._group_read = group_read
+        self._open_groupcon = open_groupcon
+        self._bus_count = bus_count
+        self._window = max(int(window), 1)
+        self._rate = max(float(rate), 0.1)
+        self._timeout = timeout
+        self._cond = threading.Condition()
+        self._outstanding = {}
+        self._misses = []
+        self._thread = None
+        self._running = False
+        self.active = False
+        self.progress = {'state': 'idle', 'total': 0, 'done': 0, 'cache_miss': 0, 'timeout': 0, 'duration': None}
+
+    def start(self, cache_ga, init_ga):
+        """
+        Start reading in a separate thread, a running read is stopped before
+
+        :param cache_ga: group addresses to be read from knxd cache
+        :param init_ga: group addresses to be read from the bus
+        """
+        self.stop()
+        self._running = True
+        self.active = True
+        self._thread = threading.Thread(target=self._run, args=(list(dict.fromkeys(cache_ga)), list(dict.fromkeys(init_ga))), name='knx.startupreader')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join(self._timeout + 1)
+        self._thread = None
+        self.active = False
+
+    def completed(self, ga, value=True):
+        """
+        Called for each received response, completes the outstanding request for the group address
+
+        :param ga: group address of the response
+        :param value: False if the response did not provide a value
+        """
+        with self._cond:
+            if self._outstanding.pop(ga, None) is None:
+                return
+            self.progress['done'] += 1
+            if not value:
+                self._misses.append(ga)
+            self._cond.notify_all()
+
+    def _run(self, cache_ga, init_ga):
+        start = time.monotonic()
+        self.progress = {'state': 'cache', 'total': len(cache_ga) + len(init_ga), 'done': 0, 'cache_miss': 0, 'timeout': 0, 'duration': None}
+        try:
+            misses = self._read(cache_ga, self._cache_read, paced=False)
+            if not self._running:
+                return
+            self.progress['cache_miss'] = len(misses)
+            if misses:
+                self.logger.info(f"knxd cache could not provide values for {len(misses)} group addresses, reading them from the bus")
+
+            self._open_groupcon()
+
+            group_ga = list(dict.fromkeys(init_ga + misses))
+            self.progress['total'] += len(group_ga) - len(init_ga)
+            self.progress['state'] = 'init'
+            self._read(group_ga, self._group_read, paced=True)
+        except Exception as e:
+            self.logger.error(f"Problem reading group addresses at start-up: {e}")
+        finally:
+            self.progress['duration'] = round(time.monotonic() - start, 1)
+            if self._running:
+                self.progress['state'] = 'finished'
+                self.logger.info(f"Start-up read of {self.progress['total']} group addresses finished in {self.progress['duration']} seconds ({self.progress['timeout']} without response)")
+            else:
+                self.progress['state'] = 'stopped'
+            self.active = False
+
+    def _read(self, gas, send, paced):
+        """
+        Send requests for all group addresses and wait for the responses
+
+        :return: list of group addresses, for which the response did not provide a value
+        """
+        with self._cond:
+            self._outstanding = {}
+            self._misses = []
+
+        index = 0
+        next_send = time.monotonic()
+        sample_time = next_send
+        sample_count = self._bus_count()
+        interval = 1 / self._rate
+
+        while True:
+            with self._cond:
+                if not self._running:
+                    return []
+                now = time.monotonic()
+                for ga, deadline in list(self._outstanding.items()):
+                    if deadline <= now:
+                        del self._outstanding[ga]
+                        self.progress['timeout'] += 1
+                if index >= len(gas) and not self._outstanding:
+                    return self._misses
+
+                if paced and now - sample_time >= 1:
+                    # reduce rate by the telegrams received from the bus
+                    count = self._bus_count()
+                    bus_rate = (count - sample_count) / (now - sample_time)
+                    sample_time, sample_count = now, count
+                    interval = 1 / max(self._rate - bus_rate, self._rate / 10)
+
+                ga = None
+                if index < len(gas) and len(self._outstanding) < self._window and (not paced or now >= next_send):
+                    ga = gas[index]
+                    index += 1
+                    self._outstanding[ga] = now + self._timeout
+                    next_send = now + interval
+                else:
+                    wakeup = min(self._outstanding.values(), default=now + self._timeout)
+                    if index < len(gas) and len(self._outstanding) < self._window:
+                        wakeup = min(wakeup, next_send)
+                    self._cond.wait(max(wakeup - now, 0.01))
+                    continue
+            send(ga)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG.py.
+#  Visit:  https://github.com/smarthomeNG/
+#          https://knx-user-forum.de/forum/supportforen/smarthome-py
+#
+#  SmartHomeNG.py is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG.py is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG.py. If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+from array import array
+from datetime import timedelta
+
+ADDRESS_COUNT = 0x10000                         # raw 16 bit group or physical addresses
+STATS_FLAGS = ('read', 'write', 'response')     # index of flag is used as offset in counter arrays
+
+
+def monotonic_to_datetime(timestamp, now_monotonic, now):
+    """converts a time.monotonic() timestamp to a datetime based on the current values of both clocks"""
+    if not timestamp:
+        return None
+    return now - timedelta(seconds=now_monotonic - timestamp)
+
+
+class TelegramStats:
+    """
+    Counters and timestamps of received telegrams per raw 16 bit address
+
+    The counters and the time.monotonic() timestamps of the last telegram are kept in arrays with one slot per
+    address and flag, so the memory used does not grow with the runtime. Timestamps are converted to datetime
+    only when the statistics are requested. Optionally the rate of telegrams per address is determined over a
+    sliding window of ``rate_window`` seconds.
+    """
+
+    def __init__(self, address_to_str, rate_window=0):
+        """
+        :param address_to_str: function to convert a raw address to its string representation
+        :param rate_window: length of the sliding window in seconds to determine the rate, 0 = no rate
+        """
+        self._address_to_str = address_to_str
+        self._rate_window = rate_window
+        self.counts = array('I', [0]) * (ADDRESS_COUNT * len(STATS_FLAGS))
+        self.last = array('d', [0.0]) * (ADDRESS_COUNT * len(STATS_FLAGS))
+        self.used = bytearray(ADDRESS_COUNT)
+        self._window_start = 0.0
+        self._window_counts = None
+        self._previous_counts = None
+        self._clear_rate()
+
+    def count(self, address, flag, now):
+        """
+        count a telegram
+
+        :param address: raw 16 bit address
+        :param flag: index of flag in STATS_FLAGS
+        :param now: time.monotonic() of reception
+        """
+        index = address * 3 + flag
+        self.counts[index] += 1
+        self.last[index] = now
+        if not self.used[address]:
+            self.used[address] = 1
+        if self._rate_window:
+            if now - self._window_start >= self._rate_window:
+                self._next_window(now)
+            self._window_counts[address] += 1
+
+    def _next_window(self, now):
+        if now - self._window_start >= 2 * self._rate_window:
+            self._previous_counts = array('I', [0]) * ADDRESS_COUNT
+            self._window_start = now
+        else:
+            self._previous_counts = self._window_counts
+            self._window_start += self._rate_window
+        self._window_counts = array('I', [0]) * ADDRESS_COUNT
+
+    def rate(self, address, now):
+        """
+        rate of telegrams per minute for the address, estimated from the current and the previous window
+
+        :param address: raw 16 bit address
+        :param now: time.monotonic()
+        """
+        elapsed = now - self._window_start
+        current, previous = self._window_counts[address], self._previous_counts[address]
+        if elapsed >= 2 * self._rate_window:
+            return 0.0
+        if elapsed >= self._rate_window:
+            current, previous = 0, current
+            elapsed -= self._rate_window
+        weight = 1 - elapsed / self._rate_window
+        return round((previous * weight + current) * 60 / self._rate_window, 2)
+
+    def clear(self):
+        """clear counters and timestamps, the addresses stay known"""
+        self.counts = array('I', [0]) * (ADDRESS_COUNT * len(STATS_FLAGS))
+        self.last = array('d', [0.0]) * (ADDRESS_COUNT * len(STATS_FLAGS))
+        self._clear_rate()
+
+    def _clear_rate(self):
+        if self._rate_window:
+            self._window_counts = array('I', [0]) * ADDRESS_COUNT
+            self._previous_counts = array('I', [0]) * ADDRESS_COUNT
+
+    def as_dict(self, now_monotonic, now):
+        """
+        returns the statistics as dict with address strings as keys
+
+        :param now_monotonic: current time.monotonic()
+        :param now: current datetime
+        """
+        stats = {}
+        for address, used in enumerate(self.used):
+            if not used:
+                continue
+            entry = {}
+            for flag, name in enumerate(STATS_FLAGS):
+                index = address * 3 + flag
+                if self.counts[index]:
+                    entry[name] = self.counts[index]
+                    entry['last_' + name] = monotonic_to_datetime(self.last[index], now_monotonic, now)
+            if self._rate_window:
+                entry['rate'] = self.rate(address, now_monotonic)
+            stats[self._address_to_str(address)] = entry
+        return stats
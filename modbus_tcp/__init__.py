@@ -50,6 +50,8 @@ AttrWordOrder = 'modBusWordOrder'
 AttrSlaveUnit = 'modBusUnit'
 AttrObjectType = 'modBusObjectType'
 AttrDirection = 'modBusDirection'
+AttrPollCycle = 'modBusPollCycle'
+AttrDeadband = 'modBusDeadband'
 
 BAD_VALUE_SINT16 = 0x8000
 BAD_VALUE_SINT32 = 0x80000000
@@ -58,6 +60,15 @@ BAD_VALUE_UINT16 = 0xFFFF
 BAD_VALUE_UINT32 = 0xFFFFFFFF
 BAD_VALUE_UINT64 = 0xFFFFFFFFFFFFFFFF
 
+# maximum number of registers/bits that can be read with one request (modbus specification)
+MAX_READ_REGISTERS = 125
+MAX_READ_BITS = 2000
+
+# number of consecutive failed reads of a block, after which its items are read separately
+READ_BLOCK_SPLIT_ERRORS = 3
+# number of polls, after which a block whose items are read separately is read with one request again
+READ_BLOCK_RETRY_POLLS = 10
+
 
 class modbus_tcp(SmartPlugin):
     """
@@ -102,9 +113,13 @@ class modbus_tcp(SmartPlugin):
 
         self._pause_item_path = self.get_parameter_value('pause_item')
 
+        self._readGap = self.get_parameter_value('read_gap')              # max. number of unused registers within a read block
+        self._readBlockSize = self.get_parameter_value('read_block_size')  # max. number of registers per read block
+
         self._sh = sh
         self._regToRead = {}
         self._regToWrite = {}
+        self._readPlan = []
         self._pollStatus = {}
         self.connected = False
 
@@ -123,9 +138,12 @@ class modbus_tcp(SmartPlugin):
 
         self.alive = True
 
+        self.error_count = 0  # Initialize error count
         if self._cycle or self._crontab:
-            self.error_count = 0  # Initialize error count
             self.scheduler_add('poll_device_' + self._host, self.poll_device, cycle=self._cycle, cron=self._crontab, prio=5)
+        # registers with their own poll cycle
+        for pollCycle in self.__poll_cycles():
+            self.scheduler_add(f'poll_device_{self._host}_{pollCycle}', self.poll_device, cycle=pollCycle, value={'pollCycle': pollCycle}, prio=5)
         self.logger.debug(f"Plugin '{self.get_fullname()}': run method finished ")
 
     def stop(self):
@@ -135,6 +153,8 @@ class modbus_tcp(SmartPlugin):
         self.alive = False
         self.logger.debug(f"Plugin '{self.get_fullname()}': stop method called")
         self.scheduler_remove('poll_device_' + self._host)
+        for pollCycle in self.__poll_cycles():
+            self.scheduler_remove(f'poll_device_{self._host}_{pollCycle}')
         self._Mclient.close()
         self.connected = False
         self.logger.debug(f"Plugin '{self.get_fullname()}': stop method finished")
@@ -167,6 +187,8 @@ class modbus_tcp(SmartPlugin):
             wordOrderStr = 'Endian.BIG'
             slaveUnit = self._slaveUnit
             dataDirection = 'read'
+            pollCycle = 0
+            deadband = None
 
             if self.has_iattr(item.conf, AttrType):
                 dataType = self.get_iattr_value(item.conf, AttrType)
@@ -187,6 +209,10 @@ class modbus_tcp(SmartPlugin):
                 byteOrderStr = self.get_iattr_value(item.conf, AttrByteOrder)
             if self.has_iattr(item.conf, AttrWordOrder):
                 wordOrderStr = self.get_iattr_value(item.conf, AttrWordOrder)
+            if self.has_iattr(item.conf, AttrPollCycle):
+                pollCycle = int(self.get_iattr_value(item.conf, AttrPollCycle))
+            if self.has_iattr(item.conf, AttrDeadband):
+                deadband = float(self.get_iattr_value(item.conf, AttrDeadband))
 
             try:    # den letzten Teil des Strings extrahieren, in Großbuchstaben und in Endian-Konstante wandeln
                 byteOrder = Endian[(str(byteOrderStr).split('.')[-1]).upper()]
@@ -203,13 +229,15 @@ class modbus_tcp(SmartPlugin):
             regPara = {'regAddr': regAddr, 'slaveUnit': slaveUnit, 'dataType': dataType, 'factor': factor,
                        'byteOrder': byteOrder,
                        'wordOrder': wordOrder, 'item': item, 'value': value, 'objectType': objectType,
-                       'dataDir': dataDirection}
+                       'dataDir': dataDirection, 'pollCycle': pollCycle, 'deadband': deadband}
             if dataDirection == 'read':
                 self._regToRead.update({reg: regPara})
+                self.__build_read_plan()
                 self.logger.info(f"parse item: {item} Attributes {regPara}")
             elif dataDirection == 'read_write':
                 self._regToRead.update({reg: regPara})
                 self._regToWrite.update({reg: regPara})
+                self.__build_read_plan()
                 self.logger.info(f"parse item: {item} Attributes {regPara}")
                 return self.update_item
             elif dataDirection == 'write':
@@ -219,6 +247,111 @@ class modbus_tcp(SmartPlugin):
             else:
                 self.logger.warning("Invalid data direction -> default(read) is used")
                 self._regToRead.update({reg: regPara})
+                self.__build_read_plan()
+
+    def __build_read_plan(self):
+        """
+        Groups the registers to read into blocks, that can be read with one request.
+
+        Registers of the same poll cycle, slave unit and object type are combined, if the gap between them is not
+        larger than read_gap registers and the block does not exceed read_block_size registers
+        (MAX_READ_BITS for coils and discrete inputs).
+        Each block holds a list of (regPara, offset) to decode the items from their slice of the block.
+        """
+        entries = []
+        for regPara in self._regToRead.values():
+            entries.append((regPara['pollCycle'], regPara['slaveUnit'], regPara['objectType'], regPara['regAddr'], self.__register_count(regPara), regPara))
+        entries.sort(key=lambda entry: entry[:4])
+
+        plan = []
+        block = None
+        for pollCycle, slaveUnit, objectType, address, count, regPara in entries:
+            limit = MAX_READ_BITS if objectType in ('Coil', 'DiscreteInput') else self._readBlockSize
+            if block is not None and block['pollCycle'] == pollCycle \
+                    and block['slaveUnit'] == slaveUnit and block['objectType'] == objectType \
+                    and address - (block['address'] + block['count']) <= self._readGap \
+                    and max(block['address'] + block['count'], address + count) - block['address'] <= limit:
+                block['count'] = max(block['count'], address + count - block['address'])
+            else:
+                block = self.__new_read_block(pollCycle, slaveUnit, objectType, address, count)
+                plan.append(block)
+            block['regs'].append((regPara, address - block['address']))
+        self._readPlan = plan
+
+    @staticmethod
+    def __new_read_block(pollCycle, slaveUnit, objectType, address, count) -> dict:
+        return {'pollCycle': pollCycle, 'slaveUnit': slaveUnit, 'objectType': objectType, 'address': address,
+                'count': count, 'regs': [], 'errors': 0, 'failures': 0, 'split': False, 'splitPolls': 0, 'singles': None}
+
+    def __poll_cycles(self) -> list:
+        """
+        Returns the poll cycles of registers, that are not read with the plugin's cycle/crontab
+        """
+        return sorted(set(regPara['pollCycle'] for regPara in self._regToRead.values() if regPara['pollCycle'] > 0))
+
+    def __single_read_blocks(self, block) -> list:
+        """
+        Returns one block per item of a block, to read the items separately, e.g. if the device does not allow
+        reading the unused registers between the items
+        """
+        if block['singles'] is None:
+            block['singles'] = []
+            for regPara, offset in block['regs']:
+                single = self.__new_read_block(block['pollCycle'], block['slaveUnit'], block['objectType'], regPara['regAddr'], self.__register_count(regPara))
+                single['regs'].append((regPara, 0))
+                block['singles'].append(single)
+        return block['singles']
+
+    def __read_block_items(self, block):
+        """
+        Reads a block and updates the items of the block
+
+        :return: number of items read or None, if the block could not be read
+        """
+        regCount = 0
+        blockStart = datetime.now()
+        result = self.__read_block(block['objectType'], block['address'], block['count'], block['slaveUnit'])
+        block['read_dt'] = blockStart
+        block['duration'] = datetime.now() - blockStart
+
+        if result is None:
+            block['errors'] += 1
+            return None
+
+        for regPara, offset in block['regs']:
+            try:
+                raw_value = self.__decode_value(regPara, result, offset)
+                # self.logger.debug(f"value read: {value} type: {type(value)}")
+            except ModbusException as e:
+                self.logger.error(f"ModbusException raised while reading: {e}")
+                continue
+
+            if raw_value is None:
+                continue
+
+            if self.is_NaN( raw_value, regPara['dataType']):
+                self.logger.debug(f"value read: {raw_value} type: {type(raw_value)} is a bad Value")
+                continue
+
+            value = raw_value
+            if regPara['factor'] != 1 and isinstance(value, (int, float)):
+                value *= regPara['factor']
+                # self.logger.debug(f"value {value} multiply by: {regPara['factor']}")
+
+            item = regPara['item']
+            if self.__changed(regPara, value):
+                item(value, self.get_fullname())
+            regCount += 1
+
+            if 'read_dt' in regPara:
+                regPara['last_read_dt'] = regPara['read_dt']
+
+            if 'value' in regPara:
+                regPara['last_value'] = regPara['value']
+
+            regPara['read_dt'] = datetime.now()
+            regPara['value'] = value
+        return regCount
 
     def log_error(self, message):
         """
@@ -236,19 +369,22 @@ class modbus_tcp(SmartPlugin):
                 if self.error_count % 100 == 0:
                     self.logger.error(f"{message} [Logging suppressed every 100th error]")
 
-    def poll_device(self):
+    def poll_device(self, pollCycle=0):
         """
         Poll data from modbus device
         It is called by the scheduler which is set within run() method.
+
+        :param pollCycle: poll cycle of the registers to read (0 = registers read with the plugin's cycle/crontab)
         """
         if not self.alive:
             return
-            
-        if self.lock.locked():
+
+        # polls of different cycles may overlap, wait a bit for the running poll to finish
+        if not self.lock.acquire(timeout=5):
             self.log_error(f"poll_device already called an not ready for next poll")
             return
 
-        with self.lock:
+        try:
             try:
                 if self._Mclient.connect():
                     self.logger.debug(f"connected to {str(self._Mclient)}")
@@ -270,46 +406,72 @@ class modbus_tcp(SmartPlugin):
 
             startTime = datetime.now()
             regCount = 0
+            blockCount = 0
 
-            for reg, regPara in self._regToRead.items():
-                try:
-                    raw_value = self.__read_Registers(regPara)
-                    # self.logger.debug(f"value read: {value} type: {type(value)}")
-                except ModbusException as e:
-                    self.logger.error(f"ModbusException raised while reading: {e}")
-                    break
-
-                if raw_value is None:
-                    continue
-
-                if self.is_NaN( raw_value, regPara['dataType']):
-                    self.logger.debug(f"value read: {raw_value} type: {type(value)} is a bad Value")
-                    continue
-                    
-                value = raw_value
-                if regPara['factor'] != 1 and isinstance(value, (int, float)):
-                    value *= regPara['factor']
-                    # self.logger.debug(f"value {value} multiply by: {regPara['factor']}")
-                    
-                item = regPara['item']
-                item(value, self.get_fullname())
-                regCount += 1
-
-                if 'read_dt' in regPara:
-                    regPara['last_read_dt'] = regPara['read_dt']
-
-                if 'value' in regPara:
-                    regPara['last_value'] = regPara['value']
-
-                regPara['read_dt'] = datetime.now()
-                regPara['value'] = value
+            try:
+                for block in [block for block in self._readPlan if block['pollCycle'] == pollCycle]:
+                    if block['split'] and block['splitPolls'] < READ_BLOCK_RETRY_POLLS:
+                        # the items of the block are read separately, the block is read as a whole again after some polls
+                        block['splitPolls'] += 1
+                        for single in self.__single_read_blocks(block):
+                            regCount += self.__read_block_items(single) or 0
+                            blockCount += 1
+                        continue
+
+                    count = self.__read_block_items(block)
+                    blockCount += 1
+                    if count is not None:
+                        regCount += count
+                        if block['split']:
+                            self.logger.info(f"read of block {block['objectType']}.{block['address']}.{block['slaveUnit']} (address.slaveUnit) regCount:{block['count']} succeeded again, reading its {len(block['regs'])} items with one request")
+                        block['failures'] = 0
+                        block['split'] = False
+                        continue
+
+                    # a single failed read (e.g. a timeout or a busy device) is retried with the next poll
+                    block['failures'] += 1
+                    block['splitPolls'] = 0
+                    if len(block['regs']) > 1 and (block['split'] or block['failures'] >= READ_BLOCK_SPLIT_ERRORS):
+                        singleCount = 0
+                        for single in self.__single_read_blocks(block):
+                            count = self.__read_block_items(single)
+                            blockCount += 1
+                            if count is not None:
+                                singleCount += count
+                        regCount += singleCount
+                        if singleCount > 0 and not block['split']:
+                            # the items can be read separately, e.g. the device does not allow reading the unused registers between them
+                            self.logger.warning(f"read of block {block['objectType']}.{block['address']}.{block['slaveUnit']} (address.slaveUnit) regCount:{block['count']} failed {block['failures']} times, reading its {len(block['regs'])} items separately")
+                            block['split'] = True
+            except ModbusException as e:
+                self.logger.error(f"ModbusException raised while reading: {e}")
 
             endTime = datetime.now()
             duration = endTime - startTime
             if regCount > 0:
                 self._pollStatus['last_dt'] = datetime.now()
                 self._pollStatus['regCount'] = regCount
-            self.logger.debug(f"poll_device: {regCount} register read required {duration} seconds")
+                self._pollStatus['blockCount'] = blockCount
+                self._pollStatus['duration'] = duration
+            self.logger.debug(f"poll_device: {regCount} register read with {blockCount} requests required {duration} seconds")
+        finally:
+            self.lock.release()
+
+    @staticmethod
+    def __changed(regPara: dict, value) -> bool:
+        """
+        Checks if the read value has to be written to the item
+
+        Without a deadband every read value is written. With a deadband, numeric values are only written if they
+        differ from the item's value by more than the deadband, other values only if they changed.
+        """
+        deadband = regPara['deadband']
+        if deadband is None:
+            return True
+        current = regPara['item']()
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and isinstance(current, (int, float)):
+            return abs(value - current) > deadband
+        return value != current
 
     def update_item(self, item, caller=None, source=None, dest=None):
         """
@@ -498,24 +660,18 @@ class modbus_tcp(SmartPlugin):
         # regPara['write_dt'] = datetime.now()
         # regPara['write_value'] = value
 
-    def __read_Registers(self, regPara: dict):
-        """Reads a register from modbus with parameters in passed dict
+    @staticmethod
+    def __register_count(regPara: dict) -> int:
+        """Returns the number of registers (bits for coils and discrete inputs) used by the item
 
         Args:
             regPara (dict): key/value for object type, address, slaveUnit, datatype
 
         Returns:
-            int/float/string: the read value
+            int: number of registers
         """
-        objectType = regPara['objectType']
         dataTypeStr = regPara['dataType']
         dataType = ''.join(filter(str.isalpha, dataTypeStr))    # get the base type from eg. 'uint32' --> 'uint'
-        bo = regPara['byteOrder']
-        wo = regPara['wordOrder']
-        slaveUnit = regPara['slaveUnit']
-        registerCount = 0
-        address = regPara['regAddr']
-        value = None
 
         try:
             bits = int(''.join(filter(str.isdigit, dataTypeStr))) # get only bits from e.g.  'uint32' --> 32
@@ -523,10 +679,21 @@ class modbus_tcp(SmartPlugin):
             bits = 16
 
         if dataType.lower() == 'string':
-            registerCount = int(bits / 2)  # bei string: bits = bytes !! string16 -> 16Byte - 8 registerCount
-        else:
-            registerCount = int(bits / 16)
+            return int(bits / 2)  # bei string: bits = bytes !! string16 -> 16Byte - 8 registerCount
+        return max(int(bits / 16), 1)
+
+    def __read_block(self, objectType: str, address: int, registerCount: int, slaveUnit: int):
+        """Reads a block of registers from modbus
 
+        Args:
+            objectType (str): Coil, DiscreteInput, InputRegister or HoldingRegister
+            address (int): first address of the block
+            registerCount (int): number of registers/bits to read
+            slaveUnit (int): slave unit to read from
+
+        Returns:
+            the pymodbus response or None if reading failed
+        """
         if not self.connected:
             self.logger.error(f"not connected to {self._host}:{self._port}")
             return
@@ -549,16 +716,39 @@ class modbus_tcp(SmartPlugin):
             self.logger.error(f"read error: {result} {objectType}.{address}.{slaveUnit} (address.slaveUnit) regCount:{registerCount}")
             return
 
-        if objectType == 'Coil':
-            value = result.bits[0]
-        elif objectType == 'DiscreteInput':
-            value = result.bits[0]
-        elif objectType == 'InputRegister':
-            decoder = BinaryPayloadDecoder.fromRegisters(result.registers, byteorder=bo, wordorder=wo)
-        else:
-            decoder = BinaryPayloadDecoder.fromRegisters(result.registers, byteorder=bo, wordorder=wo)
-
         self.logger.debug(f"read {objectType}.{address}.{slaveUnit} (address.slaveUnit) regCount:{registerCount} result:{result}")
+        return result
+
+    def __decode_value(self, regPara: dict, result, offset: int):
+        """Decodes the value of an item from its slice of a read block
+
+        Args:
+            regPara (dict): key/value for object type, address, slaveUnit, datatype
+            result: pymodbus response of the block read
+            offset (int): offset of the item's first register/bit within the block
+
+        Returns:
+            int/float/string: the read value
+        """
+        objectType = regPara['objectType']
+        dataTypeStr = regPara['dataType']
+        dataType = ''.join(filter(str.isalpha, dataTypeStr))    # get the base type from eg. 'uint32' --> 'uint'
+        bo = regPara['byteOrder']
+        wo = regPara['wordOrder']
+        slaveUnit = regPara['slaveUnit']
+        address = regPara['regAddr']
+        registerCount = self.__register_count(regPara)
+        value = None
+
+        try:
+            bits = int(''.join(filter(str.isdigit, dataTypeStr))) # get only bits from e.g.  'uint32' --> 32
+        except:
+            bits = 16
+
+        if objectType == 'Coil' or objectType == 'DiscreteInput':
+            value = result.bits[offset]
+        else:
+            decoder = BinaryPayloadDecoder.fromRegisters(result.registers[offset:offset + registerCount], byteorder=bo, wordorder=wo)
 
         try:
             if dataType.lower() == 'uint':
@@ -595,8 +785,9 @@ class modbus_tcp(SmartPlugin):
                     # self.logger.debug(f"read bit value: {value}")
                     return value
                 else:
-                    self.logger.debug(f"read bits values: {value.decode_bits()}")
-                    return decoder.decode_bits()
+                    value = decoder.decode_bits()
+                    self.logger.debug(f"read bits values: {value}")
+                    return value
             else:
                 self.logger.error(f"Number of bits or datatype not supported : {dataTypeStr}")
         except struct.error as e:
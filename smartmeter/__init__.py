@@ -301,6 +301,9 @@ class Smartmeter(SmartPlugin, Conversion):
             except Exception:
                 pass
 
+        # close connection kept open between queries
+        sml.close(self._config)
+
     def _load_parameters(self):
 
         #
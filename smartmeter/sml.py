@@ -88,6 +88,11 @@ S_BITS = serial.EIGHTBITS
 S_PARITY = serial.PARITY_NONE
 S_STOP = serial.STOPBITS_ONE
 
+# SML transport escape, start and end sequences
+SML_ESC = b'\x1b\x1b\x1b\x1b'
+SML_START = SML_ESC + b'\x01\x01\x01\x01'
+SML_END = SML_ESC + b'\x1a'
+
 
 if __name__ == '__main__':
     logger = logging.getLogger(__name__)
@@ -333,9 +338,13 @@ class AsyncReader():
 
 
 #
-# single-shot reader
+# persistent reader
 #
 
+# open readers by connection, see get_reader()
+_readers = {}
+
+
 
 class SmlReader():
     def __init__(self, logger, config: dict):
@@ -357,102 +366,181 @@ class SmlReader():
         self.target = '(not set)'
         self.buffersize = config.get('sml', {'buffersize': 1024}).get('buffersize', 1024)
 
+        # received data not yet returned as complete frame
+        self.buf = bytearray()
+
         self.logger.debug(f"config='{config}'")
 
     def __call__(self) -> bytes:
+        """
+        return the most recent complete SML frame
 
-        #
-        # open the serial communication
-        #
+        The connection is kept open between calls. Data received since the last
+        call is discarded, as it may be outdated, and the next frame is returned
+        as soon as its end is received or the timeout is reached.
+        """
         locked = self.lock.acquire(blocking=False)
         if not locked:
             self.logger.error('could not get lock for serial/network access. Is another scheduled/manual action still active?')
             return b''
 
+        response = b''
         try:  # lock release
-            runtime = time.time()
-            self.get_sock()
             if not self.sock:
-                # error already logged, just go
-                return b''
-            self.logger.debug(f"time to open {self.target}: {format_time(time.time() - runtime)}")
+                runtime = time.time()
+                self.get_sock()
+                if not self.sock:
+                    # error already logged, just go
+                    return b''
+                self.logger.debug(f"time to open {self.target}: {format_time(time.time() - runtime)}")
 
             #
             # read data from device
             #
-            response = bytes()
             try:
                 response = self.read()
                 if len(response) == 0:
                     self.logger.info('reading data from device returned 0 bytes!')
-                    return b''
+                    # possibly stale connection, reconnect on next call
+                    self.close()
                 else:
-                    self.logger.debug(f'read {len(response)} bytes')
+                    self.logger.debug(f'read frame of {len(response)} bytes')
 
             except Exception as e:
                 self.logger.error(f'reading data from {self.target} failed with error: {e}')
+                self.close()
 
-        except Exception:
-            # passthrough, this is only for releasing the lock
-            raise
         finally:
-            #
-            # clean up connection
-            #
-            try:
-                self.sock.close()
-            except Exception:
-                pass
-            self.sock = None
             self.lock.release()
         return response
 
-    def _read(self) -> bytes:
-        """ isolate the read method from the connection object """
+    def close(self):
+        """ close connection to device and discard buffered data """
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+        self.sock = None
+        self.buf.clear()
+
+    def _discard_input(self):
+        """
+        discard data received since the last call
+
+        If the input buffer of the operating system overflows between two calls,
+        it keeps the oldest data, so buffered frames may be up to one poll cycle old.
+        """
         if isinstance(self.sock, serial.Serial):
-            return self.sock.read()
+            self.sock.reset_input_buffer()
         elif isinstance(self.sock, socket.socket):
-            return self.sock.recv(self.buffersize)
+            while self._read(block=False):
+                pass
+        self.buf.clear()
+
+    def _read(self, block: bool = True) -> bytes:
+        """
+        isolate the read method from the connection object
+
+        if block is not set, only return data which is already received
+        """
+        if isinstance(self.sock, serial.Serial):
+            waiting = self.sock.in_waiting
+            if not waiting and not block:
+                return b''
+            # with waiting == 0, block for first byte until timeout
+            return self.sock.read(waiting or 1)
+        elif isinstance(self.sock, socket.socket):
+            try:
+                if not block:
+                    self.sock.settimeout(0)
+                data = self.sock.recv(self.buffersize)
+            except (socket.timeout, BlockingIOError):
+                return b''
+            finally:
+                if not block:
+                    self.sock.settimeout(self.timeout)
+            if not data:
+                raise ConnectionError('connection closed by remote host')
+            return data
         else:
             return b''
 
+    def get_frame(self) -> bytes:
+        """
+        remove all complete frames from buffer and return the last one
+
+        SML transport: a frame starts with 1b1b1b1b 01010101 and ends with
+        1b1b1b1b 1a xx yy zz, escape sequences inside a frame are 4-byte aligned
+        and doubled (1b1b1b1b 1b1b1b1b)
+        """
+        frame = b''
+        while True:
+            start = self.buf.find(SML_START)
+            if start < 0:
+                # keep possible beginning of start sequence
+                del self.buf[:-(len(SML_START) - 1)]
+                return frame
+            pos = start + len(SML_START)
+            end = -1
+            while True:
+                esc = self.buf.find(SML_ESC, pos)
+                if esc < 0 or esc + 8 > len(self.buf):
+                    break
+                if (esc - start) % 4:
+                    # not aligned, so this is data
+                    pos = esc + 1
+                elif self.buf[esc + 4:esc + 8] == SML_ESC:
+                    # escaped data
+                    pos = esc + 8
+                elif self.buf[esc + 4] == 0x1a:
+                    end = esc + 8
+                    break
+                else:
+                    # start of next frame or garbage, discard incomplete frame
+                    self.logger.debug(f'discarding incomplete frame of {esc - start} bytes')
+                    end = esc
+                    break
+
+            if end < 0:
+                # frame not complete yet
+                del self.buf[:start]
+                if len(self.buf) > max(self.buffersize, 1024) * 4:
+                    self.logger.error("Buffer got to large, doing buffer reset")
+                    self.buf.clear()
+                return frame
+
+            if self.buf[end - 8:end - 3] == SML_END:
+                frame = bytes(self.buf[start:end])
+            del self.buf[:end]
+
     def read(self) -> bytes:
         """
-        This function reads some bytes from serial or network interface
-        it returns an array of bytes if a timeout occurs or a given end byte is encountered
-        and otherwise b'' if an error occurred
+        This function discards data received since the last call and reads
+        data from serial or network interface until the next complete SML
+        frame is received, it returns b'' if a timeout or an error occurred
         :returns the read data
         """
         if TESTING:
             return RESULT
 
         self.logger.debug("start to read data from serial/network device")
-        response = bytes()
-        while True:
-            try:
-                # on serial, length is ignored
-                data = self._read()
-                if data:
-                    response += data
-                    if len(response) >= self.buffersize:
-                        self.logger.debug('read end, length reached')
-                        break
-                else:
-                    if isinstance(self.sock, serial.Serial):
-                        self.logger.debug('read end, end of data reached')
-                        break
-            except socket.error as e:
-                if e.args[0] == errno.EAGAIN or e.args[0] == errno.EWOULDBLOCK:
-                    self.logger.debug(f'read end, error: {e}')
-                    break
-                else:
-                    raise
-            except Exception as e:
-                self.logger.debug(f"error while reading from serial/network: {e}")
-                return b''
 
-        self.logger.debug(f"finished reading data from serial/network {len(response)} bytes")
-        return response
+        self._discard_input()
+        frame = b''
+
+        # wait for next frame
+        deadline = time.time() + self.timeout
+        while not frame and time.time() < deadline:
+            data = self._read()
+            if data:
+                self.buf += data
+                frame = self.get_frame()
+            elif isinstance(self.sock, serial.Serial):
+                self.logger.debug('read end, end of data reached')
+                break
+
+        self.logger.debug(f"finished reading data from serial/network, frame length {len(frame)} bytes")
+        return frame
 
     def get_sock(self):
         """ open serial or network socket """
@@ -520,9 +608,14 @@ class SmlReader():
             # open network connection
             #
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(2)
-            sock.connect((self.host, self.port))
-            sock.setblocking(False)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect((self.host, self.port))
+            except OSError as e:
+                self.logger.error(f"could not connect to {self.host}:{self.port}: {e}")
+                sock.close()
+                return None, ''
+            self.sock = sock
             self.target = f'tcp://{self.host}:{self.port}'
 
         else:
@@ -642,13 +735,42 @@ class SmlParser():
         return self.fp()
 
 
+def get_reader(config: dict, logger=logger) -> SmlReader:
+    """
+    return the reader for the configured connection
+
+    Readers are kept between queries, so the connection to the smartmeter stays open.
+    If the connection parameters were changed, the old reader is closed.
+    """
+    key = (config.get('serial_port'), config.get('host'), config.get('port'))
+    reader = _readers.get(key)
+    if reader is not None and (reader.timeout, reader.baudrate, reader.buffersize) != \
+            (config.get('timeout', 2), config.get('baudrate', 9600), config.get('sml', {}).get('buffersize', 1024)):
+        close(config)
+        reader = None
+    if reader is None:
+        reader = SmlReader(logger, config)
+        _readers[key] = reader
+    reader.logger = logger
+    return reader
+
+
+def close(config: dict):
+    """ close the connection opened by query() """
+    reader = _readers.pop((config.get('serial_port'), config.get('host'), config.get('port')), None)
+    if reader is not None:
+        with reader.lock:
+            reader.close()
+
+
 def query(config, logger=logger) -> dict:
     """
     This function will
-    1. open a serial communication line to the smartmeter
-    2. reads out the block of OBIS information
-    3. closes the serial communication
-    4. extract obis data and format return dict
+    1. open a serial communication line to the smartmeter, if not already open
+    2. reads the next complete SML frame
+    3. extract obis data and format return dict
+
+    The communication line is kept open for the next query, call close() to close it.
 
     config contains a dict with entries for
     'serial_port', 'device' and a sub-dict 'sml' with entries for
@@ -673,7 +795,7 @@ def query(config, logger=logger) -> dict:
     runtime = starttime
 
     try:
-        reader = SmlReader(logger, config)
+        reader = get_reader(config, logger)
     except ValueError as e:
         logger.error(f'error on opening connection: {e}')
         return {}
@@ -707,6 +829,8 @@ def discover(config: dict) -> bool:
     result = bool(query(config, str_log))
     if not result:
         config['discover_log'] = str_log()
+        # don't block the port for other protocols
+        close(config)
     return result
 
 
@@ -773,7 +897,8 @@ if __name__ == '__main__':
     logger.info("==================================================================")
 
     result = discover(config)
-        
+    close(config)
+
     if not result:
         logger.info(f"No results from query, maybe a problem with the serial port '{config['serial_port']}' given.")
     elif len(result) > 1:
@@ -1179,9 +1179,9 @@ class SeActionRun(SeActionBase):
             try:
                 if returnvalue:
                     self._log_decrease_indent()
-                    return eval(self.__eval)
+                    return eval(StateEngineTools.compile_eval(self.__eval))
                 log_conditions()
-                eval_result = eval(self.__eval)
+                eval_result = eval(StateEngineTools.compile_eval(self.__eval))
                 self.update_webif_actionstatus(state, self._name, 'True')
                 self._log_decrease_indent()
             except Exception as ex:
@@ -62,6 +62,8 @@ class SeCondition(StateEngineTools.SeItemChild):
         self.__error = None
         self.__state = None
         self.__itemClass = Item
+        self.__dependencies = None
+        self.__cached = None
 
     def __repr__(self):
         return "SeCondition 'item': {}, 'status': {}, 'eval': {}, " \
@@ -342,10 +344,58 @@ class SeCondition(StateEngineTools.SeItemChild):
         if self.__item is None and self.__status is None and \
                 not cond_min_max and not cond_evalitem and not cond_status_evalitem:
             raise ValueError("Condition {}: 'agemin'/'agemax' can not be used for eval!".format(self.__name))
+
+        # register the items the result depends on, so unchanged conditions can reuse their last result
+        self.__cached = None
+        self.__dependencies = self.__get_dependencies()
+        if self.__dependencies:
+            self._abitem.register_condition(self, self.__dependencies)
         return True
 
-    # Check if condition is matching
+    # Forget the cached result of the condition
+    def invalidate(self):
+        self.__cached = None
+
+    # Determine the items the result of the condition depends on
+    # returns: list of items, None if the dependencies can not be determined (evals, variables, age)
+    def __get_dependencies(self):
+        if not self.__agemin.is_empty() or not self.__agemax.is_empty():
+            return None
+        if isinstance(self.__status, self.__itemClass):
+            dependencies = [self.__status]
+        elif self.__status is None and self.__status_eval is None and isinstance(self.__item, self.__itemClass):
+            dependencies = [self.__item]
+        else:
+            return None
+        for value in (self.__value, self.__min, self.__max, self.__changedby, self.__updatedby, self.__triggeredby):
+            value_dependencies = value.get_dependencies()
+            if value_dependencies is None:
+                return None
+            dependencies.extend(value_dependencies)
+        return dependencies
+
+    # Return the update state of all items the condition depends on
+    def __fingerprint(self):
+        return tuple((item.property.last_update, getattr(item.property, 'last_trigger', None))
+                     for item in self.__dependencies)
+
+    # Check if condition is matching, reuse the last result if none of the dependencies changed
     def check(self, state):
+        if not self.__dependencies:
+            return self.__check(state)
+        fingerprint = self.__fingerprint()
+        if self.__cached is not None and self.__cached[0] == fingerprint:
+            result = self.__cached[1]
+            self._log_debug("Condition '{0}': Items unchanged since last check, using last result {1}",
+                            self.__name, result)
+            self._abitem.update_webif(self.__webif_key('match', 'value'), 'yes' if result else 'no')
+            return result
+        result = self.__check(state)
+        self.__cached = (fingerprint, result)
+        return result
+
+    # Check if condition is matching
+    def __check(self, state):
         # Ignore if no current value can be determined (should not happen as we check this earlier, but to be sure ...)
         if all(item is None for item in [self.__item, self.__status, self.__eval, self.__status_eval]):
             self._log_info("Condition '{0}': No item, status or (status)eval found! "
@@ -868,7 +918,7 @@ class SeCondition(StateEngineTools.SeItemChild):
                     # noinspection PyUnusedLocal
                     stateengine_eval = se_eval = StateEngineEval.SeEval(self._abitem)
                 try:
-                    eval_result = eval(eval_or_status_eval)
+                    eval_result = eval(StateEngineTools.compile_eval(eval_or_status_eval))
                     if isinstance(eval_result, self.__itemClass):
                         value = eval_result.property.last_change_age if eval_type == 'age' else \
                             eval_result.property.last_change_by if eval_type == 'changedby' else \
@@ -39,6 +39,7 @@ import copy
 import threading
 import queue
 import re
+import weakref
 
 
 # Class representing a blind item
@@ -213,6 +214,7 @@ class SeItem:
         self.__active_schedulers = []
         self.__release_info = {}
         self.__cache = {}
+        self.__condition_index = {}
         self.__last_run = {}
         self.__pass_repeat = {}
         self._delayedactions_text = []
@@ -531,6 +533,18 @@ class SeItem:
 
     # region Updatestate ***********************************************************************************************
     # run queue
+    # Register a condition in the dependency index
+    # condition: SeCondition instance
+    # items: items the result of the condition depends on
+    def register_condition(self, condition, items):
+        for item in items:
+            self.__condition_index.setdefault(item.property.path, weakref.WeakSet()).add(condition)
+
+    # Force re-evaluation of all conditions depending on the given item
+    def __invalidate_conditions(self, item_path):
+        for condition in list(self.__condition_index.get(item_path, ())):
+            condition.invalidate()
+
     def run_queue(self):
         def update_current_to_empty(d):
             if isinstance(d, dict):  # Check if the current level is a dictionary
@@ -642,6 +656,8 @@ class SeItem:
                     self.__logger.debug("Ignoring changes from {0}", StateEngineDefaults.plugin_identification)
                     continue
 
+                self.__invalidate_conditions(item_id)
+                self.__invalidate_conditions(orig_item.property.path)
                 self.__update_trigger_item = item.property.path
                 self.__update_trigger_caller = caller
                 self.__update_trigger_source = source
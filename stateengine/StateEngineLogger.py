@@ -22,10 +22,121 @@
 import logging
 import datetime
 import os
+import queue
+import threading
+import time
 from . import StateEngineDefaults
 
 
+# Background writer for the extended log files of all stateengine items
+# Keeps one open file per item, writes the lines in batches and flushes after each batch.
+class SeLogWriter:
+    # Constructor
+    # maxsize: maximum number of lines waiting to be written
+    def __init__(self, maxsize=10000):
+        self.__queue = queue.Queue(maxsize=maxsize)
+        self.__files = {}
+        self.__errors = set()
+        self.__dropped = 0
+        self.__lock = threading.Lock()
+        self.__thread = None
+
+    # Queue a line to be written
+    # section: section of the item (key for the open file)
+    # filename: name of the log file for the section
+    # timestamp: time of the log entry (as returned by time.time())
+    # text: text to log
+    # Does not block: if the queue is full, the line is dropped and counted
+    def write(self, section, filename, timestamp, text):
+        self.__start()
+        try:
+            self.__queue.put_nowait((section, filename, timestamp, text))
+        except queue.Full:
+            self.__dropped += 1
+
+    # Write all queued lines, close the files and stop the writer thread
+    def stop(self):
+        with self.__lock:
+            if self.__thread is None or not self.__thread.is_alive():
+                return
+            self.__queue.put(None)
+            self.__thread.join(timeout=5)
+            self.__thread = None
+
+    def __start(self):
+        if self.__thread is not None:
+            return
+        with self.__lock:
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, name='stateengine.logwriter', daemon=True)
+                self.__thread.start()
+
+    def __run(self):
+        running = True
+        while running:
+            batch = [self.__queue.get()]
+            try:
+                while len(batch) < 1000:
+                    batch.append(self.__queue.get_nowait())
+            except queue.Empty:
+                pass
+            written = set()
+            for entry in batch:
+                if entry is None:
+                    running = False
+                    continue
+                section, filename, timestamp, text = entry
+                file = self.__get_file(section, filename)
+                if file is None:
+                    continue
+                try:
+                    file.write("{0} {1}\r\n".format(datetime.datetime.fromtimestamp(timestamp), text))
+                    written.add(file)
+                except Exception as ex:
+                    self.__error(filename, ex)
+            for file in written:
+                try:
+                    file.flush()
+                except Exception as ex:
+                    self.__error(file.name, ex)
+            if self.__dropped > 0:
+                StateEngineDefaults.logger.warning("{} lines could not be written to the stateengine log files, "
+                                                   "because the log writer is busy.".format(self.__dropped))
+                self.__dropped = 0
+        for _, file in self.__files.values():
+            try:
+                file.close()
+            except Exception:
+                pass
+        self.__files = {}
+
+    # Return the open file for a section, rotate it if the filename changed (e.g. on a new day)
+    def __get_file(self, section, filename):
+        current = self.__files.get(section)
+        if current is not None:
+            if current[0] == filename:
+                return current[1]
+            try:
+                current[1].close()
+            except Exception:
+                pass
+            del self.__files[section]
+        try:
+            file = open(filename, mode="a", encoding="utf-8")
+        except Exception as ex:
+            self.__error(filename, ex)
+            return None
+        self.__files[section] = (filename, file)
+        return file
+
+    def __error(self, filename, ex):
+        if filename not in self.__errors:
+            self.__errors.add(filename)
+            StateEngineDefaults.logger.error("There is a problem with the logfile {}: {}".format(filename, ex))
+
+
 class SeLogger:
+    __writer = SeLogWriter()
 
     @property
     def default_log_level(self):
@@ -80,6 +191,11 @@ class SeLogger:
     def init(sh):
         SeLogger.__sh = sh
 
+    # Write all pending log lines and close the log files
+    @staticmethod
+    def stop_writer():
+        SeLogger.__writer.stop()
+
     # Create log directory
     # logdirectory: Target directory for StateEngine log files
     @staticmethod
@@ -138,13 +254,12 @@ class SeLogger:
             self.__log_level_as_num = 0
         self.__logmaxage = None
         self.__date = None
-        self.__logerror = False
         self.__filename = ""
         self.update_logfile()
 
     # Update name logfile if required
     def update_logfile(self):
-        if self.__date == datetime.datetime.today() and self.__filename is not None:
+        if self.__date == str(datetime.date.today()) and self.__filename is not None:
             return
         self.__date = str(datetime.date.today())
         self.__filename = f"{SeLogger.log_directory}{self.__date}-{self.__section}.log"
@@ -174,15 +289,8 @@ class SeLogger:
             indent = "\t" * self.__indentlevel
             if args:
                 text = text.format(*args)
-            logtext = "{0} {1}{2}{3}\r\n".format(datetime.datetime.now(), self.__indentprefix, indent, text)
-            try:
-                with open(self.__filename, mode="a", encoding="utf-8") as f:
-                    f.write(logtext)
-            except Exception as e:
-                if self.__logerror is False:
-                    self.__logerror = True
-                    self.logger.error("There is a problem with "
-                                      "the logfile {}: {}".format(self.__filename, e))
+            SeLogger.__writer.write(self.__section, self.__filename, time.time(),
+                                    "{0}{1}{2}".format(self.__indentprefix, indent, text))
 
     # log header line (as info)
     # text: header text
@@ -99,11 +99,26 @@ def get_last_part_of_item_id(item):
     return return_value
 
 
+# Cache of parsed expressions and compiled eval code, shared by all stateengine items.
+# Relative item paths are resolved by se_eval when the code is evaluated, so the expression string is a sufficient key.
+_parsed_relative = {}
+_compiled_eval = {}
+
+
 def parse_relative(evalstr, begintag, endtags):
     if begintag == '' and endtags == '':
         return evalstr
     if evalstr.find(begintag+'.') == -1:
         return evalstr
+    key = (evalstr, begintag, tuple(endtags) if isinstance(endtags, list) else endtags)
+    parsed = _parsed_relative.get(key)
+    if parsed is None:
+        parsed = _parse_relative(evalstr, begintag, endtags)
+        _parsed_relative[key] = parsed
+    return parsed
+
+
+def _parse_relative(evalstr, begintag, endtags):
     pref = ''
     rest = evalstr
     endtags = [endtags] if isinstance(endtags, str) else endtags
@@ -130,6 +145,18 @@ def parse_relative(evalstr, begintag, endtags):
     return pref
 
 
+# Compile an eval expression, compiled code is cached for all stateengine items
+# evalstr: expression to compile
+# returns: code object to be used with eval() instead of the expression string
+def compile_eval(evalstr):
+    code = _compiled_eval.get(evalstr)
+    if code is None:
+        # eval() of a string ignores leading spaces and tabs, compile() does not
+        code = compile(evalstr.lstrip(' \t'), '<stateengine eval>', 'eval')
+        _compiled_eval[evalstr] = code
+    return code
+
+
 # Flatten list of values
 # changelist: list to make flat
 def flatten_list(changelist):
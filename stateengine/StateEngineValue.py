@@ -98,6 +98,18 @@ class SeValue(StateEngineTools.SeItemChild):
     def get_issues(self):
         return self.__get_issues
 
+    # Return the items the value is read from
+    # returns: list of items, None if the value depends on evals, variables or structs
+    def get_dependencies(self):
+        if self.__eval is not None or self.__varname is not None or self.__struct is not None:
+            return None
+        if self.__item is None:
+            return []
+        items = self.__item if isinstance(self.__item, list) else [self.__item]
+        if not all(isinstance(item, self.__itemClass) for item in items):
+            return None
+        return items
+
     # Set value directly from attribute
     # item: item containing the attribute
     # attribute_name: name of attribute to use
@@ -892,7 +904,7 @@ class SeValue(StateEngineTools.SeItemChild):
                 return result
             self._log_increase_indent()
             try:
-                _newvalue, _issue = self.__do_cast(eval(eval_get))
+                _newvalue, _issue = self.__do_cast(eval(StateEngineTools.compile_eval(eval_get)))
                 _issue_dict = {StateEngineTools.get_eval_name(eval_get): _issue}
                 if _issue not in [[], None, [None]] and _issue_dict not in self.__get_issues['eval']:
                     self.__get_issues['eval'].append(_issue_dict)
@@ -939,7 +951,7 @@ class SeValue(StateEngineTools.SeItemChild):
                             # noinspection PyUnusedLocal
                             stateengine_eval = se_eval = StateEngineEval.SeEval(self._abitem)
                         try:
-                            _newvalue, _issue = self.__do_cast(eval(val))
+                            _newvalue, _issue = self.__do_cast(eval(StateEngineTools.compile_eval(val)))
                             _issue_dict = {val: _issue}
                             if _issue not in [[], None, [None]] and _issue_dict not in self.__get_issues['eval']:
                                 self.__get_issues['eval'].append(_issue_dict)
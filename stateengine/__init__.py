@@ -173,6 +173,7 @@ class StateEngine(SmartPlugin):
 
         self.alive = False
         self.__sh.stateengine_plugin_functions.ab_alive = False
+        SeLogger.stop_writer()
         self.logger.debug("stop method finished")
 
     # Determine if caller/source are contained in changed_by list
@@ -129,6 +129,12 @@ class UZSU(SmartPlugin):
         self._webdata = {'sunCalculated': {}, 'items': {}}
         self._update_count = {'todo': 0, 'done': 0}
         self._itpl = {}
+        # caches shared by all items, cleared at the day boundary
+        self._cache_day = None
+        self._sun_cache = {}            # (sunrise|sunset, degree offset, minute offset, dt) to sun event
+        self._sun4week = None           # sunrise and sunset per weekday for the upcoming 7 days
+        self._rrule_cache = {}          # (rule string, dtstart) to parsed rrule
+        self._time_cache = {}           # time string to parsed time or None if it is no valid time
         self.init_webinterface(WebInterface)
         self.logger.info(f'Init with timezone {self._timezone}')
 
@@ -214,30 +220,40 @@ class UZSU(SmartPlugin):
         :param caller:  if given it represents the callers name
         :type caller:   str
         """
+        sun = self._get_sun_now()
         for item in self._items:
-            success = self._update_sun(item, caller="update_all_suns")
+            success = self._update_sun(item, caller="update_all_suns", sun=sun)
             if success:
                 self._update_item(item,  'update_all_suns')
                 self.logger.debug(f'Updated sun info for item {item}. Caller: {caller}')
                 self._write_dict_to_item(item, 'update_all_suns')
 
-    def _update_sun(self, item, caller=None):
+    def _get_sun_now(self):
+        """
+        Get next sunrise and sunset from now in local time
+        :return:        tuple of sunrise and sunset
+        """
+        _sunrise = self._sh.sun.rise()
+        _sunset = self._sh.sun.set()
+        if _sunrise.tzinfo == tzutc():
+            _sunrise = _sunrise.astimezone(self._timezone)
+        if _sunset.tzinfo == tzutc():
+            _sunset = _sunset.astimezone(self._timezone)
+        return _sunrise, _sunset
+
+    def _update_sun(self, item, caller=None, sun=None):
         """
         Update general sunrise and sunset information for visu
         :param caller:  if given it represents the callers name
         :param item:    uzsu item
+        :param sun:     tuple of sunrise and sunset as returned by _get_sun_now, determined if not given
         :type caller:   str
         :type item:     item
         """
         if caller != "_update_item":
             self._items[item] = item()
         try:
-            _sunrise = self._sh.sun.rise()
-            _sunset = self._sh.sun.set()
-            if _sunrise.tzinfo == tzutc():
-                _sunrise = _sunrise.astimezone(self._timezone)
-            if _sunset.tzinfo == tzutc():
-                _sunset = _sunset.astimezone(self._timezone)
+            _sunrise, _sunset = sun if sun else self._get_sun_now()
             self._items[item]['sunrise'] = f'{_sunrise.hour:02}:{_sunrise.minute:02}'
             self._items[item]['sunset'] = f'{_sunset.hour:02}:{_sunset.minute:02}'
             self.logger.debug(f'Updated sun entries for item {item}, triggered by {caller}. '
@@ -999,11 +1015,11 @@ class UZSU(SmartPlugin):
                 if entry['rrule'] == '':
                     entry['rrule'] = 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR,SA,SU'
                 if 'dtstart' in entry:
-                    rrule = rrulestr(entry['rrule'], dtstart=entry['dtstart'])
+                    rrule = self._rrulestr(entry['rrule'], dtstart=entry['dtstart'])
                 else:
                     try:
-                        rrule = rrulestr(entry['rrule'], dtstart=datetime.combine(
-                            weekbefore, parser.parse(time.strip()).time()))
+                        rrule = self._rrulestr(entry['rrule'], dtstart=datetime.combine(
+                            weekbefore, self._parse_time(time)))
                         rstr = str(rrule).replace('\n', ';')
                         self.logger.debug(f"{item}: Created rrule: '{rstr}' for time: '{time}'")
                     except ValueError:
@@ -1011,12 +1027,12 @@ class UZSU(SmartPlugin):
                         if 'sun' in time:
                             sun = self._sun(datetime.combine(weekbefore.date(),
                                             datetime.min.time()).replace(tzinfo=self._timezone),time, timescan)
-                            rrule = rrulestr(entry['rrule'], dtstart=datetime.combine(weekbefore, sun.time()))
+                            rrule = self._rrulestr(entry['rrule'], dtstart=datetime.combine(weekbefore, sun.time()))
                             rstr = str(rrule).replace('\n', ';')
                             next_day = True if weekbefore.date() < sun.date() else False
                             self.logger.debug(f'{item}: Looking for {timescan} sun-related time. Found rrule: {rstr}.')
                         else:
-                            rrule = rrulestr(entry['rrule'], dtstart=datetime.combine(weekbefore, datetime.min.time()))
+                            rrule = self._rrulestr(entry['rrule'], dtstart=datetime.combine(weekbefore, datetime.min.time()))
                             rstr = str(rrule).replace('\n', ';')
                             self.logger.debug(f'{item}: Looking for {timescan} time. Found rrule: {rstr}')
                 dt = datetime.now()
@@ -1032,7 +1048,7 @@ class UZSU(SmartPlugin):
                         if entryindex is not None and timescan == 'next':
                             self._update_suncalc(item, entry, entryindex, next.strftime("%H:%M"))
                     else:
-                        next = datetime.combine(dt.date(), parser.parse(time.strip()).time()).replace(tzinfo=self._timezone)
+                        next = datetime.combine(dt.date(), self._parse_time(time)).replace(tzinfo=self._timezone)
                         self._update_suncalc(item, entry, entryindex, None)
                     compare_date = None if not next else next.date() - timedelta(days=1) if next_day else next.date()
                     if next and compare_date == dt.date():
@@ -1062,12 +1078,12 @@ class UZSU(SmartPlugin):
                         tzinfo=self._timezone), time, timescan)
                     self.logger.debug(f'{item}: Result parsing time tomorrow (sun) {time}: {next}')
             elif 'series' not in time:
-                next = datetime.combine(today, parser.parse(time.strip()).time()).replace(tzinfo=self._timezone)
+                next = datetime.combine(today, self._parse_time(time)).replace(tzinfo=self._timezone)
                 cond_future = next > datetime.now(self._timezone)
                 if caller != "dry_run" and not cond_future:
                     self._itpl[item][next.timestamp() * 1000.0] = value
                     self.logger.debug(f'{item}: Include {timescan} today: {next}, value {value} for interpolation.')
-                    next = datetime.combine(tomorrow, parser.parse(time.strip()).time()).replace(tzinfo=self._timezone)
+                    next = datetime.combine(tomorrow, self._parse_time(time)).replace(tzinfo=self._timezone)
             if 'series' in time:
                 # Get next Time for Series
                 next = self._series_get_time(entry, timescan)
@@ -1209,10 +1225,10 @@ class UZSU(SmartPlugin):
 
                     #####################
                     # advanced rule including all sun times, start and end times  and calculated max counts, etc.
-                    rrule = rrulestr(mydict['rrule'] + ";COUNT=7",
+                    rrule = self._rrulestr(mydict['rrule'] + ";COUNT=7",
                                      dtstart=datetime.combine(datetime.now(),
-                                     parser.parse(str(starttime.hour) + ':' +
-                                     str(starttime.minute)).time()))
+                                     self._parse_time(str(starttime.hour) + ':' +
+                                     str(starttime.minute))))
                     mynewlist = []
 
                     interval = int(mydict['series']['timeSeriesIntervall'].split(":")[0]) * 60 + \
@@ -1231,8 +1247,8 @@ class UZSU(SmartPlugin):
                                                seriesstart, "next")
                             starttime = (f'{mytime.hour:02d}:{mytime.minute:02d}')
                             starttime = datetime.strptime(starttime, "%H:%M")
-                        dayrule = rrulestr(myrulenext, dtstart=day.replace(hour=starttime.hour,
-                                                                           minute=starttime.minute, second=0))
+                        dayrule = self._rrulestr(myrulenext, dtstart=day.replace(hour=starttime.hour,
+                                                                                 minute=starttime.minute, second=0))
                         dayrule.after(day.replace(hour=0, minute=0))    # First Entry for this day
                         count = 0
 
@@ -1249,8 +1265,8 @@ class UZSU(SmartPlugin):
                             exceptions += 1
                             max_interval = int(max_interval.total_seconds() / 60)
                             myrulenext = f'FREQ=MINUTELY;COUNT=1;INTERVAL={max_interval}'
-                            dayrule = rrulestr(myrulenext, dtstart=day.replace(hour=starttime.hour,
-                                                                               minute=starttime.minute, second=0))
+                            dayrule = self._rrulestr(myrulenext, dtstart=day.replace(hour=starttime.hour,
+                                                                                     minute=starttime.minute, second=0))
                             dayrule.after(day.replace(hour=0, minute=0))
                             actday = mydays[day.weekday()] if list(dayrule) is None else mydays[list(dayrule)[0].weekday()]
                         seriestarttime = None
@@ -1310,19 +1326,90 @@ class UZSU(SmartPlugin):
         :type caller:   string
         :return:        True at the end of the method
         """
-        dayrule = rrulestr("FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR,SA,SU" + ";COUNT=7",
-                           dtstart=datetime.now().replace(hour=0, minute=0, second=0))
         self.logger.debug(f'Get sun4week for item {item} called by {caller}')
-        mynewdict = {'sunrise': {}, 'sunset': {}}
-        for day in (list(dayrule)):
-            actday = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU'][day.weekday()]
-            mysunrise = self._sun(day.astimezone(self._timezone), "sunrise", "next")
-            mysunset = self._sun(day.astimezone(self._timezone), "sunset", "next")
-            mynewdict['sunrise'][actday] = (f'{mysunrise.hour:02d}:{mysunrise.minute:02d}')
-            mynewdict['sunset'][actday] = (f'{mysunset.hour:02d}:{mysunset.minute:02d}')
-        self._items[item]['SunCalculated'] = mynewdict
+        self._check_cache_day()
+        if self._sun4week is None:
+            dayrule = self._rrulestr("FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR,SA,SU" + ";COUNT=7",
+                                     dtstart=datetime.now().replace(hour=0, minute=0, second=0, microsecond=0))
+            mynewdict = {'sunrise': {}, 'sunset': {}}
+            for day in (list(dayrule)):
+                actday = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU'][day.weekday()]
+                mysunrise = self._sun(day.astimezone(self._timezone), "sunrise", "next")
+                mysunset = self._sun(day.astimezone(self._timezone), "sunset", "next")
+                mynewdict['sunrise'][actday] = (f'{mysunrise.hour:02d}:{mysunrise.minute:02d}')
+                mynewdict['sunset'][actday] = (f'{mysunset.hour:02d}:{mysunset.minute:02d}')
+            self._sun4week = mynewdict
+        # every item gets its own copy, as the dict is written to the item
+        self._items[item]['SunCalculated'] = {'sunrise': dict(self._sun4week['sunrise']),
+                                              'sunset': dict(self._sun4week['sunset'])}
         return True
 
+    def _check_cache_day(self):
+        """
+        Clear the caches for sun events and rrules at the day boundary
+        """
+        today = datetime.now().date()
+        if self._cache_day != today:
+            self._cache_day = today
+            self._sun_cache = {}
+            self._sun4week = None
+            self._rrule_cache = {}
+            self._time_cache = {}
+
+    def _rrulestr(self, rule, dtstart=None):
+        """
+        Returns the parsed rrule for the rule string and start, rrules are shared by all items
+        :param rule:        rrule string
+        :param dtstart:     start of the recurrence
+        :return:            rrule object
+        """
+        self._check_cache_day()
+        key = (rule, dtstart)
+        rrule = self._rrule_cache.get(key)
+        if rrule is None:
+            rrule = self._rrule_cache[key] = rrulestr(rule, dtstart=dtstart)
+        return rrule
+
+    def _parse_time(self, tstr):
+        """
+        Returns the time of a time string like '16:30'
+        :param tstr:        time string
+        :return:            time object
+        :raises ValueError: if tstr is no valid time, e.g. a sun based time
+        """
+        self._check_cache_day()
+        try:
+            parsed = self._time_cache[tstr]
+        except KeyError:
+            try:
+                parsed = parser.parse(tstr.strip()).time()
+            except (ValueError, OverflowError):
+                parsed = None
+            self._time_cache[tstr] = parsed
+        if parsed is None:
+            raise ValueError(f'Unknown string format: {tstr}')
+        return parsed
+
+    def _get_sun_event(self, event, doff, moff, dt):
+        """
+        Returns sunrise or sunset after dt, sun events are shared by all items
+        :param event:       'sunrise' or 'sunset'
+        :param doff:        degree offset
+        :param moff:        minute offset
+        :param dt:          datetime to start from
+        :return:            datetime of the sun event
+        """
+        self._check_cache_day()
+        key = (event, doff, moff, dt.replace(microsecond=0))
+        next_time = self._sun_cache.get(key)
+        if next_time is None:
+            if event == 'sunrise':
+                next_time = self._sh.sun.rise(doff, moff, dt=dt)
+            else:
+                next_time = self._sh.sun.set(doff, moff, dt=dt)
+            self._sun_cache[key] = next_time
+        return next_time
+
     def _fix_empty_values(self, mydict):
         daycount = mydict['series'].get('timeSeriesCount', None)
         seriesend = mydict['series'].get('timeSeriesMax', None)
@@ -1407,10 +1494,10 @@ class UZSU(SmartPlugin):
                     daycount = new_daycount
         mylist = OrderedDict()
         actrrule = mydict['rrule'] + ';COUNT=9'
-        rrule = rrulestr(
+        rrule = self._rrulestr(
             actrrule,
             dtstart=datetime.combine(datetime.now() - timedelta(days=7),
-            parser.parse(str(starttime.hour) + ':' + str(starttime.minute)).time())
+            self._parse_time(str(starttime.hour) + ':' + str(starttime.minute)))
         )
         for day in list(rrule):
             mycount = 1
@@ -1500,7 +1587,7 @@ class UZSU(SmartPlugin):
         dmin = None
         dmax = None
         if cron.startswith('sunrise'):
-            next_time = self._sh.sun.rise(doff, moff, dt=dt)
+            next_time = self._get_sun_event('sunrise', doff, moff, dt)
             self.logger.debug(f'{timescan} time for sunrise: {next_time}')
             # time in next_time will be in utctime. So we need to adjust it
             if next_time.tzinfo == tzutc():
@@ -1510,7 +1597,7 @@ class UZSU(SmartPlugin):
             self.logger.debug(f'next_time.tzinfo gives {next_time.tzinfo}')
             self.logger.debug(f'Sunrise is included and calculated as {next_time}')
         elif cron.startswith('sunset'):
-            next_time = self._sh.sun.set(doff, moff, dt=dt)
+            next_time = self._get_sun_event('sunset', doff, moff, dt)
             self.logger.debug(f'{timescan} time for sunset: {next_time}')
             # time in next_time will be in utctime. So we need to adjust it
             if next_time.tzinfo == tzutc():